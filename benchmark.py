@@ -0,0 +1,259 @@
+# Host-side microbenchmarks for the lookups, text handling and slip
+# rendering in ko-calendar.py and the printer driver, run on CPython with
+# the stand-ins in sim.py and a UART that only counts bytes. Each benchmark reports operations per second, the
+# peak memory one pass allocates and what it still holds afterwards (from
+# tracemalloc), and for the print benchmarks the bytes sent to the UART per
+# slip. Results can be saved as JSON and compared with an earlier run:
+#
+#   python benchmark.py -o baseline.json
+#   python benchmark.py --compare baseline.json            # exits 1 on a regression
+#   python benchmark.py --compare baseline.json new.json --threshold 0.1
+
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time as host_time
+import tracemalloc
+
+version = "1.0.0"
+
+MIN_TIME = 0.1  # seconds of timed passes per benchmark and round
+ROUNDS = 5
+PEAK_SLACK = 4096  # bytes of peak allocation change that are noise (asyncio and caches), not a regression
+THRESHOLD = 0.2  # allowed relative change of a tracked metric before it counts as a regression
+# Tracked metrics and the direction that is better
+TRACKED = {'ops_per_s': 1, 'peak_bytes': -1, 'uart_bytes_per_op': -1}
+MONTH_DAYS = (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+class CountingUART:
+    """Takes the place of the printer's UART: counts what is written and keeps none of it."""
+
+    def __init__(self):
+        self.bytes = 0
+        self.writes = 0
+
+    def write(self, data):
+        n = len(data)
+        self.bytes += n
+        self.writes += 1
+        return n
+
+    def txdone(self):
+        return True
+
+
+def _days():
+    return [(month, day) for month, days in enumerate(MONTH_DAYS, 1) for day in range(1, days + 1)]
+
+
+def benchmarks(cal, uart):
+    """Returns [(name, operations per pass, pass function, does the pass print)] for a loaded calendar."""
+    import gy_ep204x
+    import sim
+    catalog = cal.catalog
+    days = _days()
+    numbers = range(1, 73)
+    romaji = [r.romaji for layer in (catalog.ko, catalog.sekki, catalog.shiki) for r in layer]
+    english = [r.en for r in catalog.ko]
+    encoded = [text.encode('utf-8') for text in english]
+    ticket = gy_ep204x.Ticket()
+    printer = cal.setup_printer()
+    printer.uart = uart
+    loop = sim.asyncio.new_event_loop()  # one loop for every pass, as the printer's lock belongs to it
+    layers = (('print_microseason', catalog.ko, cal.print_microseason),
+              ('print_mini_season', catalog.sekki, cal.print_mini_season),
+              ('print_macro_season', catalog.shiki, cal.print_macro_season))
+
+    def date_lookup():
+        for month, day in days:
+            cal.get_microseason_for_date(catalog, month, day)
+
+    def date_lookup_solar():
+        for month, day in days:
+            cal.get_microseason_for_date(catalog, month, day, 2028)
+
+    def number_lookup():
+        for number in numbers:
+            cal.get_microseason_for_number(catalog, number)
+
+    def de_accent():
+        for text in romaji:
+            cal.de_accent(text)
+
+    def print_with_breaks():
+        ticket.clear()
+        for text in english:
+            ticket.print_with_breaks(text)
+
+    def line_breaks():
+        for data in encoded:
+            gy_ep204x.line_breaks(data, gy_ep204x.LINE_CELLS, True)
+
+    def printing(records, print_season):
+        async def slips():
+            for record in records:
+                await print_season(printer, record)
+        return lambda: loop.run_until_complete(slips())
+
+    result = [
+        ('date_lookup', len(days), date_lookup, False),
+        ('date_lookup_solar', len(days), date_lookup_solar, False),
+        ('number_lookup', len(numbers), number_lookup, False),
+        ('de_accent', len(romaji), de_accent, False),
+        ('print_with_breaks', len(english), print_with_breaks, False),
+        ('line_breaks', len(encoded), line_breaks, False),
+    ]
+    for name, records, print_season in layers:
+        result.append((name, len(records), printing(list(records), print_season), True))
+    return result
+
+
+def best_pass(run, min_time=MIN_TIME):
+    """Runs passes for at least min_time (and at least 3); returns the fastest pass in seconds."""
+    best = None
+    spent = 0.0
+    passes = 0
+    while spent < min_time or passes < 3:
+        started = host_time.perf_counter()
+        run()
+        elapsed = host_time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+        spent += elapsed
+        passes += 1
+    return best
+
+
+def trace(run, uart=None):
+    """Runs one pass under tracemalloc; returns (peak bytes, bytes still held, bytes written to uart)."""
+    sent = uart.bytes if uart else 0
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        run()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - base, current - base, (uart.bytes - sent) if uart else 0
+
+
+def run_all(only=None, min_time=MIN_TIME, rounds=ROUNDS):
+    """Loads ko-calendar.py on the simulator and runs the benchmarks; returns the results document.
+
+    The suite runs rounds times over and each benchmark keeps its fastest
+    pass, so a burst of load on the host skews one round rather than the result.
+    """
+    import simulate
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='ko-bench-')
+    results = {}
+    try:
+        with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):  # the calendar's console output
+            cal = simulate.load_calendar(workdir)
+            cal.catalog.refresh()
+            uart = CountingUART()
+            suite = [b for b in benchmarks(cal, uart) if not only or b[0] in only]
+            best = {}
+            for name, ops, run, prints in suite:
+                run()  # warm caches, as the device would be after its first use
+            for _ in range(rounds):
+                for name, ops, run, prints in suite:
+                    elapsed = best_pass(run, min_time)
+                    best[name] = min(best.get(name, elapsed), elapsed)
+            for name, ops, run, prints in suite:
+                peak, kept, sent = trace(run, uart if prints else None)
+                results[name] = {
+                    'ops': ops,
+                    'ops_per_s': ops / best[name] if best[name] else 0.0,
+                    'peak_bytes': peak,
+                    'retained_bytes': kept,
+                }
+                if prints:
+                    results[name]['uart_bytes_per_op'] = sent / ops
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        'version': version,
+        'calendar_version': cal.version,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'benchmarks': results,
+    }
+
+
+def compare(baseline, current, threshold=THRESHOLD):
+    """Returns [(benchmark, metric, old, new, relative change, regressed)] for the tracked metrics."""
+    rows = []
+    for name, new in current['benchmarks'].items():
+        old = baseline['benchmarks'].get(name)
+        if old is None:
+            continue
+        for metric, better in TRACKED.items():
+            if metric not in old or metric not in new:
+                continue
+            before, after = old[metric], new[metric]
+            if before:
+                change = (after - before) / before
+            else:
+                change = 0.0 if not after else float('inf')
+            regressed = change * better < -threshold
+            if metric == 'peak_bytes' and abs(after - before) < PEAK_SLACK:
+                regressed = False
+            rows.append((name, metric, before, after, change, regressed))
+    return rows
+
+
+def _load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark lookups, text handling and slip printing on CPython.")
+    parser.add_argument('-o', '--output', help="save the results as JSON")
+    parser.add_argument('--compare', nargs='+', metavar='JSON',
+                        help="baseline results, and optionally results to check instead of a new run")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="relative change of a tracked metric that counts as a regression")
+    parser.add_argument('--only', nargs='+', metavar='NAME', help="run only these benchmarks")
+    parser.add_argument('--min-time', type=float, default=MIN_TIME,
+                        help="seconds of timed passes per benchmark and round")
+    parser.add_argument('--rounds', type=int, default=ROUNDS, help="times the suite is run; the fastest pass counts")
+    args = parser.parse_args(argv)
+
+    if args.compare and len(args.compare) > 1:
+        current = _load(args.compare[1])
+    else:
+        current = run_all(args.only, args.min_time, args.rounds)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=1, sort_keys=True)
+            f.write('\n')
+
+    print(f"{'benchmark':20} {'ops/s':>12} {'peak B':>8} {'kept B':>8} {'UART B/op':>9}")
+    for name, r in current['benchmarks'].items():
+        uart = f"{r['uart_bytes_per_op']:9.0f}" if 'uart_bytes_per_op' in r else f"{'':9}"
+        print(f"{name:20} {r['ops_per_s']:12.0f} {r['peak_bytes']:8} {r['retained_bytes']:8} {uart}")
+    if not args.compare:
+        return 0
+
+    rows = compare(_load(args.compare[0]), current, args.threshold)
+    regressions = [row for row in rows if row[5]]
+    print()
+    print(f"Compared with {args.compare[0]} (threshold {args.threshold:.0%}):")
+    for name, metric, before, after, change, regressed in rows:
+        if regressed or abs(change) > args.threshold:
+            mark = "REGRESSION" if regressed else "improved"
+            print(f"  {name:20} {metric:17} {before:12.1f} -> {after:12.1f} ({change:+.1%}) {mark}")
+    print(f"{len(regressions)} regressions in {len(rows)} tracked metrics.")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
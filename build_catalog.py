@@ -0,0 +1,94 @@
+# Host-side build step: packs the three season JSON files into seasons.bin.
+# The JSON files stay the source of truth; run this after editing them and copy
+# seasons.bin to the device alongside them.
+#
+#   python build_catalog.py            build seasons.bin and verify it
+#   python build_catalog.py --check    only verify an existing seasons.bin
+
+import struct
+import sys
+from season_catalog import (SeasonCatalog, PackedCatalog, PACKED_FILE, PACKED_MAGIC, PACKED_FORMAT,
+                            PACKED_HEADER, PACKED_HEADER_SIZE, PACKED_RECORD, source_signature)
+from season_index import DAYS_IN_YEAR, month_day
+
+version = "1.1.0"
+
+
+def pack_catalog(catalog):
+    """Returns the packed binary form of a loaded SeasonCatalog, stamped with its files' source_signature()."""
+    layers = (catalog.ko, catalog.sekki, catalog.shiki)
+    for records in layers:
+        for i, record in enumerate(records):
+            if record.number != i + 1:
+                raise ValueError(f"season numbers must run 1..n without gaps, found {record.number}")
+    index = catalog.index
+    days = bytearray()
+    for slot in range(DAYS_IN_YEAR):
+        days += bytes((index.ko[slot], index.sekki[slot], index.shiki[slot], index.starts[slot]))
+    count = sum(len(records) for records in layers)
+    days_offset = PACKED_HEADER_SIZE
+    table_offset = days_offset + len(days)
+    offset = table_offset + count * 4
+    table = bytearray()
+    body = bytearray()
+    for records in layers:
+        for r in records:
+            kanji, romaji, en = r.kanji.encode('utf-8'), r.romaji.encode('utf-8'), r.en.encode('utf-8')
+            table += struct.pack('<I', offset + len(body))
+            body += struct.pack(PACKED_RECORD, r.number, r.start_month, r.start_day, r.end_month, r.end_day,
+                                len(kanji), len(romaji), len(en))
+            body += kanji + romaji + en
+    header = struct.pack(PACKED_HEADER, PACKED_MAGIC, PACKED_FORMAT, len(catalog.ko), len(catalog.sekki),
+                         len(catalog.shiki), days_offset, table_offset, source_signature(catalog.directory) or 0)
+    return bytes(header + days + table + body)
+
+
+def check_catalog(catalog, path=PACKED_FILE):
+    """Compares every record and day slot in a packed file with the JSON catalog; returns a list of problems."""
+    packed = PackedCatalog(path)
+    packed.refresh()
+    problems = []
+    try:
+        if packed.source != source_signature(catalog.directory):
+            problems.append("built from other JSON files: the source signature differs")
+        for name in ('ko', 'sekki', 'shiki'):
+            source, target = getattr(catalog, name), getattr(packed, name)
+            if len(source) != len(target):
+                problems.append(f"{name}: {len(source)} records in JSON, {len(target)} packed")
+                continue
+            for a, b in zip(source, target):
+                for field in a.__slots__:
+                    if getattr(a, field) != getattr(b, field):
+                        problems.append(f"{name} {a.number}: {field} {getattr(a, field)!r} != {getattr(b, field)!r}")
+        for slot in range(DAYS_IN_YEAR):
+            month, day = month_day(slot)
+            expected = catalog.index.lookup(month, day)
+            found = packed.lookup(month, day)
+            if found != expected:
+                problems.append(f"{month:02d}-{day:02d}: {found} != {expected}")
+    finally:
+        packed.close()
+    return problems
+
+
+def main(argv):
+    catalog = SeasonCatalog()
+    catalog.refresh()
+    if '--check' not in argv:
+        data = pack_catalog(catalog)
+        with open(PACKED_FILE, 'wb') as f:
+            f.write(data)
+        print(f"Wrote {PACKED_FILE}: {len(data)} bytes, {len(catalog.ko)} kō, "
+              f"{len(catalog.sekki)} sekki, {len(catalog.shiki)} shiki.")
+    problems = check_catalog(catalog)
+    for problem in problems:
+        print(problem)
+    if problems:
+        print(f"{PACKED_FILE} does not match the JSON files.")
+        return 1
+    print(f"{PACKED_FILE} matches the JSON files.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,341 @@
+# HTTP service answering "what season is it, and what starts, in this zone
+# today" for many sites at once, using the same lookups and slip renderers as
+# ko-calendar.py. Runs on CPython only.
+#
+#   python calendar_service.py --port 8072
+#   curl 'http://localhost:8072/season?zone=Asia/Tokyo&date=2026-03-05'
+#   curl -o slip.bin 'http://localhost:8072/payload?zone=Europe/Berlin'
+#   curl 'http://localhost:8072/search?q=pheasant'
+#   python calendar_service.py --load-test 20000 --concurrency 64
+#
+# /season returns JSON with the kō, sekki and shiki in effect, which of them
+# start that day and the base64 ESC/POS bytes a device would print. /payload
+# returns those bytes alone. zone is an IANA name (its POSIX rule is read
+# from the system tz database) or a POSIX TZ rule; date defaults to today
+# there and must fall in solar_terms.FIRST_YEAR to LAST_YEAR. Responses are
+# cached per (zone, local date) and carry an ETag.
+# /search finds seasons by a prefix of their English, romaji or kanji names.
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+import zoneinfo
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+import host_calendar
+from gy_ep204x import Ticket
+from season_index import STARTS_KO, STARTS_SEKKI, STARTS_SHIKI
+from solar_terms import FIRST_YEAR, LAST_YEAR
+from timeutil import days_in_month
+from tz import TimeZone
+
+version = "1.1.1"
+
+CACHE_SIZE = 4096  # responses kept, by (zone, local date, path)
+INDEX_CACHE_SIZE = 256  # per-(year, zone) calendar indexes kept
+MAX_AGE = 3600  # Cache-Control max-age of a response, seconds
+
+# A POSIX TZ rule: std offset [dst [offset] [,start[/time],end[/time]]]
+_NAME = r'(?:[A-Za-z]{3,}|<[A-Za-z0-9+-]{3,}>)'
+_OFFSET = r'[+-]?\d{1,3}(?::\d{2}(?::\d{2})?)?'
+_DATE = r'(?:M\d{1,2}\.\d\.\d|J?\d{1,3})(?:/' + _OFFSET + ')?'
+POSIX_RULE = re.compile(f"{_NAME}{_OFFSET}(?:{_NAME}(?:{_OFFSET})?(?:,{_DATE},{_DATE})?)?")
+# An IANA zone name: relative, no '.' or '..' components, so it cannot leave TZPATH
+IANA_NAME = re.compile(r'[A-Za-z0-9_+-]{1,32}(?:/[A-Za-z0-9_+-]{1,32}){0,3}')
+
+
+def posix_rule(zone):
+    """Returns the POSIX TZ rule for an IANA zone name from the TZif footer, or zone itself."""
+    if not IANA_NAME.fullmatch(zone):
+        return zone  # checked before the name reaches the filesystem
+    for root in zoneinfo.TZPATH:
+        path = os.path.join(root, zone)
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                if f.read(4) != b'TZif':
+                    continue
+                data = f.read()
+            return data.rstrip(b'\n').rsplit(b'\n', 1)[-1].decode()
+    return zone
+
+
+class LRU:
+    def __init__(self, size):
+        self.size = size
+        self.items = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        value = self.items.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if len(self.items) > self.size:
+            self.items.popitem(last=False)
+
+
+def _season_json(record):
+    return {
+        'number': record.number,
+        'kanji': record.kanji,
+        'romaji': record.romaji,
+        'en': record.en,
+        'start': f"{record.start_month:02d}-{record.start_day:02d}",
+        'end': f"{record.end_month:02d}-{record.end_day:02d}",
+    }
+
+
+class CalendarService:
+    """Season lookups and rendered slips per zone and local date, behind an LRU of responses."""
+
+    def __init__(self, cal, cache_size=CACHE_SIZE):
+        self.cal = cal
+        cal.solar_terms.max_indexes = INDEX_CACHE_SIZE
+        self.cache = LRU(cache_size)
+        self.zones = {}  # zone name or rule -> TimeZone
+        self.ticket = Ticket()
+        self.requests = self.not_modified = 0
+
+    def zone(self, name):
+        tz = self.zones.get(name)
+        if tz is None:
+            rule = posix_rule(name)
+            if rule == name and not POSIX_RULE.fullmatch(name):
+                raise ValueError(f"unknown zone {name}")  # neither in the tz database nor a POSIX rule
+            tz = self.zones[name] = TimeZone(rule)
+        return tz
+
+    def day(self, zone, year, month, day):
+        """Returns the JSON-ready answer for one zone and local date."""
+        cal = self.cal
+        catalog = cal.catalog
+        tz = self.zone(zone)
+        index = cal.calendar_index(year, tz)
+        starts = index.lookup(month, day)[3]
+        current = {}
+        payload = bytearray()
+        # Same order as the print spool: shiki, then sekki, then kō
+        for layer, flag, records, table, lookup, render in (
+                ('shiki', STARTS_SHIKI, catalog.shiki, index.shiki, cal.get_macro_season_for_date, cal.render_macro_season),
+                ('sekki', STARTS_SEKKI, catalog.sekki, index.sekki, cal.get_mini_season_for_date, cal.render_mini_season),
+                ('ko', STARTS_KO, catalog.ko, index.ko, cal.get_microseason_for_date, cal.render_microseason)):
+            record = lookup(catalog, month, day, year, tz)
+            if record is None:
+                continue
+            record = cal.with_dates(record, index, table, year)
+            current[layer] = _season_json(record)
+            if starts & flag:
+                render(self.ticket.clear(), record)
+                payload += self.ticket.view()
+        return {
+            'zone': zone,
+            'rule': tz.spec,
+            'date': f"{year:04d}-{month:02d}-{day:02d}",
+            'current': current,
+            'starting': [layer for layer, flag in (('shiki', STARTS_SHIKI), ('sekki', STARTS_SEKKI), ('ko', STARTS_KO))
+                         if starts & flag],
+        }, bytes(payload)
+
+    def respond(self, path, query, if_none_match=None):
+        """Returns (status, headers, body) for a GET request."""
+        self.requests += 1
+        params = parse_qs(query)
+        if path == '/search':
+            found = self.cal.find_seasons(params.get('q', [''])[0])
+            body = json.dumps([dict(_season_json(r), layer=layer) for layer, r in found], ensure_ascii=False).encode()
+            return 200, {'Content-Type': 'application/json; charset=utf-8'}, body
+        if path not in ('/season', '/payload'):
+            return 404, {}, b'not found\n'
+        zone = params.get('zone', ['UTC'])[0]
+        try:
+            tz = self.zone(zone)
+            date = params.get('date', [None])[0]
+            if date:
+                year, month, day = (int(part) for part in date.split('-'))
+                if not (FIRST_YEAR <= year <= LAST_YEAR and 1 <= month <= 12
+                        and 1 <= day <= days_in_month(year, month)):
+                    raise ValueError(date)
+            else:
+                year, month, day = time.gmtime(tz.local(int(time.time())))[:3]
+        except (ValueError, IndexError):
+            return 400, {}, b'bad zone or date\n'
+        key = (zone, year, month, day, path)
+        entry = self.cache.get(key)
+        if entry is None:
+            answer, payload = self.day(zone, year, month, day)
+            if path == '/season':
+                answer['payload'] = base64.b64encode(payload).decode()
+                body, kind = json.dumps(answer, ensure_ascii=False).encode(), 'application/json; charset=utf-8'
+            else:
+                body, kind = payload, 'application/octet-stream'
+            etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+            entry = (etag, kind, body)
+            self.cache.put(key, entry)
+        etag, kind, body = entry
+        headers = {'ETag': etag, 'Cache-Control': f"max-age={MAX_AGE}"}
+        if if_none_match == etag:
+            self.not_modified += 1
+            return 304, headers, b''
+        headers['Content-Type'] = kind
+        return 200, headers, body
+
+
+REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+async def handle(service, reader, writer):
+    # HTTP/1.1 with keep-alive; GET only, no request bodies
+    try:
+        while True:
+            request = await reader.readline()
+            if not request:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            try:
+                method, target, protocol = request.decode('latin-1').split()
+            except ValueError:
+                break
+            if method != 'GET':
+                status, extra, body = 405, {}, b''
+            else:
+                url = urlsplit(target)
+                status, extra, body = service.respond(url.path, url.query, headers.get('if-none-match'))
+            close = headers.get('connection', '').lower() == 'close' or protocol == 'HTTP/1.0'
+            head = [f"HTTP/1.1 {status} {REASONS[status]}", f"Content-Length: {len(body)}"]
+            head += [f"{name}: {value}" for name, value in extra.items()]
+            if close:
+                head.append("Connection: close")
+            writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + body)
+            await writer.drain()
+            if close:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+@contextlib.contextmanager
+def open_service():
+    """Yields a CalendarService over ko-calendar.py, keeping its solar term cache in a scratch directory."""
+    workdir = tempfile.mkdtemp(prefix='ko-service-')
+    try:
+        yield CalendarService(host_calendar.load_calendar(workdir))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+async def serve(service, host, port):
+    server = await asyncio.start_server(lambda r, w: handle(service, r, w), host, port)
+    print(f"Serving kō calendar on http://{host}:{port}/season")
+    async with server:
+        await server.serve_forever()
+
+
+LOAD_TEST_ZONES = ('America/New_York', 'America/Los_Angeles', 'Europe/London', 'Europe/Berlin',
+                   'Asia/Tokyo', 'Australia/Sydney', 'UTC', 'JST-9')
+
+
+async def load_test(service, requests, concurrency, days=30, seed=1):
+    """Runs the server on localhost and hammers it over keep-alive connections; returns a report."""
+    server = await asyncio.start_server(lambda r, w: handle(service, r, w), '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    rng = random.Random(seed)
+    targets = [f"/season?zone={zone}&date=2026-{1 + d // 28:02d}-{1 + d % 28:02d}"
+               for zone in LOAD_TEST_ZONES for d in range(days)]
+    latencies = []
+    statuses = {}
+    remaining = [requests]
+
+    async def client():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        etags = {}
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            target = rng.choice(targets)
+            extra = f"If-None-Match: {etags[target]}\r\n" if target in etags and rng.random() < 0.5 else ''
+            started = time.perf_counter()
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n{extra}\r\n".encode())
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line == b'\r\n':
+                    break
+                name, _, value = line.decode().partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+                elif name.lower() == 'etag':
+                    etags[target] = value.strip()
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+        writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    server.close()
+    await server.wait_closed()
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000,
+        'statuses': statuses,
+        'cache_hits': service.cache.hits,
+        'cache_misses': service.cache.misses,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve kō, sekki and shiki lookups for many timezones.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8072)
+    parser.add_argument('--load-test', type=int, metavar='N', help="send N requests on localhost and report")
+    parser.add_argument('--concurrency', type=int, default=32, help="connections for the load test")
+    args = parser.parse_args(argv)
+    with open_service() as service:
+        if args.load_test:
+            report = asyncio.run(load_test(service, args.load_test, args.concurrency))
+            print(f"{report['requests']} requests in {report['seconds']:.2f} s: "
+                  f"{report['requests_per_second']:.0f} req/s, p50 {report['p50_ms']:.2f} ms, "
+                  f"p99 {report['p99_ms']:.2f} ms")
+            print(f"Statuses: {report['statuses']}; response cache {report['cache_hits']} hits, "
+                  f"{report['cache_misses']} misses")
+        else:
+            try:
+                asyncio.run(serve(service, args.host, args.port))
+            except KeyboardInterrupt:
+                pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
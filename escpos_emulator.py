@@ -0,0 +1,304 @@
+# Host-side interpreter for the ESC/POS subset that GY_EP204X emits, with a
+# cost model for paper length, UART transfer time and mechanical print time,
+# and text and bitmap (PBM) previews of the printed slip.
+#
+#   python escpos_emulator.py slip.bin          report and preview a captured byte stream
+#   python escpos_emulator.py --slips           report every kō, sekki and shiki slip
+#   python escpos_emulator.py --slip ko 5 --pbm ko5.pbm
+
+import argparse
+import sys
+from gy_ep204x import char_cells
+
+version = "1.0.1"
+
+DOTS_PER_LINE = 384  # 58 mm paper at 8 dots/mm
+DOTS_PER_MM = 8
+FONT_WIDTH = 12  # font A half-width cell; full-width (kanji) cells are twice this
+FONT_HEIGHT = 24
+LINE_SPACING = 30  # default dot rows per line (ESC 2)
+PRINT_SPEED = 50  # mm/s of paper while printing
+FEED_SPEED = 70  # mm/s of paper while feeding blank space
+LINE_OVERHEAD = 0.004  # seconds of head/motor settling per printed line
+UART_BITS_PER_BYTE = 10  # 8N1
+
+
+class Line:
+    __slots__ = ('text', 'width', 'height', 'bold', 'align', 'cells', 'japanese')
+
+    def __init__(self, text, width, height, bold, align, cells, japanese=False):
+        self.text = text
+        self.width = width  # GS ! width multiplier
+        self.height = height  # GS ! height multiplier
+        self.bold = bold
+        self.align = align  # 0 left, 1 center, 2 right
+        self.cells = cells  # half-width cells used, before the width multiplier
+        self.japanese = japanese  # ESC 9 character set the line was printed in, which sets cell widths
+
+
+class Slip:
+    """Result of running a byte stream: printed lines interleaved with feeds, and costs."""
+
+    def __init__(self, baudrate=115200):
+        self.baudrate = baudrate
+        self.items = []  # Line objects and int dot-row feeds, in paper order
+        self.byte_count = 0
+        self.dot_rows = 0
+        self.printed_lines = 0
+        self.feed_rows = 0
+        self.unknown = []  # unsupported command bytes seen
+
+    @property
+    def paper_mm(self):
+        return self.dot_rows / DOTS_PER_MM
+
+    @property
+    def uart_seconds(self):
+        return self.byte_count * UART_BITS_PER_BYTE / self.baudrate
+
+    @property
+    def print_seconds(self):
+        printed = self.dot_rows - self.feed_rows
+        return (printed / DOTS_PER_MM / PRINT_SPEED + self.feed_rows / DOTS_PER_MM / FEED_SPEED
+                + self.printed_lines * LINE_OVERHEAD)
+
+    def report(self):
+        return {
+            'bytes': self.byte_count,
+            'dot_rows': self.dot_rows,
+            'paper_mm': round(self.paper_mm, 1),
+            'uart_ms': round(self.uart_seconds * 1000, 2),
+            'print_s': round(self.print_seconds, 3),
+            'lines': self.printed_lines,
+        }
+
+
+def run(data, baudrate=115200):
+    """Interprets an ESC/POS byte stream and returns a Slip."""
+    slip = Slip(baudrate)
+    slip.byte_count = len(data)
+    width = height = 1
+    bold = False
+    align = 0
+    japanese = False
+    text = bytearray()
+
+    def line_rows(h):
+        return max(LINE_SPACING, FONT_HEIGHT * h + LINE_SPACING - FONT_HEIGHT)
+
+    def feed(rows):
+        slip.items.append(rows)
+        slip.dot_rows += rows
+        slip.feed_rows += rows
+
+    def flush(newline):
+        # Print buffered text, wrapping where the printer would
+        chars = text.decode('utf-8', 'replace')
+        text[:] = b''
+        if not chars:
+            if newline:
+                feed(line_rows(height))
+            return
+        limit = DOTS_PER_LINE // (FONT_WIDTH * width)
+        start = cells = 0
+        for i, ch in enumerate(chars):
+            c = char_cells(ord(ch), japanese)
+            if cells + c > limit:
+                emit(chars[start:i], cells)
+                start, cells = i, 0
+            cells += c
+        emit(chars[start:], cells)
+
+    def emit(chars, cells):
+        slip.items.append(Line(chars, width, height, bold, align, cells, japanese))
+        slip.dot_rows += line_rows(height)
+        slip.printed_lines += 1
+
+    i, n = 0, len(data)
+    while i < n:
+        b = data[i]
+        if b == 0x1B and i + 1 < n:  # ESC
+            cmd = data[i + 1]
+            if cmd == 0x40:  # ESC @ reset
+                flush(False)
+                width = height = 1
+                bold = japanese = False
+                align = 0
+                i += 2
+                continue
+            if i + 2 >= n:
+                slip.unknown.append(bytes(data[i:]))
+                break
+            arg = data[i + 2]
+            if cmd == 0x64:  # ESC d n: print and feed n lines
+                flush(False)
+                feed(arg * line_rows(height))
+            elif cmd == 0x4A:  # ESC J n: print and feed n dot rows
+                flush(False)
+                feed(arg)
+            elif cmd == 0x47:  # ESC G n: bold
+                bold = bool(arg & 1)
+            elif cmd == 0x61:  # ESC a n: justification
+                align = arg if arg <= 2 else arg - 0x30
+            elif cmd == 0x39:  # ESC 9 n: character set
+                japanese = arg == 1
+            elif cmd == 0x2D:  # ESC - n: underline, no effect on layout
+                pass
+            else:
+                slip.unknown.append(bytes(data[i:i + 3]))
+            i += 3
+        elif b == 0x1D and i + 2 < n:  # GS
+            cmd, arg = data[i + 1], data[i + 2]
+            if cmd == 0x21:  # GS ! n: character size
+                width = (arg >> 4) + 1
+                height = (arg & 0x0F) + 1
+            elif cmd != 0x42:  # GS B (reverse) does not change layout
+                slip.unknown.append(bytes(data[i:i + 3]))
+            i += 3
+        elif b == 0x0A:
+            flush(True)
+            i += 1
+        else:
+            text.append(b)
+            i += 1
+    flush(False)
+    return slip
+
+
+def text_preview(slip, columns=DOTS_PER_LINE // FONT_WIDTH):
+    """Returns the slip as text, one column per half-width cell and one row per default line."""
+    out = []
+    pending = 0
+    for item in slip.items:
+        if isinstance(item, int):
+            pending += item
+            while pending >= LINE_SPACING:
+                out.append('')
+                pending -= LINE_SPACING
+            continue
+        pad = ' ' * (item.width - 1)
+        body = ''.join(ch + pad for ch in item.text)
+        used = item.cells * item.width
+        space = max(0, columns - used)
+        left = space // 2 if item.align == 1 else space if item.align == 2 else 0
+        out.append(' ' * left + body)
+        out.extend([''] * (item.height - 1))
+    return '\n'.join(out) + '\n'
+
+
+def bitmap(slip):
+    """Returns (width, height, rows) with each glyph drawn as a block, rows being bytearrays of 0/1."""
+    rows = []
+    for item in slip.items:
+        if isinstance(item, int):
+            rows.extend(bytearray(DOTS_PER_LINE) for _ in range(item))
+            continue
+        line_height = max(LINE_SPACING, FONT_HEIGHT * item.height + LINE_SPACING - FONT_HEIGHT)
+        block = [bytearray(DOTS_PER_LINE) for _ in range(line_height)]
+        used = item.cells * item.width * FONT_WIDTH
+        space = max(0, DOTS_PER_LINE - used)
+        x = space // 2 if item.align == 1 else space if item.align == 2 else 0
+        glyph_height = FONT_HEIGHT * item.height
+        inset = 1 if item.bold else 2
+        for ch in item.text:
+            w = char_cells(ord(ch), item.japanese) * FONT_WIDTH * item.width
+            if not ch.isspace():
+                for y in range(inset * item.height, glyph_height - inset * item.height):
+                    row = block[y]
+                    for dx in range(inset, w - inset):
+                        if x + dx < DOTS_PER_LINE:
+                            row[x + dx] = 1
+            x += w
+        rows.extend(block)
+    return DOTS_PER_LINE, len(rows), rows
+
+
+def write_pbm(path, slip):
+    """Writes the block bitmap preview as a binary PBM image."""
+    width, height, rows = bitmap(slip)
+    with open(path, 'wb') as f:
+        f.write(b'P4\n%d %d\n' % (width, height))
+        for row in rows:
+            packed = bytearray(width // 8)
+            for x in range(width):
+                if row[x]:
+                    packed[x >> 3] |= 0x80 >> (x & 7)
+            f.write(packed)
+
+
+def render_slips(layers=('ko', 'sekki', 'shiki'), numbers=None):
+    """Yields (layer, number, bytes) for the catalog slips, rendered by ko-calendar.py."""
+    import shutil
+    import tempfile
+    import host_calendar
+    from gy_ep204x import Ticket
+    workdir = tempfile.mkdtemp(prefix='ko-slips-')
+    try:
+        cal = host_calendar.load_calendar(workdir)
+        renderers = {'ko': (cal.catalog.ko, cal.render_microseason),
+                     'sekki': (cal.catalog.sekki, cal.render_mini_season),
+                     'shiki': (cal.catalog.shiki, cal.render_macro_season)}
+        ticket = Ticket()
+        for layer in layers:
+            records, render = renderers[layer]
+            for record in records:
+                if numbers and record.number not in numbers:
+                    continue
+                render(ticket.clear(), record)
+                yield layer, record.number, bytes(ticket.view())
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Interpret GY_EP204X ESC/POS output and estimate its cost.")
+    parser.add_argument('stream', nargs='?', help="file holding a captured byte stream")
+    parser.add_argument('--slips', action='store_true', help="report every catalog slip")
+    parser.add_argument('--slip', nargs=2, metavar=('LAYER', 'NUMBER'), help="render one slip, e.g. ko 5")
+    parser.add_argument('--baud', type=int, default=115200)
+    parser.add_argument('--pbm', help="write a bitmap preview to this file")
+    parser.add_argument('-q', '--quiet', action='store_true', help="skip the text preview")
+    args = parser.parse_args(argv)
+
+    if args.slips:
+        totals = Slip(args.baud)
+        print("layer  no  bytes  rows  paper_mm  uart_ms  print_s")
+        for layer, number, data in render_slips():
+            slip = run(data, args.baud)
+            r = slip.report()
+            print(f"{layer:6} {number:2}  {r['bytes']:5}  {r['dot_rows']:4}  {r['paper_mm']:8}  "
+                  f"{r['uart_ms']:7}  {r['print_s']:7}")
+            totals.byte_count += slip.byte_count
+            totals.dot_rows += slip.dot_rows
+            totals.feed_rows += slip.feed_rows
+            totals.printed_lines += slip.printed_lines
+        r = totals.report()
+        print(f"total      {r['bytes']:5}  {r['dot_rows']:4}  {r['paper_mm']:8}  {r['uart_ms']:7}  {r['print_s']:7}")
+        return 0
+    if args.slip:
+        layer, number = args.slip
+        if layer not in ('ko', 'sekki', 'shiki') or not number.isdigit():
+            print(f"No slip {layer} {number}: the layer is ko, sekki or shiki and the number a season number.")
+            return 1
+        data = next((d for _, _, d in render_slips((layer,), (int(number),))), None)
+        if data is None:
+            print(f"No {layer} season {number} in the catalog.")
+            return 1
+    elif args.stream:
+        with open(args.stream, 'rb') as f:
+            data = f.read()
+    else:
+        data = sys.stdin.buffer.read()
+    slip = run(data, args.baud)
+    if not args.quiet:
+        print(text_preview(slip))
+    print(slip.report())
+    if slip.unknown:
+        print(f"Unsupported commands: {slip.unknown}")
+    if args.pbm:
+        write_pbm(args.pbm, slip)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
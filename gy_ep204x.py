@@ -1,95 +1,272 @@
-import time
-from machine import Pin, UART
+from hal import Pin, UART, time
 
-version = "1.0.3"
-class GY_EP204X:
-    def __init__(self, baudrate=115200, tx_pin=4, rx_pin=5):
-        self.uart = UART(1, baudrate, tx=Pin(tx_pin), rx=Pin(rx_pin))
-        self.uart.init(bits=8, parity=None, stop=1)
+version = "1.3.2"
+
+TX_CHUNK = 256  # bytes per uart.write when flushing a ticket, matches the default UART TX buffer
+TICKET_SIZE = 512  # initial ticket buffer, large enough for one season slip
+FEED_DELAY = 0.05  # seconds per line or pixel row fed
+LINE_CELLS = 32  # half-width character cells per line at normal size
+BREAK_CACHE_SIZE = 256  # wrapped strings remembered by print_with_breaks
+
+
+def char_cells(code, japanese=True):
+    """Returns the half-width cells a code point takes: 2 for kanji and other full-width glyphs."""
+    if code >= 0x2E80:
+        return 2
+    # With the Japanese character set, symbols such as ● come from the kanji font
+    return 2 if japanese and 0x2000 <= code < 0x2E80 else 1
+
+
+def line_breaks(data, line_length, japanese=True):
+    """Returns the line break offsets for UTF-8 text, computed in one pass over its bytes.
+
+    The result is a flat list of (end, next start) byte offsets, one pair per
+    line: breaks go at the last space that fits, or mid-word if a word is
+    longer than a line.
+    """
+    breaks = []
+    start = cells = 0
+    space = -1  # offset of the last space on the current line
+    space_cells = 0  # cells up to that space
+    i, n = 0, len(data)
+    while i < n:
+        b = data[i]
+        if b < 0x80:
+            size, width = 1, 1
+        elif b < 0xE0:
+            size, width = 2, 1  # Latin-1 and other accented letters
+        elif b < 0xF0:
+            size = 3
+            width = char_cells(((b & 0x0F) << 12) | ((data[i + 1] & 0x3F) << 6) | (data[i + 2] & 0x3F), japanese)
+        else:
+            size, width = 4, 2
+        if b == 0x20:
+            space, space_cells = i, cells
+        elif cells + width > line_length and i > start:
+            if space > start:
+                breaks += (space, space + 1)
+                cells -= space_cells + 1
+                start = space + 1
+            else:
+                breaks += (i, i)
+                cells = 0
+                start = i
+            space = -1
+        cells += width
+        i += size
+    breaks += (n, n)
+    return breaks
+
+
+_break_cache = {}  # (text, line length, Japanese charset) -> (UTF-8 bytes, line_breaks())
+
+
+class _Commands:
+    # ESC/POS formatting shared by the printer and by Ticket; subclasses
+    # provide _write (bytes out), _write_byte and _wait (feed delay).
+    _size = 1  # GS ! width multiplier currently selected
+    _japanese = False  # ESC 9 Japanese character set selected
 
     def send_command(self, command: str):
         # Send a command string to the printer.
-        self.uart.write(bytes(command, "ascii"))
+        self._write(bytes(command, "ascii"))
 
     def print(self, text):
         # Code to send text to the printer
-        self.uart.write(text.encode('utf-8'))
-
-    def print_with_breaks(self, text, line_length=32):
-        # Print text broken at spaces to fit within line_length
-        words = text.split(' ')
-        current_line = ''
-        for word in words:
-            if len(current_line) + len(word) + 1 <= line_length:
-                if current_line:
-                    current_line += ' '
-                current_line += word
-            else:
-                self.print(current_line + '\n')
-                current_line = word
-        if current_line:
-            self.print(current_line + '\n')
+        self._write(text.encode('utf-8'))
 
-    def _set_timeout(self, period_s: float) -> None:
-        # Set a timeout before future commands can be sent.
-        self._resume = time.ticks_ms() + period_s * 1000
+    def print_with_breaks(self, text, line_length=None):
+        # Print text broken at spaces to fit within line_length cells, by default
+        # a full line at the current character size
+        if line_length is None:
+            line_length = LINE_CELLS // self._size
+        key = (text, line_length, self._japanese)
+        entry = _break_cache.get(key)
+        if entry is None:
+            if len(_break_cache) >= BREAK_CACHE_SIZE:
+                _break_cache.clear()
+            data = text.encode('utf-8')
+            entry = _break_cache[key] = (data, line_breaks(data, line_length, self._japanese))
+        data, breaks = entry
+        mv = memoryview(data)
+        start = 0
+        for i in range(0, len(breaks), 2):
+            end = breaks[i]
+            if end > start:
+                self._write(mv[start:end])
+                self._write_byte(10)
+            start = breaks[i + 1]
 
     def feed(self, lines: int):
         """Advance paper by specified number of blank lines."""
         assert 0 <= lines <= 255
-        self.send_command(f"\x1Bd{chr(lines)}")
-        time.sleep(lines * 0.05)
+        self._write(b"\x1Bd")
+        self._write_byte(lines)
+        self._wait(lines * FEED_DELAY)
 
     def feed_rows(self, rows: int):
         """Advance paper by specified number of pixel rows."""
         assert 0 <= rows <= 255
-        self.send_command(f"\x1BJ{chr(rows)}")
-        time.sleep(rows * 0.05)
+        self._write(b"\x1BJ")
+        self._write_byte(rows)
+        self._wait(rows * FEED_DELAY)
 
     def center_justify(self):
-        self.send_command("\x1Ba\x01")
+        self._write(b"\x1Ba\x01")
 
     def double_height(self):
-        self.send_command("\x1D!\x01")
+        self._write(b"\x1D!\x01")
+        self._size = 1
 
     def double_width(self):
-        self.send_command("\x1D!\x10")
+        self._write(b"\x1D!\x10")
+        self._size = 2
 
     def double_height_width(self):
-        self.send_command("\x1D!\x11")
-    
+        self._write(b"\x1D!\x11")
+        self._size = 2
+
     def triple_height_width(self):
-        self.send_command("\x1D!\x22")
+        self._write(b"\x1D!\x22")
+        self._size = 3
 
     def bold(self, enable=True):
         if enable:
-            self.send_command("\x1BG\x01")
+            self._write(b"\x1BG\x01")
         else:
-            self.send_command("\x1BG\x00")
+            self._write(b"\x1BG\x00")
 
     def underline(self, enable=True):
         if enable:
-            self.send_command("\x1B-\x01")
+            self._write(b"\x1B-\x01")
         else:
-            self.send_command("\x1B-\x00")
+            self._write(b"\x1B-\x00")
 
     def left_justify(self):
-        self.send_command("\x1Ba\x00")
+        self._write(b"\x1Ba\x00")
 
     def right_justify(self):
-        self.send_command("\x1Ba\x02")
+        self._write(b"\x1Ba\x02")
 
     def highlight(self, enable=True):
         if enable:
-            self.send_command("\x1DB\x01")
+            self._write(b"\x1DB\x01")
         else:
-            self.send_command("\x1DB\x00")
+            self._write(b"\x1DB\x00")
 
     def normal_size(self):
-        self.send_command("\x1D!\x00")
+        self._write(b"\x1D!\x00")
+        self._size = 1
 
     def set_japanese_charset(self):
-        self.send_command("\x1B9\x01")
+        self._write(b"\x1B9\x01")
+        self._japanese = True
 
     def reset(self):
-        self.send_command("\x1B@")
\ No newline at end of file
+        self._write(b"\x1B@")
+        self._size = 1
+        self._japanese = False
+
+
+class Ticket(_Commands):
+    """Collects the commands and text for a whole slip in one preallocated buffer."""
+
+    def __init__(self, size=TICKET_SIZE):
+        self.buf = bytearray(size)
+        self.length = 0
+        self.feed_time = 0.0  # seconds of paper movement to wait for after sending
+
+    def clear(self):
+        self.length = 0
+        self.feed_time = 0.0
+        self._size = 1
+        self._japanese = False
+        return self
+
+    def _reserve(self, size):
+        end = self.length + size
+        if end > len(self.buf):
+            # Grow rarely and generously rather than once per append, into a new buffer:
+            # resizing in place would break a view() or chunk of the old one still held
+            grown = bytearray(max(end, 2 * len(self.buf)))
+            grown[:self.length] = memoryview(self.buf)[:self.length]
+            self.buf = grown
+        return end
+
+    def _write(self, data):
+        end = self._reserve(len(data))
+        self.buf[self.length:end] = data
+        self.length = end
+
+    def _write_byte(self, value):
+        end = self._reserve(1)
+        self.buf[self.length] = value
+        self.length = end
+
+    def _wait(self, seconds):
+        self.feed_time += seconds
+
+    def view(self):
+        return memoryview(self.buf)[:self.length]
+
+
+class GY_EP204X(_Commands):
+    def __init__(self, baudrate=115200, tx_pin=4, rx_pin=5):
+        self.uart = UART(1, baudrate, tx=Pin(tx_pin), rx=Pin(rx_pin))
+        self.uart.init(bits=8, parity=None, stop=1)
+        self._byte = bytearray(1)
+        self._ticket = None
+        self._chunk = None  # reusable read buffer for print_blob
+
+    def _write(self, data):
+        self.uart.write(data)
+
+    def _write_byte(self, value):
+        self._byte[0] = value
+        self.uart.write(self._byte)
+
+    def _wait(self, seconds):
+        time.sleep(seconds)
+
+    def _set_timeout(self, period_s: float) -> None:
+        # Set a timeout before future commands can be sent.
+        self._resume = time.ticks_add(time.ticks_ms(), int(period_s * 1000))
+
+    def ticket(self):
+        """Returns the printer's reusable Ticket, emptied and ready for a new slip."""
+        if self._ticket is None:
+            self._ticket = Ticket()
+        return self._ticket.clear()
+
+    def print_ticket(self, ticket, chunk=TX_CHUNK):
+        """Sends a Ticket in TX-buffer-sized slices, then waits for its paper feeds."""
+        data = ticket.view()
+        for start in range(0, ticket.length, chunk):
+            self.uart.write(data[start:start + chunk])
+        time.sleep(ticket.feed_time)
+
+    def print_rendered(self, render, *args):
+        """Renders a slip with render(ticket, *args) into the reusable ticket and prints it."""
+        ticket = self.ticket()
+        render(ticket, *args)
+        self.print_ticket(ticket)
+
+    def _chunks(self, f, length, chunk):
+        # Yields memoryviews of up to chunk bytes read from f into one reusable buffer
+        if self._chunk is None or len(self._chunk) < chunk:
+            self._chunk = bytearray(chunk)
+        mv = memoryview(self._chunk)
+        while length > 0:
+            n = f.readinto(mv[:min(chunk, length)])
+            if not n:
+                break
+            yield mv[:n]
+            length -= n
+
+    def print_blob(self, path, offset, length, feed_time, chunk=TX_CHUNK):
+        """Streams pre-rendered printer bytes from a file to the UART, then waits for their paper feeds."""
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            for data in self._chunks(f, length, chunk):
+                self.uart.write(data)
+        time.sleep(feed_time)
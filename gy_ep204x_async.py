@@ -0,0 +1,99 @@
+# Non-blocking variant of the GY_EP204X driver for use under asyncio.
+# Paper feeds set a resume deadline instead of sleeping; anything written
+# before the printer is ready is queued and sent by a background task.
+
+from hal import asyncio, time
+from gy_ep204x import GY_EP204X, TX_CHUNK
+
+version = "1.2.1"
+
+
+class AsyncGY_EP204X(GY_EP204X):
+    def __init__(self, baudrate=115200, tx_pin=4, rx_pin=5):
+        super().__init__(baudrate, tx_pin, rx_pin)
+        self._resume = time.ticks_ms()
+        self._queue = []  # [data, delay_ms] waiting for the printer to be ready
+        self._drain_task = None
+        self.lock = asyncio.Lock()  # held while a ticket is rendered and sent
+
+    def _remaining_ms(self):
+        return max(0, time.ticks_diff(self._resume, time.ticks_ms()))
+
+    def ready(self):
+        """True when no feed is in progress and nothing is queued."""
+        return not self._queue and self._remaining_ms() == 0
+
+    def _write(self, data):
+        if self.ready():
+            self.uart.write(data)
+            return
+        self._queue.append([bytes(data), 0])
+        if self._drain_task is None:
+            self._drain_task = asyncio.create_task(self._drain())
+
+    def _write_byte(self, value):
+        # Through the same queue as _write, so a feed's count byte cannot overtake its command
+        if self.ready():
+            super()._write_byte(value)
+        else:
+            self._write(bytes((value,)))
+
+    def _wait(self, seconds):
+        if self._queue:
+            # Applied after the queued command that caused it has been sent
+            self._queue[-1][1] += int(seconds * 1000)
+        else:
+            self._set_timeout(seconds)
+
+    def _set_timeout(self, period_s: float) -> None:
+        # Push the resume deadline out by period_s from now, or from the current deadline if later
+        now = time.ticks_ms()
+        start = self._resume if time.ticks_diff(self._resume, now) > 0 else now
+        self._resume = time.ticks_add(start, int(period_s * 1000))
+
+    async def _drain(self):
+        while self._queue:
+            await asyncio.sleep_ms(self._remaining_ms())
+            data, delay = self._queue.pop(0)
+            self.uart.write(data)
+            self._resume = time.ticks_add(time.ticks_ms(), delay)
+        self._drain_task = None
+
+    async def wait_ready(self):
+        """Waits, without blocking other tasks, until queued commands are sent and paper has stopped."""
+        while not self.ready():
+            await asyncio.sleep_ms(self._remaining_ms() or 10)
+
+    async def print_ticket(self, ticket, chunk=TX_CHUNK):
+        await self.wait_ready()
+        data = ticket.view()
+        for start in range(0, ticket.length, chunk):
+            self.uart.write(data[start:start + chunk])
+            await asyncio.sleep_ms(0)
+        self._set_timeout(ticket.feed_time)
+
+    async def print_rendered(self, render, *args):
+        """Renders into the shared ticket and sends it; concurrent callers take turns."""
+        async with self.lock:
+            await self.send_rendered(render, *args)
+
+    async def send_rendered(self, render, *args):
+        # print_rendered for a caller already holding self.lock, e.g. to print several slips as one job
+        ticket = self.ticket()
+        render(ticket, *args)
+        await self.print_ticket(ticket)
+
+    async def print_blob(self, path, offset, length, feed_time, chunk=TX_CHUNK):
+        """Streams a pre-rendered slip from a file without blocking; concurrent callers take turns."""
+        async with self.lock:
+            await self.send_blob(path, offset, length, feed_time, chunk)
+
+    async def send_blob(self, path, offset, length, feed_time, chunk=TX_CHUNK):
+        # print_blob for a caller already holding self.lock
+        await self.wait_ready()
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            for data in self._chunks(f, length, chunk):
+                self.uart.write(data)
+                await asyncio.sleep_ms(0)
+        self._set_timeout(feed_time)
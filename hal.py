@@ -0,0 +1,25 @@
+# Hardware access for the calendar. On the device these are the real
+# MicroPython modules; on CPython they come from sim.py, whose stand-ins
+# capture printer output and run on a virtual clock.
+
+try:
+    import machine
+    SIMULATED = False
+except ImportError:
+    SIMULATED = True
+
+if SIMULATED:
+    from sim import Pin, UART, RTC, reset, lightsleep, deepsleep, mem32, network, ntptime, asyncio, micropython
+    from sim import clock as time
+else:
+    import time
+    import network
+    import ntptime
+    import micropython
+    from machine import Pin, UART, RTC, reset, lightsleep, deepsleep, mem32
+    try:
+        import asyncio
+    except ImportError:
+        import uasyncio as asyncio
+
+version = "1.3.0"
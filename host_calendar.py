@@ -0,0 +1,56 @@
+# Loads ko-calendar.py on CPython so host tools such as calendar_service.py
+# and escpos_emulator.py can call its lookups and slip renderers. Unlike
+# simulate.load_calendar it changes nothing process-wide: there is no chdir,
+# the Wi-Fi credentials module the script imports is stood in for only while
+# it is imported, and the module is not registered in sys.modules. The season
+# catalog is read from the repository, and the files the calendar writes go
+# to a directory the caller names. hal.py still selects the sim.py stand-ins,
+# but nothing loaded here drives them.
+
+import contextlib
+import importlib.util
+import io
+import os
+import sys
+import types
+
+from print_spool import PrintSpool, SPOOL_FILE
+from season_catalog import open_catalog
+from solar_terms import SolarTerms, CACHE_FILE as SOLAR_FILE
+from state_journal import StateJournal, STATE_FILE
+from ticket_cache import TicketCache, CACHE_FILE as TICKET_FILE
+
+version = "1.0.0"
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(HERE, 'ko-calendar.py')
+
+
+def load_calendar(data_dir, catalog_dir=HERE):
+    """Returns a new ko-calendar module reading its catalog from catalog_dir and writing its caches to data_dir."""
+    spec = importlib.util.spec_from_file_location('ko_calendar', SCRIPT)
+    cal = importlib.util.module_from_spec(spec)
+    credentials = types.ModuleType('secrets')
+    credentials.WIFI_SSID = credentials.WIFI_PASSWORD = ''
+    saved = sys.modules.get('secrets')
+    sys.modules['secrets'] = credentials
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):  # the version banner
+            spec.loader.exec_module(cal)
+    finally:
+        if saved is None:
+            del sys.modules['secrets']
+        else:
+            sys.modules['secrets'] = saved
+    # The script opened its files relative to the working directory; point them at the given ones
+    close = getattr(cal.catalog, 'close', None)
+    if close:
+        close()
+    with contextlib.redirect_stdout(io.StringIO()):  # catalog messages
+        cal.catalog = open_catalog(catalog_dir)
+        cal.catalog.refresh()
+    cal.solar_terms = SolarTerms(os.path.join(data_dir, SOLAR_FILE))
+    cal.tickets = TicketCache(os.path.join(data_dir, TICKET_FILE))
+    cal.state = StateJournal(os.path.join(data_dir, STATE_FILE))
+    cal.spool = PrintSpool(cal.state, os.path.join(data_dir, SPOOL_FILE))
+    return cal
@@ -0,0 +1,126 @@
+# Incremental reader for the catalog JSON files: a top-level array of flat
+# objects, optionally wrapped in an object ({"seasons": [...]}). The file is
+# read in small chunks into one reusable buffer and each record's raw bytes
+# are collected into a second one, so only the object being looked at is
+# ever in memory, and only a matching one is decoded.
+
+import json
+
+version = "1.0.1"
+
+CHUNK_SIZE = 64  # bytes read from flash at a time
+RECORD_SIZE = 512  # initial record buffer; grows if a record is longer
+
+
+class RecordReader:
+    """Yields the raw bytes of each record object in a JSON catalog file."""
+
+    def __init__(self, chunk=CHUNK_SIZE, record=RECORD_SIZE):
+        self._chunk = bytearray(chunk)
+        self._record = bytearray(record)
+        self.length = 0  # bytes of the current record
+
+    def _append(self, data):
+        end = self.length + len(data)
+        if end > len(self._record):
+            # A new buffer rather than resizing in place: a view of the old one may still be held
+            grown = bytearray(max(end, 2 * len(self._record)))
+            grown[:self.length] = memoryview(self._record)[:self.length]
+            self._record = grown
+        self._record[self.length:end] = data
+        self.length = end
+
+    def records(self, path):
+        """Yields a memoryview of each record; it is only valid until the next one."""
+        chunk = self._chunk
+        cmv = memoryview(chunk)
+        depth = 0
+        array_depth = -1  # depth inside the array that holds the records
+        in_string = escape = False
+        start = -1  # offset in chunk where the current record began, or 0 when it began earlier
+        with open(path, 'rb') as f:
+            while True:
+                n = f.readinto(chunk)
+                if not n:
+                    return
+                if start >= 0:
+                    start = 0
+                for i in range(n):
+                    b = chunk[i]
+                    if in_string:
+                        if escape:
+                            escape = False
+                        elif b == 0x5C:  # backslash
+                            escape = True
+                        elif b == 0x22:
+                            in_string = False
+                    elif b == 0x22:
+                        in_string = True
+                    elif b == 0x7B or b == 0x5B:  # { [
+                        if b == 0x7B and depth == array_depth and start < 0:
+                            start = i
+                            self.length = 0
+                        depth += 1
+                        if b == 0x5B and array_depth < 0:
+                            array_depth = depth
+                    elif b == 0x7D or b == 0x5D:  # } ]
+                        depth -= 1
+                        if b == 0x7D and depth == array_depth and start >= 0:
+                            self._append(cmv[start:i + 1])
+                            start = -1
+                            yield memoryview(self._record)[:self.length]
+                if start >= 0:
+                    self._append(cmv[start:n])
+
+    def find(self, path, predicate):
+        """Returns the first record for which predicate(raw bytes) is true, decoded, or None."""
+        for raw in self.records(path):
+            if predicate(raw):
+                return json.loads(bytes(raw))
+        return None
+
+    def load(self, path, predicate=None):
+        """Yields every record (or every matching one) decoded, one at a time."""
+        for raw in self.records(path):
+            if predicate is None or predicate(raw):
+                yield json.loads(bytes(raw))
+
+
+def raw_field(raw, key):
+    """Returns the raw bytes of a top-level field's value (strings without quotes), or None."""
+    raw = bytes(raw)
+    i = raw.find(b'"' + key.encode() + b'"')
+    if i < 0:
+        return None
+    i = raw.find(b':', i + len(key) + 2) + 1
+    while raw[i] in b' \t\r\n':
+        i += 1
+    if raw[i] == 0x22:
+        return raw[i + 1:raw.find(b'"', i + 1)]
+    end = i
+    while end < len(raw) and raw[end] not in b',} \t\r\n':
+        end += 1
+    return raw[i:end]
+
+
+def field_equals(key, value):
+    """Predicate: the record's numeric or string field key equals value."""
+    target = str(value).encode()
+
+    def predicate(raw):
+        return raw_field(raw, key) == target
+    return predicate
+
+
+def covers_date(month, day):
+    """Predicate: the record's "start"/"end" MM-DD range includes a date, wrapping at the year end."""
+    target = b'%02d-%02d' % (month, day)
+
+    def predicate(raw):
+        start, end = raw_field(raw, 'start'), raw_field(raw, 'end')
+        if start is None or end is None:
+            return False
+        if start <= end:
+            return start <= target <= end
+        return target >= start or target <= end
+    return predicate
@@ -2,14 +2,25 @@
 # https://www.nippon.com/en/features/h00124/
 # by Rob Faludi 2025
 
-import time
-import re
-import json
+import os
 import secrets  # separate file that contains your WiFi credentials
-import network
-from machine import Pin, reset, RTC
-import ntptime
-import gy_ep204x
+from array import array
+from hal import Pin, asyncio, time, micropython
+import gy_ep204x, gy_ep204x_async
+from season_catalog import open_catalog, Season, KO_FILE, SEKKI_FILE, SHIKI_FILE, PACKED_FILE
+from season_index import STARTS_KO, STARTS_SEKKI, STARTS_SHIKI, month_day
+from season_schedule import Schedule, PRINT_HOUR
+from tz import TimeZone
+from timeutil import is_leap, civil_from_days, days_from_civil, epoch_seconds
+from solar_terms import SolarTerms
+import ticket_cache
+import metrics
+from season_search import SearchIndex, de_accent
+from state_journal import StateJournal, LAST_KO, CURSOR
+from timekeeper import TimeKeeper
+from power import Power, AWAKE, DEEP, MODE_NAMES
+from print_spool import PrintSpool, job_key, key_day, key_rank, RANK_SHIKI, RANK_SEKKI, RANK_KO
+from ticket_cache import TicketCache, LAYER_KO, LAYER_SEKKI, LAYER_SHIKI
 
 version = "1.0.17"
 print("Ko Microseason Calendar - Version:", version)
@@ -18,11 +29,24 @@ print("Ko Microseason Calendar - Version:", version)
 ssid = secrets.WIFI_SSID  # your SSID name stored in secrets.py
 password = secrets.WIFI_PASSWORD  # your WiFi password stored in secrets.py
 
-UTC_OFFSET = -5  # Adjust as needed for your timezone
-USE_DST = True  # Set to True if your timezone observes Daylight Saving Time
+# POSIX TZ rule for your timezone, e.g. "EST5EDT,M3.2.0,M11.1.0" (US Eastern),
+# "CET-1CEST,M3.5.0,M10.5.0/3" (Central Europe) or "JST-9" (Japan, no DST)
+TIMEZONE = "EST5EDT,M3.2.0,M11.1.0"
+tz = TimeZone(TIMEZONE)
 
 show_macro_season = True  # Set to True to print macro seasons
 show_mini_season = True  # Set to True to print mini seasons
+USE_SOLAR_TERMS = True  # Set to True to follow the sun's exact kō boundaries rather than the fixed JSON dates
+STREAM_CATALOG = True  # Without seasons.bin, read each season from the JSON files when needed rather than keeping all in RAM
+POWER_MODE = AWAKE  # AWAKE keeps the CPU running; LIGHT lightsleeps and DEEP deepsleeps between events, for batteries
+PROFILE = False  # Set to True to record span timings and heap use; dump them at the REPL with metrics.dump()
+
+if PROFILE:
+    metrics.enable()
+
+CATCH_UP_DAYS = 30  # after a longer outage, slips older than this are not printed
+MAX_SLEEP = 5 * 86400  # longest single sleep, well inside the ~6 day ticks_ms half-range
+SLIP_FORMAT = 1  # bump whenever the render_* functions change what a slip prints; keys the ticket cache
 
 month_names = [
     "Jan", "Feb", "Mar", "Apr", "May", "Jun",
@@ -30,217 +54,223 @@ month_names = [
 
 LED = Pin("LED", Pin.OUT)      # digital output for status LED
 
-def connect_to_wifi():
-    wlan = network.WLAN(network.STA_IF)
-    wlan.active(True)
-    # Connect to network
-    wlan.connect(ssid, password)
-    connection_timeout = 10
-    while connection_timeout > 0:
-        if wlan.status() >= 3:
-            break
-        connection_timeout -= 1
-        print('Waiting for Wi-Fi connection...')
-        blink_led(1, 0.1)
-        time.sleep(1)
-    # Check if connection is successful
-    if wlan.status() != 3:
-        print('Failed to establish a network connection')
-        return False
-    else:
-        print('Connection successful!')
-        network_info = wlan.ifconfig()
-        print('IP address:', network_info[0])
-        return True
-    
 def setup_printer():
-    printer = gy_ep204x.GY_EP204X(baudrate=115200, tx_pin=4, rx_pin=5)
+    printer = gy_ep204x_async.AsyncGY_EP204X(baudrate=115200, tx_pin=4, rx_pin=5)
     printer.reset()
     printer.set_japanese_charset()  # Set to Japanese character set
     return printer
 
-def load_microseasons():
-    try:
-        with open('microseasons_ko.json', 'r') as f:
-            microseasons_str = f.read()
-            microseasons = json.loads(microseasons_str)
-            # print(microseasons)
-    except OSError:
-        print("Failed to open json file.")
-        microseasons = []
-    return microseasons
-
-def load_mini_seasons():
-    try:
-        with open('mini_seasons_sekki.json', 'r') as f:
-            mini_seasons_str = f.read()
-            mini_seasons = json.loads(mini_seasons_str)
-            # print(mini_seasons)
-    except OSError:
-        print("Failed to open json file.")
-        mini_seasons = []
-    return mini_seasons
-
-def load_seasons():
-    try:
-        with open('seasons_shiki.json', 'r') as f:
-            seasons_str = f.read()
-            seasons = json.loads(seasons_str)
-            # print(seasons)
-    except OSError:
-        print("Failed to open json file.")
-        seasons = []
-    return seasons
-
-def print_macro_season(printer):
-    macro_seasons = load_seasons()
-    for macro in macro_seasons:
-        try:
-            sm, sd = map(int, macro['start'].split('-'))
-            em, ed = map(int, macro['end'].split('-'))
-        except Exception:
-            continue
-        if sm == local_time(UTC_OFFSET)[1] and sd == local_time(UTC_OFFSET)[2]:
-            print(f"Printing season: {macro['en']}")
-            printer.center_justify()
-            printer.print('===============[]=============\n')
-            printer.double_height_width()
-            printer.bold(True)
-            printer.print_with_breaks(f"{macro['en']}", line_length=16)
-            printer.bold(False)
-            printer.feed(1)
-            printer.set_japanese_charset() # Set to Japanese character set
-            printer.triple_height_width()
-            printer.print(macro['kanji'] + '\n')
-            printer.normal_size()
-            printer.feed_rows(6)
-            printer.print_with_breaks(f"{macro['romaji']}", line_length=32)
-            printer.normal_size()
-            printer.feed(1)
-            printer.bold(True)
-            printer.print(f"{month_names[sm-1]} {sd} - {month_names[em-1]} {ed}\n")
-            printer.bold(False)
-            printer.feed(1)
-
-def print_mini_season(printer):
-    mini_seasons = load_mini_seasons()
-    for mini in mini_seasons:
+def render_macro_season(ticket, macro):
+    ticket.center_justify()
+    ticket.print('===============[]=============\n')
+    ticket.double_height_width()
+    ticket.bold(True)
+    ticket.print_with_breaks(macro.en)
+    ticket.bold(False)
+    ticket.feed(1)
+    ticket.set_japanese_charset() # Set to Japanese character set
+    ticket.triple_height_width()
+    ticket.print(macro.kanji + '\n')
+    ticket.normal_size()
+    ticket.feed_rows(6)
+    ticket.print_with_breaks(macro.romaji)
+    ticket.normal_size()
+    ticket.feed(1)
+    ticket.bold(True)
+    ticket.print(f"{month_names[macro.start_month-1]} {macro.start_day} - {month_names[macro.end_month-1]} {macro.end_day}\n")
+    ticket.bold(False)
+    ticket.feed(1)
+
+async def print_macro_season(printer, macro):
+    print(f"Printing season: {macro.en}")
+    await print_slip(printer, LAYER_SHIKI, render_macro_season, macro)
+
+def render_mini_season(ticket, mini):
+    ticket.center_justify()
+    ticket.print('===============[ ]=============\n')
+    ticket.double_height_width()
+    ticket.bold(True)
+    ticket.print_with_breaks(mini.en)
+    ticket.bold(False)
+    ticket.feed(1)
+    ticket.set_japanese_charset()  # Set to Japanese character set
+    ticket.triple_height_width()
+    ticket.print(mini.kanji + '\n')
+    ticket.normal_size()
+    ticket.feed_rows(6)
+    ticket.print_with_breaks(mini.romaji)
+    ticket.normal_size()
+    ticket.feed(1)
+    ticket.bold(True)
+    ticket.print(f"{month_names[mini.start_month-1]} {mini.start_day} - {month_names[mini.end_month-1]} {mini.end_day}\n")
+    ticket.bold(False)
+    ticket.feed(1)
+
+async def print_mini_season(printer, mini):
+    print(f"Printing mini season: {mini.en}")
+    await print_slip(printer, LAYER_SEKKI, render_mini_season, mini)
+
+def list_microseasons(catalog):
+    for ms in catalog.ko:
+        print(f"{ms.number:02d}: {ms.en} ({de_accent(ms.romaji)}) -> {ms.start_month:02d}-{ms.start_day:02d} to {ms.end_month:02d}-{ms.end_day:02d}")
+
+def load_state():
+    # Reads the state journal into RAM once at boot, carrying over an older current_season.txt
+    state.load()
+    if not state.get(LAST_KO) and not spool.printed():
         try:
-            sm, sd = map(int, mini['start'].split('-'))
-            em, ed = map(int, mini['end'].split('-'))
-        except Exception:
-            continue
-        if sm == local_time(UTC_OFFSET)[1] and sd == local_time(UTC_OFFSET)[2]:
-            print(f"Printing mini season: {mini['en']}")
-            printer.center_justify()
-            printer.print('===============[ ]=============\n')
-            printer.double_height_width()
-            printer.bold(True)
-            printer.print_with_breaks(f"{mini['en']}", line_length=16)
-            printer.bold(False)
-            printer.feed(1)
-            printer.set_japanese_charset()  # Set to Japanese character set
-            printer.triple_height_width()
-            printer.print(mini['kanji'] + '\n')
-            printer.normal_size()
-            printer.feed_rows(6)
-            printer.print_with_breaks(f"{mini['romaji']}", line_length=32)
-            printer.normal_size()
-            printer.feed(1)
-            printer.bold(True)
-            printer.print(f"{month_names[sm-1]} {sd} - {month_names[em-1]} {ed}\n")
-            printer.bold(False)
-            printer.feed(1)
-
-def list_microseasons(microseasons):
-    for ms in microseasons['seasons']:
-        print(f"{ms['number']:02d}: {ms['en']} ({de_accent(ms['romaji'])}) -> {ms['start']} to {ms['end']}")  
-
-def store_current_season(microseason):
-    try:
-        with open('current_season.txt', 'w') as f:
-            f.write(str(microseason['number']))
-    except OSError:
-        print("Failed to write current season to file.")
+            with open('current_season.txt', 'r') as f:
+                state.set(LAST_KO, int(f.read()))
+            os.remove('current_season.txt')
+        except (OSError, ValueError):
+            pass
 
 def load_current_season():
+    # The kō of the last scheduled slip printed, worked out from the spool's key: the kō that
+    # started on its day, or for a shiki or sekki key the one in effect the day before.
+    # LAST_KO only holds what older versions printed, until the spool has printed something
+    key = spool.printed()
+    if not key:
+        return state.get(LAST_KO)
+    y, m, d = civil_from_days(key_day(key) - (key_rank(key) != RANK_KO))
+    return calendar_index(y).lookup(m, d)[0]
+
+search_index = None
+def find_seasons(query):
+    # (layer, season) for seasons whose English, romaji or kanji names match every word of query by prefix,
+    # e.g. find_seasons("kiji") or find_seasons("雉"); the index is built on first use
+    global search_index
+    if search_index is None:
+        search_index = SearchIndex(catalog)
+    layers = {'ko': catalog.ko, 'sekki': catalog.sekki, 'shiki': catalog.shiki}
+    return [(layer, catalog.get(layers[layer], number)) for layer, number in search_index.search(query)]
+
+def get_microseason_for_number(catalog, number):
+    return catalog.get(catalog.ko, number)
+
+def calendar_index(year=None, zone=None):
+    # Day-of-year index for a year: exact solar boundaries if enabled and the year
+    # is known, otherwise the catalog's fixed dates. zone defaults to this device's tz.
+    if USE_SOLAR_TERMS and year is not None:
+        return solar_terms.index(year, zone or tz)
+    return catalog.index
+
+def with_dates(record, index, table, year):
+    # Copy of a season record carrying the dates it actually covers in a year's solar index
+    if index is catalog.index:
+        return record
+    span = index.span(table, record.number)
+    if span is None:
+        return record
+    sm, sd = month_day(span[0])
+    em, ed = month_day(span[1])
+    if (em, ed) == (2, 29) and not is_leap(year):
+        ed = 28
+    return Season(record.number, record.kanji, record.romaji, record.en, sm, sd, em, ed)
+
+def get_microseason_for_date(catalog, month, day, year=None, zone=None):
+    # Returns the microseason for a given month and day from the day-of-year index,
+    # which already accounts for year-end wraparound
+    return _season_for_date(catalog, catalog.ko, 0, month, day, year, zone)
+
+def get_mini_season_for_date(catalog, month, day, year=None, zone=None):
+    return _season_for_date(catalog, catalog.sekki, 1, month, day, year, zone)
+
+def get_macro_season_for_date(catalog, month, day, year=None, zone=None):
+    return _season_for_date(catalog, catalog.shiki, 2, month, day, year, zone)
+
+def _season_for_date(catalog, records, layer, month, day, year, zone):
     try:
-        with open('current_season.txt', 'r') as f:
-            season_number = int(f.read())
-            return season_number
-    except (OSError, ValueError):
-        store_current_season({"number": 0}) # initialize file if not present
-        print("Failed to read current season from file, initializing.")
-        return 0
-    
-def de_accent(str):
-    """Removes common accent characters using regex, converts to lowercase."""
-    # new_string = old_string.lower()
-    str = re.sub(r'[àáâãäå]', 'a', str)
-    str = re.sub(r'[èéêë]', 'e', str)
-    str = re.sub(r'[ìíîï]', 'i', str)
-    str = re.sub(r'[òóôõöō]', 'o', str)
-    str = re.sub(r'[ùúûü]', 'u', str)
-    return str
-
-def get_microseason_for_number(microseasons, number):
-    for ms in microseasons.get('seasons', []):
-        if ms['number'] == number:
-            return ms
-    return None
-
-def get_microseason_for_date(microseasons, month, day):
-    # Returns the microseason for a given month and day, handling year-end wraparound
-    # ensure month/day are ints
-    try:
-        date = (int(month), int(day))
+        with metrics.span(metrics.LOOKUP):
+            number = calendar_index(year, zone).lookup(int(month), int(day))[layer]
     except Exception:
         return None
-    for ms in microseasons.get('seasons', []):
-        try:
-            sm, sd = map(int, ms['start'].split('-'))
-            em, ed = map(int, ms['end'].split('-'))
-        except Exception:
-            continue
-        start = (sm, sd)
-        end = (em, ed)
-        if start <= end:
-            # normal range within the same year
-            if start <= date <= end:
-                return ms
-        else:
-            # wraparound range (e.g., starts in December, ends in January)
-            if date >= start or date <= end:
-                return ms
-    return None 
-
-def print_microseason(printer, microseason):
-    print(f"Printing microseason {microseason['number']}: {microseason['en']}")
-    printer.center_justify()
-    printer.print('===============[●]=============\n')
-    printer.double_height_width()
-    printer.bold(True)
-    printer.print_with_breaks(f"{microseason['en']}", line_length=16)
-    printer.bold(False)
-    printer.feed(1)
-    printer.triple_height_width()
-    printer.set_japanese_charset()  # Set to Japanese character set
-    printer.print(microseason['kanji'] + '\n')
-    printer.normal_size()
-    printer.feed_rows(6)
-    printer.print_with_breaks(f"{microseason['romaji']}", line_length=32)
-    printer.normal_size()
-    printer.feed(1)
-    printer.bold(True)
-    printer.print(f"{month_names[int(microseason['start'][:2])-1]} {int(microseason['start'][3:])} - {month_names[int(microseason['end'][:2])-1]} {int(microseason['end'][3:])}\n")
-    printer.bold(False)
-    printer.feed(1)
-    printer.print('===============[●]=============\n')
-
-# def print_multiple(printer, microseasons, numbers):
+    return catalog.get(records, number)
+
+def render_microseason(ticket, microseason, header=True):
+    ticket.center_justify()
+    if header:
+        ticket.print('===============[●]=============\n')
+    ticket.double_height_width()
+    ticket.bold(True)
+    ticket.print_with_breaks(microseason.en)
+    ticket.bold(False)
+    ticket.feed(1)
+    ticket.triple_height_width()
+    ticket.set_japanese_charset()  # Set to Japanese character set
+    ticket.print(microseason.kanji + '\n')
+    ticket.normal_size()
+    ticket.feed_rows(6)
+    ticket.print_with_breaks(microseason.romaji)
+    ticket.normal_size()
+    ticket.feed(1)
+    ticket.bold(True)
+    ticket.print(f"{month_names[microseason.start_month-1]} {microseason.start_day} - {month_names[microseason.end_month-1]} {microseason.end_day}\n")
+    ticket.bold(False)
+    ticket.feed(1)
+    ticket.print('===============[●]=============\n')
+
+async def print_microseason(printer, microseason):
+    print(f"Printing microseason {microseason.number}: {microseason.en}")
+    await print_slip(printer, LAYER_KO, render_microseason, microseason)
+
+async def send_slip(printer, layer, render, record, merged=False):
+    # Streams the slip from the ticket cache, or renders it if it is not cached with these dates;
+    # merged renders a kō without the rule line the kō before it ended with. The caller holds printer.lock
+    with metrics.span(metrics.FEED):
+        await printer.wait_ready()
+    blob = None if merged else tickets.find(layer, record)
+    if blob is None:
+        with metrics.span(metrics.RENDER):
+            ticket = printer.ticket()
+            if merged:
+                render(ticket, record, False)
+            else:
+                render(ticket, record)
+        with metrics.span(metrics.UART):
+            await printer.print_ticket(ticket)
+    else:
+        with metrics.span(metrics.UART):
+            await printer.send_blob(*blob)
+
+async def print_slip(printer, layer, render, record):
+    async with printer.lock:
+        await send_slip(printer, layer, render, record)
+
+async def print_microseason_batch(printer, microseasons):
+    # Several kō back to back as one print job, so a scheduled print cannot land in between
+    async with printer.lock:
+        for microseason in microseasons:
+            print(f"Printing microseason {microseason.number}: {microseason.en}")
+            await send_slip(printer, LAYER_KO, render_microseason, microseason)
+
+def prepare_tickets(year):
+    # Renders every slip with a year's dates into the ticket cache; only does work when the
+    # year, the catalog files, the driver version or SLIP_FORMAT change
+    def slips():
+        index = calendar_index(year)
+        result = []
+        for layer, records, table, render in ((LAYER_KO, catalog.ko, index.ko, render_microseason),
+                                              (LAYER_SEKKI, catalog.sekki, index.sekki, render_mini_season),
+                                              (LAYER_SHIKI, catalog.shiki, index.shiki, render_macro_season)):
+            for record in records:
+                result.append((layer, with_dates(record, index, table, year), render))
+        return result
+    solar = (year, tz.spec) if USE_SOLAR_TERMS else ()
+    signature = ticket_cache.signature((KO_FILE, SEKKI_FILE, SHIKI_FILE, PACKED_FILE),
+                                       gy_ep204x.version, SLIP_FORMAT, *solar)
+    try:
+        with metrics.span(metrics.TICKETS):
+            rebuilt = tickets.ensure(signature, slips)
+        if rebuilt:
+            print(f"Rendered slips for {year} into the ticket cache.")
+    except OSError as e:
+        print(f"Failed to write ticket cache: {e}")
+
+# def print_multiple(printer, catalog, numbers):
 #     for num in numbers:
-#         for ms in microseasons['seasons']:
-#             if ms['number'] == num:
+#         for ms in catalog.ko:
+#             if ms.number == num:
 #                 print_microseason(printer, ms)
 
 def blink_led(times, interval=0.2):
@@ -250,84 +280,306 @@ def blink_led(times, interval=0.2):
         LED.off()
         time.sleep(interval)
 
-def local_time( UTC_offset= -4 ):
-    """Returns local time tuple adjusted for given UTC offset in hours, with rough adjustment for DST."""
-    t = time.time() + (UTC_offset * 3600)
-    if USE_DST:
-        # Simple DST adjustment: add 1 hour if in DST period (e.g., March to October)
-        month = time.localtime(t)[1]
-        if 3 <= month <= 10:
-            t += 3600
-    return time.localtime(t)
-
-def show_time():
-    lt = local_time(UTC_OFFSET)
+async def blink(times, interval=0.2):
+    # Like blink_led, but lets other tasks run, e.g. while a print is in progress
+    for _ in range(times):
+        LED.on()
+        await asyncio.sleep(interval)
+        LED.off()
+        await asyncio.sleep(interval)
+
+def local_time(t=None):
+    """Returns the local time tuple for a UTC epoch instant (default now), DST included."""
+    return tz.localtime(t)
+
+def show_time(lt=None):
+    if lt is None:
+        lt = local_time()
     print(f"Local time: {lt[0]:04d}-{lt[1]:02d}-{lt[2]:02d} {lt[3]:02d}:{lt[4]:02d}:{lt[5]:02d}")
 
-last_press_time = manual_season = 0
+# Button presses: the IRQ handler only timestamps the press into a preallocated ring
+# and schedules press_scheduled(), which wakes button_task; presses that arrive in
+# quick succession are printed as one batch of consecutive kō
+DEBOUNCE_US = 50000  # edges closer than this after a press are contact bounce
+COALESCE_MS = 600  # a batch ends once the button has been quiet this long
+PRESS_SLOTS = 16  # ring size, and the most kō printed for one burst of presses
+press_times = array('L', [0] * PRESS_SLOTS)  # ticks_us of recent presses
+press_count = presses_seen = 0
+press_last = 0
+press_pending = False
+irq_max_us = schedule_max_us = 0  # worst-case IRQ handler time and IRQ-to-scheduled-callback delay
+button_flag = asyncio.ThreadSafeFlag()
+micropython.alloc_emergency_exception_buf(100)  # so an error in the IRQ handler can be reported
+
 def button_pressed(pin):
-    global microseasons, printer, last_press_time, manual_season
+    # Runs in IRQ context: no allocation, no I/O
+    global press_count, press_last, press_pending, irq_max_us
+    t = time.ticks_us()
+    if not 0 <= time.ticks_diff(t, press_last) < DEBOUNCE_US:
+        press_last = t
+        press_times[press_count % PRESS_SLOTS] = t
+        press_count += 1
+        if not press_pending:
+            press_pending = True
+            micropython.schedule(press_scheduled, 0)
+    elapsed = time.ticks_diff(time.ticks_us(), t)
+    if elapsed > irq_max_us:
+        irq_max_us = elapsed
+
+def press_scheduled(_):
+    # Runs from micropython.schedule, outside IRQ context
+    global press_pending, schedule_max_us
+    press_pending = False
+    delay = time.ticks_diff(time.ticks_us(), press_times[(press_count - 1) % PRESS_SLOTS])
+    if delay > schedule_max_us:
+        schedule_max_us = delay
+    button_flag.set()
+
+last_press_time = time.ticks_add(time.ticks_ms(), -60000)  # so the first press starts from the current kō
+async def button_task():
+    global presses_seen
+    while True:
+        await button_flag.wait()
+        asyncio.create_task(blink(1, 0.1))
+        # Keep collecting until the button has been quiet for COALESCE_MS
+        while True:
+            quiet = time.ticks_diff(time.ticks_us(), press_times[(press_count - 1) % PRESS_SLOTS]) // 1000
+            if quiet >= COALESCE_MS:
+                break
+            await asyncio.sleep_ms(COALESCE_MS - quiet)
+        presses = min(press_count - presses_seen, PRESS_SLOTS)
+        presses_seen = press_count
+        if presses <= 0:
+            continue
+        print(f"Button pressed {presses} times (IRQ max {irq_max_us} us, scheduled after max {schedule_max_us} us)")
+        await browse(presses)
+
+async def browse(presses):
+    # Prints the next kō from the browse cursor for each press; after a pause the cursor
+    # starts again from the current kō
+    global last_press_time
     current_time = time.ticks_ms()
-    if current_time - last_press_time > 500:
-        print("Button pressed")
-        blink_led(1, 0.1)
-        if current_time - last_press_time > 10000:
-            manual_season = load_current_season()
-        last_press_time = current_time
+    manual_season = state.get(CURSOR)
+    if time.ticks_diff(current_time, last_press_time) > 10000:
+        manual_season = load_current_season()
+    last_press_time = current_time
+    microseasons = []
+    for _ in range(presses):
         if manual_season > 72:
-                manual_season = 1
-        microseason = get_microseason_for_number(microseasons, manual_season)
-        print_microseason(printer, microseason)
+            manual_season = 1
+        microseason = get_microseason_for_number(catalog, manual_season)
         manual_season += 1
+        if microseason is not None:
+            microseasons.append(microseason)
+    state.set(CURSOR, manual_season)
+    if microseasons:
+        await print_microseason_batch(printer, microseasons)
 
 button = Pin(6, Pin.IN, Pin.PULL_UP)
-button.irq(trigger=Pin.IRQ_FALLING, handler=button_pressed)
 
 
-def main():
-    global microseasons,printer
-    connection = False
-    connection_timeout = 10
+def spool_missed(now):
+    # Queues every scheduled slip whose print time has passed since the last one printed,
+    # going back at most CATCH_UP_DAYS
+    lt = local_time(now)
+    today = days_from_civil(lt[0], lt[1], lt[2])
+    last = today if lt[3] >= PRINT_HOUR else today - 1  # last day whose print time has passed
+    printed = spool.printed()
+    if printed:
+        first = key_day(printed)
+    else:
+        # First run: start with the kō in effect, unless it was printed before the spool existed
+        first = ko_start_day(last)
+        y, m, d = civil_from_days(first)
+        if load_current_season() == calendar_index(y).lookup(m, d)[0]:
+            spool.ack(job_key(first, RANK_KO))
+    jobs = []
+    with metrics.span(metrics.LOOKUP):
+        for day in range(max(first, last - CATCH_UP_DAYS), last + 1):
+            y, m, d = civil_from_days(day)
+            ko_num, sekki_num, shiki_num, starts = calendar_index(y).lookup(m, d)
+            if show_macro_season and starts & STARTS_SHIKI:
+                jobs.append((job_key(day, RANK_SHIKI), shiki_num))
+            if show_mini_season and starts & STARTS_SEKKI:
+                jobs.append((job_key(day, RANK_SEKKI), sekki_num))
+            if starts & STARTS_KO:
+                jobs.append((job_key(day, RANK_KO), ko_num))
+    added = spool.add(jobs)
+    if added:
+        print(f"Queued {added} slips to print.")
+
+def ko_start_day(day):
+    # Local epoch day on which the kō in effect on a day started
+    for start in range(day, day - 31, -1):
+        y, m, d = civil_from_days(start)
+        if calendar_index(y).lookup(m, d)[3] & STARTS_KO:
+            return start
+    return day
+
+async def print_spooled(printer):
+    # Prints every queued slip as one stream, oldest first, acknowledging each only once its
+    # bytes have left the UART; a kō straight after another kō shares its opening rule line
+    jobs = spool.pending()
+    if not jobs:
+        return
+    asyncio.create_task(blink(2, 0.1))
+    power.flush()  # the power figures, if due, go out with the acknowledgements
+    prepare_tickets(civil_from_days(key_day(jobs[-1][0]))[0])
+    woke = False  # the run follows a sleep that printing() timed
+    async with printer.lock:
+        after_ko = False
+        for key, number in jobs:
+            year = civil_from_days(key_day(key))[0]
+            index = calendar_index(year)
+            layer, records, table, render = (
+                (LAYER_SHIKI, catalog.shiki, index.shiki, render_macro_season),
+                (LAYER_SEKKI, catalog.sekki, index.sekki, render_mini_season),
+                (LAYER_KO, catalog.ko, index.ko, render_microseason))[key_rank(key)]
+            record = catalog.get(records, number)
+            if record is None:
+                # Acknowledging it would also mark it done; leave it and what follows spooled
+                print(f"Season {number} is not in the catalog, will retry.")
+                return
+            woke = power.printing() or woke
+            try:
+                await send_job(printer, layer, render, with_dates(record, index, table, year),
+                               after_ko and layer == LAYER_KO)
+                while not printer.uart.txdone():
+                    await asyncio.sleep_ms(1)
+            except OSError as e:
+                print(f"Failed to print, will retry: {e}")
+                return
+            spool.ack(key)
+            after_ko = layer == LAYER_KO
+    if woke and power.mode != AWAKE:
+        print(f"Woke to printing in {power.latency_ms} ms; "
+              f"estimated average draw {power.draw_ma():.1f} mA in {MODE_NAMES[power.mode]} mode.")
+
+async def send_job(printer, layer, render, record, merged=False):
+    # One spooled slip; the caller holds printer.lock
+    if layer == LAYER_KO:
+        print(f"Printing microseason {record.number}: {record.en}")
+    elif layer == LAYER_SEKKI:
+        print(f"Printing mini season: {record.en}")
+    else:
+        print(f"Printing season: {record.en}")
+    await send_slip(printer, layer, render, record, merged)
+
+with metrics.span(metrics.CATALOG):
+    catalog = open_catalog(stream=STREAM_CATALOG)  # packed seasons.bin if present, otherwise the JSON files
+solar_terms = SolarTerms()  # kō boundaries per year, computed once and cached on flash
+tickets = TicketCache()  # every slip pre-rendered to printer bytes on flash
+state = StateJournal()  # last printed seasons, sync time and browse cursor, kept in RAM
+spool = PrintSpool(state)  # scheduled slips not yet printed, kept on flash
+power = Power(POWER_MODE, state)  # sleeps between events and estimates the current draw
+timekeeper = TimeKeeper(state, ssid, password)  # NTP only when the RTC can no longer be trusted
+def busy():
+    # True while woken work still needs the CPU before the board may sleep again
+    return (press_count != presses_seen or printer.lock.locked() or not printer.ready()
+            or timekeeper.syncing)
+
+def next_print_time(now):
+    # UTC time of the next print, found by walking forward from today to the next season start
+    lt = local_time(now)
+    first = days_from_civil(lt[0], lt[1], lt[2]) + (lt[3] >= PRINT_HOUR)
+    for day in range(first, first + 32):
+        y, m, d = civil_from_days(day)
+        if calendar_index(y).lookup(m, d)[3]:
+            return tz.to_utc(epoch_seconds(y, m, d, PRINT_HOUR))
+    return now + MAX_SLEEP
+
+async def resume():
+    # Fast path after a deepsleep wake: no LED greeting, schedule or Wi-Fi
+    # (unless a sync is due); prints what is due and sleeps again. Returns the time keeper's
+    # boot result: False if the RTC can no longer be trusted, for a full start instead
+    global printer
+    pressed = power.by_button()
+    power.resume()
+    if not timekeeper.boot(False):  # a wake, not counted as a boot
+        return False
+    printer = setup_printer()
+    asyncio.create_task(button_task())
+    button.irq(trigger=Pin.IRQ_FALLING, handler=button_pressed)
+    with metrics.span(metrics.CATALOG):
+        catalog.refresh()  # the JSON files, or the packed file's header; memory did not survive the sleep
+    spool.load()
+    if pressed:
+        await browse(1)
+    now = time.time()
+    spool_missed(now)
+    await print_spooled(printer)
+    if not timekeeper.next_check():
+        await timekeeper.sync()
+    now = time.time()
+    wait = min(next_print_time(now) - now, MAX_SLEEP, timekeeper.next_check(False))
+    print(f"Deep sleeping {wait // 60} minutes until next season event.")
+    await power.deepsleep(max(1, wait), busy)
+    return True
+
+async def main():
+    global printer, search_index
+    load_state()
+    if power.resumed():
+        if await resume():
+            return
+        trusted = False  # resume() has checked the RTC
+    else:
+        trusted = timekeeper.boot()
     blink_led(3, 0.1)
     printer = setup_printer()
-    while not connection:
-            connection = connect_to_wifi()
-            connection_timeout -= 1
-            if connection_timeout == 0:
-                print('Could not connect to Wi-Fi, exiting')
-                reset()
-    try:
-        ntptime.settime()
-        print(f"System time updated to {time.time()} via NTP.")
+    if not trusted:
+        # The RTC lost power or has drifted too far: the date is needed before anything else
+        await timekeeper.sync()
         # For testing, you can hard-code a date: (year, month, day, weekday, hour, minute, second, millisecond)
-        # RTC().datetime((2026, 11, 7, 2, 20, 31, 0, 0))
+        # from hal import RTC; RTC().datetime((2026, 11, 7, 2, 20, 31, 0, 0))
         # print(f"System time updated to {time.time()} hard-coded.")
-    except:
-        print("Failed to update time via NTP.")
+    else:
+        print("RTC trusted, skipping Wi-Fi and NTP.")
+    asyncio.create_task(timekeeper.run())  # syncs again in the background once the error estimate grows
+    asyncio.create_task(button_task())
+    button.irq(trigger=Pin.IRQ_FALLING, handler=button_pressed)
+    with metrics.span(metrics.CATALOG):
+        catalog.refresh()
+    ready_ms, offline_share = timekeeper.ready()
+    metrics.record(metrics.BOOT, 0, ready_ms * 1000)
+    print(f"Ready {ready_ms} ms after boot; {offline_share:.0%} of boots needed no radio.")
+    lt = local_time()
+    show_time(lt)
+    spool.load()
+    spool_missed(time.time())  # catch up on anything missed while off
+    await print_spooled(printer)
+    schedule = Schedule()
+    last = time.time()
     while True:
-            blink_led(2, 0.1)
-            if not connection:
-                break # exit if no connection
-            microseasons = load_microseasons()
-            # list_microseasons(microseasons)
-            show_time()
-            season_today = get_microseason_for_date(microseasons, local_time(UTC_OFFSET)[1], local_time(UTC_OFFSET)[2])
-            # print(season_today)
-            if season_today is not None and local_time(UTC_OFFSET)[3] >= 9:  # Print at 9 am or later
-                load_current_season()
-                if season_today['number'] != load_current_season():
-                    store_current_season(season_today)
-                    if show_macro_season: print_macro_season(printer)
-                    if show_mini_season: print_mini_season(printer)
-                    print_microseason(printer, season_today)
-                else:
-                    print(f"Microseason {season_today['number']} already printed for today's date.")
-            else:
-                print("No microseason found for today's date or too early to print.")
+            i = schedule.next_index(last)
+            if i < 0:
+                lt = local_time(last)
+                schedule.build(calendar_index, lt[0], lt[1], lt[2], tz.to_utc)
+                print(f"Scheduled {len(schedule)} season events for the next year.")
+                i = schedule.next_index(last)
+            # Sleep until the next event; long waits are split to stay within the ticks range.
+            # An empty schedule (a catalog with no start dates) waits the longest sleep and rebuilds
+            wait = min(schedule.times[i] - last, MAX_SLEEP) if i >= 0 else MAX_SLEEP
+            if POWER_MODE != AWAKE:
+                # The time keeper's task only runs while the board is awake; drift steps can wait for a wake
+                wait = max(1, min(wait, timekeeper.next_check(False)))
+            print(f"Sleeping {wait // 60} minutes until next season event.")
+            if POWER_MODE == DEEP:
+                await power.deepsleep(wait, busy)  # the board boots again, into resume()
+            await power.idle(wait, busy)
+            now = time.time()  # one clock snapshot per wake-up
+            spool_missed(now)
+            await print_spooled(printer)  # also retries slips left over from a failed print
+            last = now
+            with metrics.span(metrics.CATALOG):
+                changed = catalog.refresh()
+            if changed:  # re-reads a catalog file only if it changed on flash
+                search_index = None
+                schedule = Schedule()  # dates may have moved, rebuild on the next pass
 
-            # Check once every hour, about the top of the hour
-            print(f"Sleeping {60-local_time(UTC_OFFSET)[4]} minutes until next check.")
-            time.sleep((60 * (60-local_time(UTC_OFFSET)[4]))-local_time(UTC_OFFSET)[5])  # Sleep until the top of the next hour 
+# Runs on boot as main.py. Importing the module (e.g. from simulate.py) prints the version, sets up
+# the LED and button pins and opens the season catalog; the state, spool and ticket cache files are
+# only read by main(), which starts everything else
+if __name__ == '__main__':
+    asyncio.run(main())
 
-main()
-            
@@ -0,0 +1,119 @@
+# Span timings and heap samples, to see where time and memory go on the
+# device. Off by default: span() then returns one shared object whose enter
+# and exit do nothing, so instrumented code costs a call and two empty methods.
+# When enabled, every finished span is written into a fixed ring of arrays,
+# so recording allocates nothing and the oldest spans are overwritten:
+#   span id, start ticks_us, duration us, gc.mem_free() after, gc.mem_alloc() change
+# At the REPL (or `mpremote exec "import metrics; metrics.dump()" > run.csv`):
+#   >>> import metrics; metrics.dump()
+# metrics_summary.py turns any number of those dumps into percentiles.
+
+import gc
+from array import array
+from hal import time
+
+version = "1.0.0"
+
+SLOTS = 128  # spans kept; 17 bytes each
+
+# Span ids, indexes into NAMES
+BOOT = 0  # boot to ready
+WIFI = 1  # Wi-Fi connect
+NTP = 2
+CATALOG = 3  # catalog load or refresh
+TICKETS = 4  # ticket cache check or rebuild
+LOOKUP = 5  # date to season lookup
+RENDER = 6  # slip rendered into the ticket buffer
+UART = 7  # slip bytes written to the printer
+FEED = 8  # waiting for the previous paper feed to finish
+NAMES = ('boot', 'wifi', 'ntp', 'catalog', 'tickets', 'lookup', 'render', 'uart', 'feed')
+
+try:
+    _mem_free = gc.mem_free
+    _mem_alloc = gc.mem_alloc
+except AttributeError:  # CPython has no allocator counters
+    def _mem_free():
+        return 0
+    _mem_alloc = _mem_free
+
+enabled = False
+count = 0  # spans recorded since enable(); the ring holds the last SLOTS of them
+_ids = bytearray(SLOTS)
+_starts = array('l', [0] * SLOTS)
+_us = array('l', [0] * SLOTS)
+_free = array('l', [0] * SLOTS)
+_alloc = array('l', [0] * SLOTS)
+
+
+def record(span_id, start, us, alloc=0):
+    """Adds one span to the ring if recording; start is its ticks_us and us its duration."""
+    global count
+    if not enabled:
+        return
+    i = count % SLOTS
+    _ids[i] = span_id
+    _starts[i] = start
+    _us[i] = us
+    _free[i] = _mem_free()
+    _alloc[i] = alloc
+    count += 1
+
+
+class _Span:
+    __slots__ = ('id', 'start', 'alloc')
+
+    def __init__(self, span_id):
+        self.id = span_id
+        self.start = 0
+        self.alloc = 0
+
+    def __enter__(self):
+        self.alloc = _mem_alloc()
+        self.start = time.ticks_us()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        us = time.ticks_diff(time.ticks_us(), self.start)
+        record(self.id, self.start, us, _mem_alloc() - self.alloc)
+        return False
+
+
+class _Off:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_OFF = _Off()
+_spans = [_Span(i) for i in range(len(NAMES))]  # one per id, reused; the same id must not nest
+
+
+def span(span_id):
+    """Context manager timing a block as span_id, e.g. `with metrics.span(metrics.NTP): ...`."""
+    return _spans[span_id] if enabled else _OFF
+
+
+def enable(on=True):
+    """Starts (or stops) recording; starting clears the ring."""
+    global enabled, count
+    if on and not enabled:
+        count = 0
+    enabled = on
+
+
+def rows():
+    """Yields the ring as CSV lines, oldest span first, after a header line."""
+    yield 'span,start_us,us,mem_free,alloc'
+    for n in range(max(0, count - SLOTS), count):
+        i = n % SLOTS
+        yield f"{NAMES[_ids[i]]},{_starts[i]},{_us[i]},{_free[i]},{_alloc[i]}"
+
+
+def dump():
+    """Prints the ring as compact CSV, for capture over the serial console."""
+    for line in rows():
+        print(line)
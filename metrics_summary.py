@@ -0,0 +1,73 @@
+# Summarizes span dumps from metrics.dump() over any number of runs:
+# per span, the count and the 50th/90th/99th percentile and worst duration,
+# the typical and worst heap growth, and the lowest free heap seen.
+#
+#   mpremote exec "import metrics; metrics.dump()" > run1.csv
+#   python metrics_summary.py run*.csv
+#   python simulate.py --years 1 --metrics sim.csv && python metrics_summary.py sim.csv
+
+import sys
+
+version = "1.0.0"
+
+PERCENTILES = (50, 90, 99)
+HEADER = 'span,start_us,us,mem_free,alloc'
+
+
+def read_spans(paths):
+    """Returns {span name: [(us, mem_free, alloc)]} from CSV dumps, skipping other console lines."""
+    spans = {}
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                parts = line.strip().split(',')
+                if len(parts) != 5 or line.startswith(HEADER):
+                    continue
+                try:
+                    us, free, alloc = int(parts[2]), int(parts[3]), int(parts[4])
+                except ValueError:
+                    continue
+                spans.setdefault(parts[0], []).append((us, free, alloc))
+    return spans
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of a sorted list."""
+    if not ordered:
+        return 0
+    rank = max(1, -(-p * len(ordered) // 100))
+    return ordered[rank - 1]
+
+
+def summarize(spans):
+    """Returns rows of (span, count, percentiles..., max us, median alloc, max alloc, min mem_free)."""
+    rows = []
+    for name in sorted(spans):
+        samples = spans[name]
+        us = sorted(s[0] for s in samples)
+        alloc = sorted(s[2] for s in samples)
+        free = [s[1] for s in samples if s[1]]
+        rows.append((name, len(samples), *(percentile(us, p) for p in PERCENTILES), us[-1],
+                     percentile(alloc, 50), alloc[-1], min(free) if free else 0))
+    return rows
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Percentiles of span timings dumped by metrics.dump().")
+    parser.add_argument('paths', nargs='+', help="CSV dumps, e.g. one per run")
+    args = parser.parse_args(argv)
+    rows = summarize(read_spans(args.paths))
+    if not rows:
+        print("No spans found.")
+        return 1
+    print(f"{'span':8} {'count':>6} " + " ".join(f"{'p' + str(p) + ' us':>10}" for p in PERCENTILES)
+          + f" {'max us':>10} {'alloc p50':>9} {'alloc max':>9} {'min free':>8}")
+    for name, count, *values in rows:
+        print(f"{name:8} {count:6} " + " ".join(f"{v:10}" for v in values[:len(PERCENTILES) + 1])
+              + " " + " ".join(f"{v:9}" for v in values[len(PERCENTILES) + 1:-1]) + f" {values[-1]:8}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
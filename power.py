@@ -0,0 +1,169 @@
+# Sleeping between season events, for battery use. In AWAKE mode the CPU
+# runs the asyncio loop the whole time, as it always has. LIGHT puts the
+# board in machine.lightsleep until the next event, keeping RAM, so waking
+# costs nothing but the wake itself; a button press (its pin IRQ) also ends
+# the sleep. DEEP uses machine.deepsleep, which on the RP2040 is a lightsleep
+# followed by a watchdog reset: the wake-up time is kept in the watchdog's
+# scratch registers, which survive that reset but not a power cut, and the
+# next boot takes a short warm path instead of a full start.
+#
+# Time spent awake and asleep is counted in RAM (and in the scratch registers
+# across a deepsleep) and handed to the state journal only once FLUSH_S of
+# sleep has built up, deferred to go out with its next write, so sleeping
+# costs no flash writes of its own. With the time
+# keeper's radio-on time, it gives an estimate of the average current from
+# typical Pico W figures.
+
+from hal import asyncio, time, lightsleep, deepsleep, mem32
+from state_journal import AWAKE_MS, ASLEEP_S, RADIO_MS
+
+version = "1.2.1"
+
+AWAKE = 0
+LIGHT = 1
+DEEP = 2
+MODE_NAMES = ('awake', 'light', 'deep')
+
+BUSY_POLL_MS = 50  # how often to check whether a woken task has finished
+SETTLE_MS = 10  # after a wake, lets IRQ-scheduled callbacks and due tasks start
+WAKE_MARGIN = 2  # seconds; a deepsleep wake this much before its wake-up time was the button
+FLUSH_S = 7 * 86400  # hand the awake and asleep totals to the journal once this much sleep is counted
+
+# RP2040 watchdog SCRATCH0-3; 4-7 are taken by the boot ROM on a watchdog reset
+SCRATCH = 0x4005800C
+RETAINED_MAGIC = 0x4B4F5057  # 'KOPW', XORed with the other words as a check
+
+# Typical Pico W supply current in mA, printer not included
+ACTIVE_MA = 22.0  # CPU at 125 MHz waiting in asyncio, radio off
+RADIO_MA = 50.0  # Wi-Fi associated
+SLEEP_MA = 1.4  # lightsleep, radio off
+
+
+class Power:
+    """Sleeps until the next event in the configured mode and keeps the figures for the draw estimate."""
+
+    def __init__(self, mode, state):
+        self.mode = mode
+        self.state = state
+        self._mark = time.ticks_ms()  # awake since this tick
+        self._woke = None  # tick of the last wake, None once a scheduled print has followed it
+        self.latency_ms = 0  # wake to the first scheduled slip, last wake that printed
+        self.max_latency_ms = 0
+        self.awake_ms = 0  # counted but not yet journaled
+        self.asleep_s = 0
+        self.wake_at = 0  # UTC epoch seconds the deepsleep this boot woke from was due to end
+        if mode == DEEP:
+            self._restore()
+
+    def _restore(self):
+        # Takes the figures a deepsleep left in the scratch registers, then invalidates
+        # them so any other reset before the next deepsleep is a cold boot
+        words = [mem32[SCRATCH + 4 * i] & 0xFFFFFFFF for i in range(4)]
+        if words[0] != RETAINED_MAGIC ^ words[1] ^ words[2] ^ words[3]:
+            return
+        self.wake_at, self.awake_ms, self.asleep_s = words[1:]
+        mem32[SCRATCH] = 0
+
+    def _retain(self):
+        words = (self.wake_at, self.awake_ms, self.asleep_s)
+        for i, word in enumerate(words):
+            mem32[SCRATCH + 4 + 4 * i] = word
+        mem32[SCRATCH] = RETAINED_MAGIC ^ words[0] ^ words[1] ^ words[2]
+
+    def resumed(self):
+        """True if this boot is a wake from deepsleep."""
+        return self.wake_at != 0
+
+    def by_button(self):
+        """True if the deepsleep this boot resumed from was ended early, by the button."""
+        return self.resumed() and time.time() < self.wake_at - WAKE_MARGIN
+
+    def printing(self):
+        # Called before a scheduled slip is sent; the first call after a wake sets the latency
+        # and returns True
+        if self._woke is None:
+            return False
+        self.latency_ms = time.ticks_diff(time.ticks_ms(), self._woke)
+        self.max_latency_ms = max(self.max_latency_ms, self.latency_ms)
+        self._woke = None
+        return True
+
+    def flush(self):
+        """Adds the counted awake and asleep time to the state journal, deferred, once FLUSH_S of sleep is counted."""
+        if self.asleep_s < FLUSH_S:
+            return
+        state = self.state
+        state.defer(AWAKE_MS, state.get(AWAKE_MS) + self.awake_ms)
+        state.defer(ASLEEP_S, state.get(ASLEEP_S) + self.asleep_s)
+        self.awake_ms = self.asleep_s = 0
+
+    def _awake(self):
+        # Counts the time awake since the last mark
+        now = time.ticks_ms()
+        if self.mode != AWAKE:
+            self.awake_ms += time.ticks_diff(now, self._mark)
+        self._mark = now
+
+    def _asleep(self, ms):
+        self.asleep_s += (ms + 500) // 1000
+
+    async def _settle(self, busy):
+        await asyncio.sleep_ms(SETTLE_MS)
+        while busy():
+            await asyncio.sleep_ms(BUSY_POLL_MS)
+
+    async def idle(self, seconds, busy):
+        """Waits seconds (at most the ticks range allows), sleeping the CPU in LIGHT mode.
+
+        busy() returns True while woken work, such as a button print or an
+        NTP sync, still needs the CPU; sleep resumes once it is done.
+        """
+        if self.mode == AWAKE:
+            await asyncio.sleep(seconds)
+            self._woke = time.ticks_ms()
+            return
+        deadline = time.ticks_add(time.ticks_ms(), seconds * 1000)
+        await self._settle(busy)
+        while True:
+            left = time.ticks_diff(deadline, time.ticks_ms())
+            if left <= 0:
+                break
+            self._awake()
+            lightsleep(left)
+            slept = time.ticks_diff(time.ticks_ms(), self._mark)
+            self._asleep(slept)
+            self._mark = self._woke = time.ticks_ms()
+            await self._settle(busy)
+
+    async def deepsleep(self, seconds, busy):
+        """Keeps the wake-up time in the scratch registers and deep-sleeps; the board boots again when it wakes."""
+        start = time.ticks_ms()
+        await self._settle(busy)
+        self.state.flush()  # deferred values do not survive the reset
+        seconds = max(1, seconds - time.ticks_diff(time.ticks_ms(), start) // 1000)
+        self._awake()
+        self.asleep_s += seconds  # counted ahead, as nothing runs after the wake to count it
+        self.wake_at = time.time() + seconds
+        self._retain()
+        deepsleep(seconds * 1000)
+
+    def resume(self):
+        """Ends a deepsleep wake: gives back sleep the button cut short."""
+        early = self.wake_at - time.time()
+        if early > 0:
+            self.asleep_s = max(0, self.asleep_s - early)
+        self.wake_at = 0
+        self._woke = 0  # the boot was the wake
+
+    def draw_ma(self):
+        """Estimated average supply current over the counted time, in mA."""
+        if self.mode == AWAKE:
+            return ACTIVE_MA
+        state = self.state
+        awake = state.get(AWAKE_MS) + self.awake_ms
+        asleep = (state.get(ASLEEP_S) + self.asleep_s) * 1000
+        radio = min(state.get(RADIO_MS), awake)
+        total = awake + asleep
+        if not total:
+            return ACTIVE_MA
+        return ((awake - radio) * ACTIVE_MA + radio * RADIO_MA + asleep * SLEEP_MA) / total
@@ -0,0 +1,122 @@
+# On-flash queue of scheduled slips still to be printed, so a season that
+# starts while the device is off or the printer is busy is printed later
+# instead of being skipped.
+#
+# Each job is keyed by its place on the timeline, local epoch day * 4 + rank,
+# with shiki (rank 0) before sekki (1) before kō (2) on the same day. The
+# state journal's PRINTED field holds the key of the last slip whose bytes
+# were written to the printer; jobs at or before it are done. Acknowledgements
+# are deferred in the journal and written once the queue is empty, so a run
+# of slips costs one append, and the queue file itself is only rewritten
+# when jobs are added, through a temporary file and a rename.
+# File (little-endian):
+#   header <4sBBH: magic "KOSP", format 1, reserved, job count
+#   jobs   <iB:   key, season number
+# A slip cut short by power loss is not acknowledged and is printed again
+# in full on the next boot, as are the ones before it in a run cut short.
+
+import os
+import struct
+from state_journal import PRINTED
+
+version = "1.1.0"
+
+SPOOL_FILE = 'spool.bin'
+MAGIC = b'KOSP'
+FORMAT = 1
+HEADER = '<4sBBH'
+HEADER_SIZE = 8
+JOB = '<iB'
+JOB_SIZE = 5
+
+# Ranks of the layers within a day; ticket_cache's LAYER_* numbers are 2 - rank
+RANK_SHIKI = 0
+RANK_SEKKI = 1
+RANK_KO = 2
+
+
+def job_key(day, rank):
+    return day * 4 + rank
+
+
+def key_day(key):
+    return key >> 2
+
+
+def key_rank(key):
+    return key & 3
+
+
+class PrintSpool:
+    """Pending slips as (key, number) pairs in timeline order, kept in RAM and on flash."""
+
+    def __init__(self, state, path=SPOOL_FILE):
+        self.state = state
+        self.path = path
+        self.jobs = []
+        self.writes = 0
+
+    def printed(self):
+        """Key of the last slip acknowledged, 0 if none has been yet."""
+        return self.state.get(PRINTED)
+
+    def load(self):
+        """Reads the queue file; returns the number of jobs still pending."""
+        self.jobs = []
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.read(HEADER_SIZE)
+                if len(header) == HEADER_SIZE:
+                    magic, fmt, _, count = struct.unpack(HEADER, header)
+                    if magic == MAGIC and fmt == FORMAT:
+                        data = f.read(count * JOB_SIZE)
+                        for i in range(len(data) // JOB_SIZE):
+                            self.jobs.append(struct.unpack_from(JOB, data, i * JOB_SIZE))
+        except OSError:  # missing
+            pass
+        return len(self.pending())
+
+    def pending(self):
+        printed = self.printed()
+        return [job for job in self.jobs if job[0] > printed]
+
+    def add(self, jobs):
+        """Queues (key, number) jobs not already queued or printed; returns how many were new."""
+        printed = self.printed()
+        pending = self.pending()
+        queued = set(job[0] for job in pending)
+        new = [job for job in jobs if job[0] > printed and job[0] not in queued]
+        if not new:
+            return 0
+        pending.extend(new)
+        pending.sort()
+        self._write(pending)
+        self.jobs = pending
+        return len(new)
+
+    def ack(self, key):
+        """Marks every job up to key as printed; call once the slip's bytes have been written.
+
+        The key reaches flash once no job is left, or with the journal's next write.
+        """
+        if key > self.printed():
+            self.state.defer(PRINTED, key)
+            if not self.jobs or key >= self.jobs[-1][0]:
+                self.state.flush()
+
+    def _write(self, jobs):
+        temp = self.path + '.tmp'
+        try:
+            with open(temp, 'wb') as f:
+                f.write(struct.pack(HEADER, MAGIC, FORMAT, 0, len(jobs)))
+                for key, number in jobs:
+                    f.write(struct.pack(JOB, key, number))
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            os.rename(temp, self.path)
+        except OSError as e:
+            print(f"Failed to write print spool: {e}")  # the jobs stay queued in RAM
+            return
+        self.writes += 1
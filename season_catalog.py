@@ -0,0 +1,312 @@
+# Resident catalog of kō, sekki and shiki seasons.
+# Each JSON file is parsed once into compact records and re-read only when its
+# size or modification time changes on flash. StreamingCatalog keeps only the
+# day index resident and reads each record from its file when it is needed.
+
+import gc
+import os
+import struct
+from binascii import crc32
+from json_stream import RecordReader, field_equals
+from season_index import build_index, day_of_year, parse_month_day
+
+version = "1.2.0"
+
+KO_FILE = 'microseasons_ko.json'
+SEKKI_FILE = 'mini_seasons_sekki.json'
+SHIKI_FILE = 'seasons_shiki.json'
+
+
+class Season:
+    __slots__ = ('number', 'kanji', 'romaji', 'en',
+                 'start_month', 'start_day', 'end_month', 'end_day')
+
+    def __init__(self, number, kanji, romaji, en, start_month, start_day, end_month, end_day):
+        self.number = number
+        self.kanji = kanji
+        self.romaji = romaji
+        self.en = en
+        self.start_month = start_month
+        self.start_day = start_day
+        self.end_month = end_month
+        self.end_day = end_day
+
+    def __repr__(self):
+        return f"Season({self.number}, {self.en})"
+
+
+def _season(item, key):
+    # Season from one decoded JSON object, or None if its dates are malformed
+    try:
+        sm, sd = parse_month_day(item['start'])
+        em, ed = parse_month_day(item['end'])
+    except Exception:
+        return None
+    return Season(item[key], item['kanji'], item['romaji'], item['en'], sm, sd, em, ed)
+
+
+def _mem_alloc():
+    # Heap in use after a collection; 0 on CPython, which has no allocator counters
+    if not hasattr(gc, 'mem_alloc'):
+        return 0
+    gc.collect()
+    return gc.mem_alloc()
+
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st[6], st[8]  # size, mtime
+
+
+class SeasonCatalog:
+    resident = True  # records are kept in RAM
+
+    def __init__(self, directory=''):
+        self.directory = directory
+        self.ko = []
+        self.sekki = []
+        self.shiki = []
+        self.index = None
+        self.freed_bytes = 0  # heap saved versus keeping the decoded JSON dicts
+        self._reader = RecordReader()
+        self._signatures = [None, None, None]
+
+    def _path(self, name):
+        return self.directory + '/' + name if self.directory else name
+
+    def _load(self, name, key):
+        # Returns compact records for one file, decoding one JSON object at a time and
+        # tracking the heap each record saves over its decoded dict (strings are shared)
+        records = []
+        try:
+            for item in self._reader.load(self._path(name)):
+                dict_bytes = _mem_alloc()
+                record = _season(item, key)
+                item = None
+                if record is not None:
+                    records.append(record)
+                self.freed_bytes += max(0, dict_bytes - _mem_alloc())
+        except (OSError, ValueError):
+            print(f"Failed to open json file {name}.")
+            return []
+        records.sort(key=lambda r: r.number)
+        return records
+
+    def refresh(self):
+        """Reloads any file whose size or mtime changed; returns True if anything did."""
+        changed = False
+        for i, (name, key, attr) in enumerate((
+                (KO_FILE, 'number', 'ko'),
+                (SEKKI_FILE, 'sekki_num', 'sekki'),
+                (SHIKI_FILE, 'macro_season_num', 'shiki'))):
+            signature = _file_signature(self._path(name))
+            if signature is not None and signature == self._signatures[i]:
+                continue
+            setattr(self, attr, self._load(name, key))
+            self._signatures[i] = signature
+            changed = True
+        if changed:
+            self.index = build_index(self.ko, self.sekki, self.shiki)
+            kept = f"{self.freed_bytes} bytes freed versus JSON dicts" if self.resident else "read when needed"
+            print(f"Season catalog loaded: {len(self.ko)} kō, {len(self.sekki)} sekki, {len(self.shiki)} shiki; {kept}.")
+        return changed
+
+    def get(self, records, number):
+        # Records are sorted by number, so try the direct slot first
+        if 0 < number <= len(records) and records[number - 1].number == number:
+            return records[number - 1]
+        for record in records:
+            if record.number == number:
+                return record
+        return None
+
+
+class StreamingLayer:
+    # Read-only sequence view of one JSON file in a StreamingCatalog
+    __slots__ = ('reader', 'path', 'key', 'count')
+
+    def __init__(self, reader, path, key):
+        self.reader = reader
+        self.path = path
+        self.key = key
+        self.count = 0
+        for _ in self:
+            self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        try:
+            for item in self.reader.load(self.path):
+                record = _season(item, self.key)
+                if record is not None:
+                    yield record
+        except (OSError, ValueError):
+            return
+
+
+class StreamingCatalog(SeasonCatalog):
+    """JSON catalog that keeps only the day index in RAM and decodes one record from its file per lookup."""
+    resident = False
+
+    def __init__(self, directory=''):
+        super().__init__(directory)
+        self._finder = RecordReader()  # lookups may run while a layer is being iterated
+
+    def _load(self, name, key):
+        path = self._path(name)
+        if _file_signature(path) is None:
+            print(f"Failed to open json file {name}.")
+        return StreamingLayer(self._reader, path, key)
+
+    def get(self, layer, number):
+        """Streams the layer's file up to the record with a number and decodes only that one."""
+        try:
+            item = self._finder.find(layer.path, field_equals(layer.key, number))
+        except (OSError, ValueError):
+            return None
+        return _season(item, layer.key) if item is not None else None
+
+
+# Packed binary catalog written by build_catalog.py from the JSON files.
+# Layout (little-endian):
+#   header   <4sBBBBIII: magic, format, kō/sekki/shiki counts, day table offset, record table offset,
+#            CRC-32 of the JSON files it was built from (see source_signature)
+#   days     366 x 4 bytes: kō, sekki, shiki numbers and start flags for each day slot
+#   table    one uint32 record offset per season, kō then sekki then shiki
+#   records  <8B: number, start month/day, end month/day, kanji/romaji/en byte lengths,
+#            followed by the three UTF-8 strings back to back
+PACKED_FILE = 'seasons.bin'
+PACKED_MAGIC = b'KOCB'
+PACKED_FORMAT = 2
+PACKED_HEADER = '<4sBBBBIII'
+PACKED_HEADER_SIZE = 20
+PACKED_RECORD = '<8B'
+PACKED_RECORD_SIZE = 8
+
+
+class PackedLayer:
+    # Read-only sequence view of one layer in a PackedCatalog
+    __slots__ = ('catalog', 'base', 'count')
+
+    def __init__(self, catalog, base, count):
+        self.catalog = catalog
+        self.base = base
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return self.catalog._read_record(self.base + i)
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.catalog._read_record(self.base + i)
+
+
+class PackedCatalog:
+    """Seeks to and decodes one record at a time from the packed catalog file."""
+
+    def __init__(self, path=PACKED_FILE):
+        self.path = path
+        self.index = self  # day lookups go straight to the file's day table
+        self._file = None
+        self._signature = None
+        self._head = bytearray(PACKED_RECORD_SIZE)
+        self._mv = memoryview(self._head)
+        self.source = None  # source_signature() of the JSON files it was built from
+        self.ko = self.sekki = self.shiki = PackedLayer(self, 0, 0)
+
+    def refresh(self):
+        """Reopens the file if its size or mtime changed; returns True if it did."""
+        signature = _file_signature(self.path)
+        if signature is not None and signature == self._signature:
+            return False
+        self.close()
+        self._file = open(self.path, 'rb')
+        header = self._file.read(PACKED_HEADER_SIZE)
+        if len(header) < PACKED_HEADER_SIZE or header[:5] != PACKED_MAGIC + bytes((PACKED_FORMAT,)):
+            self.close()
+            raise ValueError("not a packed season catalog of this format")
+        _, _, n_ko, n_sekki, n_shiki, days, table, self.source = struct.unpack(PACKED_HEADER, header)
+        self._days = days
+        self._table = table
+        self.ko = PackedLayer(self, 0, n_ko)
+        self.sekki = PackedLayer(self, n_ko, n_sekki)
+        self.shiki = PackedLayer(self, n_ko + n_sekki, n_shiki)
+        self._signature = signature
+        return True
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _read_into(self, offset, size):
+        self._file.seek(offset)
+        self._file.readinto(self._mv[:size])
+
+    def _read_record(self, slot):
+        self._read_into(self._table + slot * 4, 4)
+        offset = struct.unpack_from('<I', self._head)[0]
+        self._read_into(offset, PACKED_RECORD_SIZE)
+        number, sm, sd, em, ed, nk, nr, ne = struct.unpack(PACKED_RECORD, self._head)
+        text = self._file.read(nk + nr + ne)
+        return Season(number, str(text[:nk], 'utf-8'), str(text[nk:nk + nr], 'utf-8'),
+                      str(text[nk + nr:], 'utf-8'), sm, sd, em, ed)
+
+    def get(self, layer, number):
+        if 0 < number <= layer.count:
+            return self._read_record(layer.base + number - 1)
+        return None
+
+    def lookup(self, month, day):
+        """Returns (ko, sekki, shiki, starts) for a month and day, like CalendarIndex."""
+        self._read_into(self._days + day_of_year(month, day) * 4, 4)
+        head = self._head
+        return head[0], head[1], head[2], head[3]
+
+
+def source_signature(directory=''):
+    """Returns the CRC-32 of the three JSON files in turn, or None if none of them is there."""
+    crc = 0
+    found = False
+    buf = bytearray(256)
+    mv = memoryview(buf)
+    for name in (KO_FILE, SEKKI_FILE, SHIKI_FILE):
+        try:
+            with open(directory + '/' + name if directory else name, 'rb') as f:
+                found = True
+                while True:
+                    n = f.readinto(buf)
+                    if not n:
+                        break
+                    crc = crc32(mv[:n], crc)
+        except OSError:
+            pass
+    return crc if found else None
+
+
+def open_catalog(directory='', stream=False):
+    """Returns the packed catalog if one has been built from the JSON files as they are, otherwise the
+    JSON catalog, streamed if stream is True."""
+    path = directory + '/' + PACKED_FILE if directory else PACKED_FILE
+    if _file_signature(path) is not None:
+        catalog = PackedCatalog(path)
+        try:
+            catalog.refresh()
+            source = source_signature(directory)
+            if source is None or source == catalog.source:
+                return catalog
+            catalog.close()
+            print(f"{PACKED_FILE} was not built from these JSON files, reading them instead; run build_catalog.py.")
+        except (OSError, ValueError) as e:
+            print(f"Failed to open packed catalog: {e}")
+    return StreamingCatalog(directory) if stream else SeasonCatalog(directory)
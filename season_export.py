@@ -0,0 +1,252 @@
+# Exports kō, sekki and shiki periods for a range of years as iCalendar
+# all-day events or CSV rows, in any timezone. Every stage is a generator and
+# output is written in batches, so memory stays flat however many years are
+# exported.
+#
+#   python season_export.py --from 2026 --to 2030 --tz "JST-9" -o seasons.ics
+#   python season_export.py --from 2026 --to 2026 --format csv --layers ko
+#   python season_export.py --bench 10 100 1000
+
+import sys
+from season_catalog import open_catalog
+from solar_terms import KO_COUNT, SEKKI_FIRST_KO, SHIKI_FIRST_KO, compute_boundaries
+from timeutil import civil_from_days, days_from_civil, epoch_day, is_leap
+from tz import TimeZone
+
+version = "1.0.1"
+
+LAYERS = ('shiki', 'sekki', 'ko')  # order of periods that start on the same day
+BATCH_LINES = 256  # output lines joined per file write
+PRODID = '-//ko-microseason-calendar//season_export//EN'
+
+_SEKKI_OF = {ko: i + 1 for i, ko in enumerate(SEKKI_FIRST_KO)}
+_SHIKI_OF = {ko: i + 1 for i, ko in enumerate(SHIKI_FIRST_KO)}
+_LOOKAHEAD = KO_COUNT // len(SHIKI_FIRST_KO)  # kō starts until the longest period (a shiki) ends
+
+
+def _ko_starts(first, last, tz):
+    # (local day, kō number) of every kō start from the year before the first, whose last kō can
+    # start on January 1 in zones east of UTC, into the year after the last
+    for year in range(first - 1, last + 2):
+        for n, t in enumerate(compute_boundaries(year)):
+            yield epoch_day(tz.local(t)), n + 1
+
+
+def solar_periods(first, last, tz):
+    """Yields (layer, number, first day, last day) for periods starting in a range of years.
+
+    Days are epoch day numbers of local dates in tz. Periods come in start
+    order and run across the year end as the sun does.
+    """
+    first_day = days_from_civil(first, 1, 1)
+    last_day = days_from_civil(last, 12, 31)
+    window = []  # upcoming kō starts, to see where each period ends
+    for start in _ko_starts(first, last, tz):
+        window.append(start)
+        if len(window) <= _LOOKAHEAD:
+            continue
+        day, ko = window.pop(0)
+        if day > last_day:
+            return
+        if day < first_day:
+            continue
+        if ko in _SHIKI_OF:
+            yield 'shiki', _SHIKI_OF[ko], day, window[_LOOKAHEAD - 1][0] - 1
+        if ko in _SEKKI_OF:
+            yield 'sekki', _SEKKI_OF[ko], day, window[2][0] - 1
+        yield 'ko', ko, day, window[0][0] - 1
+
+
+def fixed_periods(catalog, first, last):
+    """Yields (layer, number, first day, last day) from the catalog's fixed dates, year by year.
+
+    A period whose end date is before its start date ends in the next year.
+    """
+    for year in range(first, last + 1):
+        periods = []
+        for order, (layer, records) in enumerate((('shiki', catalog.shiki), ('sekki', catalog.sekki),
+                                                  ('ko', catalog.ko))):
+            for r in records:
+                end_year = year + 1 if (r.end_month, r.end_day) < (r.start_month, r.start_day) else year
+                end_day = 28 if (r.end_month, r.end_day) == (2, 29) and not is_leap(end_year) else r.end_day
+                periods.append((days_from_civil(year, r.start_month, r.start_day), order, layer, r.number,
+                                days_from_civil(end_year, r.end_month, end_day)))
+        periods.sort()
+        for start, _, layer, number, end in periods:
+            yield layer, number, start, end
+
+
+def only(layers, periods):
+    for period in periods:
+        if period[0] in layers:
+            yield period
+
+
+class _Records:
+    # Season records by layer and number, read from the catalog once
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.records = {}
+
+    def get(self, layer, number):
+        key = (layer, number)
+        record = self.records.get(key)
+        if record is None:
+            record = self.records[key] = self.catalog.get(getattr(self.catalog, layer), number)
+        return record
+
+
+def _date(day):
+    y, m, d = civil_from_days(day)
+    return f"{y:04d}{m:02d}{d:02d}"
+
+
+def _ical_text(text):
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _fold(line):
+    # Lines longer than 75 octets continue on the next line after a space, split between characters
+    if len(line.encode('utf-8')) <= 75:
+        return line + '\r\n'
+    out = []
+    size = 0
+    for ch in line:
+        n = len(ch.encode('utf-8'))
+        if size + n > 75:
+            out.append('\r\n ')
+            size = 1
+        out.append(ch)
+        size += n
+    out.append('\r\n')
+    return ''.join(out)
+
+
+LABELS = {'ko': 'Kō', 'sekki': 'Sekki', 'shiki': 'Shiki'}
+
+
+def ical_lines(catalog, periods, stamp='19700101T000000Z'):
+    """Yields iCalendar lines (CRLF-terminated), one all-day VEVENT per period."""
+    records = _Records(catalog)
+    yield 'BEGIN:VCALENDAR\r\n'
+    yield 'VERSION:2.0\r\n'
+    yield f'PRODID:{PRODID}\r\n'
+    yield 'CALSCALE:GREGORIAN\r\n'
+    for layer, number, first, last in periods:
+        r = records.get(layer, number)
+        if r is None:
+            continue
+        start = _date(first)
+        yield 'BEGIN:VEVENT\r\n'
+        yield f'UID:{layer}-{number}-{start}@ko-calendar\r\n'
+        yield f'DTSTAMP:{stamp}\r\n'
+        yield f'DTSTART;VALUE=DATE:{start}\r\n'
+        yield f'DTEND;VALUE=DATE:{_date(last + 1)}\r\n'  # exclusive
+        yield _fold(f'SUMMARY:{LABELS[layer]} {number}: {_ical_text(r.en)} ({r.kanji})')
+        yield _fold(f'DESCRIPTION:{_ical_text(r.romaji)}')
+        yield 'TRANSP:TRANSPARENT\r\n'
+        yield 'END:VEVENT\r\n'
+    yield 'END:VCALENDAR\r\n'
+
+
+def _csv_field(text):
+    if ',' in text or '"' in text or '\n' in text:
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def csv_lines(catalog, periods):
+    """Yields CSV lines: layer, number, first and last day (ISO dates), kanji, romaji, English."""
+    records = _Records(catalog)
+    yield 'layer,number,start,end,kanji,romaji,en\r\n'
+    for layer, number, first, last in periods:
+        r = records.get(layer, number)
+        if r is None:
+            continue
+        y, m, d = civil_from_days(first)
+        ey, em, ed = civil_from_days(last)
+        yield (f'{layer},{number},{y:04d}-{m:02d}-{d:02d},{ey:04d}-{em:02d}-{ed:02d},'
+               f'{_csv_field(r.kanji)},{_csv_field(r.romaji)},{_csv_field(r.en)}\r\n')
+
+
+def write_batched(f, lines, batch=BATCH_LINES):
+    """Writes lines to f, joining batch of them per write; returns the number of lines."""
+    pending = []
+    count = 0
+    for line in lines:
+        pending.append(line)
+        if len(pending) >= batch:
+            f.write(''.join(pending))
+            count += len(pending)
+            del pending[:]
+    if pending:
+        f.write(''.join(pending))
+        count += len(pending)
+    return count
+
+
+def export(f, catalog, first, last, tz=None, fmt='ics', layers=LAYERS, fixed=False):
+    """Writes the periods of a range of years to f; returns the number of periods written.
+
+    Solar dates in tz are used unless fixed is set, which uses the catalog's dates.
+    """
+    periods = fixed_periods(catalog, first, last) if fixed else solar_periods(first, last, tz or TimeZone('UTC0'))
+    count = [0]
+
+    def counted(periods):
+        for period in only(layers, periods):
+            count[0] += 1
+            yield period
+    lines = ical_lines(catalog, counted(periods)) if fmt == 'ics' else csv_lines(catalog, counted(periods))
+    write_batched(f, lines)
+    return count[0]
+
+
+def bench(catalog, sizes, tz, fmt='ics', first=2026):
+    """Exports growing year ranges to the null device; returns rows of (years, events, events/s, peak RSS KB)."""
+    import os
+    import resource
+    import time as host_time
+    rows = []
+    with open(os.devnull, 'w', encoding='utf-8') as f:
+        for years in sizes:
+            started = host_time.perf_counter()
+            events = export(f, catalog, first, first + years - 1, tz, fmt)
+            elapsed = host_time.perf_counter() - started
+            rows.append((years, events, events / elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+    return rows
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Export kō, sekki and shiki periods as iCalendar or CSV.")
+    parser.add_argument('--from', dest='first', type=int, default=2026)
+    parser.add_argument('--to', dest='last', type=int, help="last year, default the first")
+    parser.add_argument('--tz', default='UTC0', help="POSIX TZ rule for local dates")
+    parser.add_argument('--format', choices=('ics', 'csv'), default='ics')
+    parser.add_argument('--layers', default=','.join(LAYERS), help="comma-separated subset of ko,sekki,shiki")
+    parser.add_argument('--fixed', action='store_true', help="use the catalog's fixed dates, not solar dates")
+    parser.add_argument('-o', '--output', help="output file, default stdout")
+    parser.add_argument('--bench', type=int, nargs='+', metavar='YEARS', help="time exports of these many years")
+    args = parser.parse_args(argv)
+    catalog = open_catalog()
+    tz = TimeZone(args.tz)
+    if args.bench:
+        print("years  events  events/s  peak RSS KB")
+        for years, events, rate, rss in bench(catalog, args.bench, tz, args.format):
+            print(f"{years:5}  {events:6}  {rate:8.0f}  {rss:11}")
+        return 0
+    layers = tuple(args.layers.split(','))
+    last = args.last if args.last is not None else args.first
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            events = export(f, catalog, args.first, last, tz, args.format, layers, args.fixed)
+        print(f"Wrote {events} periods to {args.output}")
+    else:
+        sys.stdout.reconfigure(newline='')
+        export(sys.stdout, catalog, args.first, last, tz, args.format, layers, args.fixed)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# Day-of-year lookup table for the kō, sekki and shiki calendar layers.
+# Built once at boot so that "what is in effect today and what starts today"
+# is a single array lookup with no string parsing.
+
+version = "1.0.0"
+
+# Days before each month in a leap year, so every MM-DD has its own slot
+DAYS_BEFORE_MONTH = (0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335)
+DAYS_IN_YEAR = 366
+
+# Bit flags stored in CalendarIndex.starts
+STARTS_KO = 0x01
+STARTS_SEKKI = 0x02
+STARTS_SHIKI = 0x04
+
+
+def day_of_year(month, day):
+    """Returns the 0-based slot (0-365) for a month and day, Feb 29 included."""
+    return DAYS_BEFORE_MONTH[month - 1] + day - 1
+
+
+def month_day(slot):
+    """Returns (month, day) for a 0-based slot from day_of_year()."""
+    month = 12
+    while DAYS_BEFORE_MONTH[month - 1] > slot:
+        month -= 1
+    return month, slot - DAYS_BEFORE_MONTH[month - 1] + 1
+
+
+def parse_month_day(text):
+    """Parses an "MM-DD" string into (month, day)."""
+    return int(text[:2]), int(text[3:5])
+
+
+class CalendarIndex:
+    __slots__ = ('ko', 'sekki', 'shiki', 'starts')
+
+    def __init__(self):
+        self.ko = bytearray(DAYS_IN_YEAR)
+        self.sekki = bytearray(DAYS_IN_YEAR)
+        self.shiki = bytearray(DAYS_IN_YEAR)
+        self.starts = bytearray(DAYS_IN_YEAR)
+
+    def fill(self, table, flag, ranges):
+        # ranges yields (number, start_slot, end_slot); end before start wraps
+        # through the end of the year (e.g. kō 72 and Winter)
+        for number, start, end in ranges:
+            self.starts[start] |= flag
+            if end < start:
+                end += DAYS_IN_YEAR
+            for slot in range(start, end + 1):
+                table[slot % DAYS_IN_YEAR] = number
+        # Slots left uncovered by the source data (Feb 29) stay in the season
+        # in effect the day before
+        for slot in range(DAYS_IN_YEAR):
+            if table[slot] == 0:
+                table[slot] = table[slot - 1]
+
+    def span(self, table, number):
+        """Returns (start_slot, end_slot) of the days a season covers in one of the tables, or None."""
+        for start in range(DAYS_IN_YEAR):
+            if table[start] == number and table[start - 1] != number:
+                end = start
+                while table[(end + 1) % DAYS_IN_YEAR] == number and (end + 1) % DAYS_IN_YEAR != start:
+                    end += 1
+                return start, end % DAYS_IN_YEAR
+        return None
+
+    def lookup(self, month, day):
+        """Returns (ko, sekki, shiki, starts) for a month and day; 0 means none."""
+        slot = day_of_year(month, day)
+        return self.ko[slot], self.sekki[slot], self.shiki[slot], self.starts[slot]
+
+
+def _ranges(records):
+    for r in records:
+        yield r.number, day_of_year(r.start_month, r.start_day), day_of_year(r.end_month, r.end_day)
+
+
+def build_index(ko, sekki, shiki):
+    """Builds a CalendarIndex from the kō, sekki and shiki season records."""
+    index = CalendarIndex()
+    index.fill(index.ko, STARTS_KO, _ranges(ko))
+    index.fill(index.sekki, STARTS_SEKKI, _ranges(sekki))
+    index.fill(index.shiki, STARTS_SHIKI, _ranges(shiki))
+    return index
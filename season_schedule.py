@@ -0,0 +1,54 @@
+# Yearly schedule of season print events.
+# Computed once after each time sync from the day-of-year index, so the main
+# loop can sleep straight to the next kō, sekki or shiki start.
+
+from array import array
+from season_index import day_of_year
+from timeutil import civil_from_days, days_from_civil, epoch_seconds
+
+version = "1.0.0"
+
+PRINT_HOUR = 9  # local hour at which a starting season is printed
+DAYS_AHEAD = 366
+
+
+class Schedule:
+    def __init__(self):
+        self.times = array('q')  # event instants in UTC epoch seconds, ascending
+        self.slots = array('H')  # day-of-year slot of each event
+        self.flags = bytearray()  # STARTS_* flags of each event
+
+    def __len__(self):
+        return len(self.times)
+
+    def build(self, index, year, month, day, to_utc, hour=PRINT_HOUR):
+        """Fills the schedule with every start in the DAYS_AHEAD days from the given local date.
+
+        index is a CalendarIndex, or a function returning the CalendarIndex for
+        a year; to_utc converts local epoch seconds to UTC epoch seconds.
+        """
+        times = array('q')
+        slots = array('H')
+        flags = bytearray()
+        index_for_year = index if callable(index) else lambda y: index
+        first = days_from_civil(year, month, day)
+        for n in range(first, first + DAYS_AHEAD):
+            y, m, d = civil_from_days(n)
+            starts = index_for_year(y).lookup(m, d)[3]  # CalendarIndex and PackedCatalog alike
+            if starts:
+                times.append(to_utc(epoch_seconds(y, m, d, hour)))
+                slots.append(day_of_year(m, d))
+                flags.append(starts)
+        self.times, self.slots, self.flags = times, slots, flags
+
+    def next_index(self, now):
+        """Returns the position of the first event after now, or -1 if the schedule has run out."""
+        times = self.times
+        lo, hi = 0, len(times)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if times[mid] <= now:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(times) else -1
@@ -0,0 +1,82 @@
+# Name lookup across the kō, sekki and shiki layers. Tokens are lowercase
+# words from the English names, words from the romaji with accents folded
+# ("kōri" -> "kori"), and each kanji on its own; a query matches seasons that
+# have a token starting with each of its words.
+
+version = "1.0.0"
+
+LAYER_NAMES = ('ko', 'sekki', 'shiki')
+
+# One-pass accent folding: every accented letter maps to its base letter
+ACCENTS = {}
+for _base, _accented in (('a', 'àáâãäåā'), ('e', 'èéêëē'), ('i', 'ìíîïī'), ('o', 'òóôõöōø'), ('u', 'ùúûüū'),
+                         ('A', 'ÀÁÂÃÄÅĀ'), ('E', 'ÈÉÊËĒ'), ('I', 'ÌÍÎÏĪ'), ('O', 'ÒÓÔÕÖŌØ'), ('U', 'ÙÚÛÜŪ')):
+    for _ch in _accented:
+        ACCENTS[_ch] = _base
+
+
+def de_accent(text):
+    """Replaces accented letters with their base letter, keeping case."""
+    return ''.join([ACCENTS.get(ch, ch) for ch in text])
+
+
+def tokens(text):
+    """Yields the search tokens of a string: lowercase ASCII words and single wide characters."""
+    word = []
+    for ch in de_accent(text):
+        if ch.isalpha() and ch < '\x80' or '0' <= ch <= '9':
+            word.append(ch)
+            continue
+        if word:
+            yield ''.join(word).lower()
+            word = []
+        if ord(ch) >= 0x2E80:  # kanji and kana
+            yield ch
+    if word:
+        yield ''.join(word).lower()
+
+
+class SearchIndex:
+    """Sorted token table over a catalog, for prefix queries."""
+
+    def __init__(self, catalog):
+        postings = {}
+        for layer, records in enumerate((catalog.ko, catalog.sekki, catalog.shiki)):
+            for record in records:
+                key = layer << 8 | record.number
+                for text in (record.en, record.romaji, record.kanji):
+                    for token in tokens(text):
+                        keys = postings.setdefault(token, [])
+                        if key not in keys:
+                            keys.append(key)
+        self.tokens = sorted(postings)
+        self.postings = [tuple(postings[token]) for token in self.tokens]
+
+    def _first(self, prefix):
+        # Index of the first token >= prefix
+        lo, hi = 0, len(self.tokens)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.tokens[mid] < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _matches(self, prefix):
+        found = set()
+        i = self._first(prefix)
+        while i < len(self.tokens) and self.tokens[i].startswith(prefix):
+            found.update(self.postings[i])
+            i += 1
+        return found
+
+    def search(self, query):
+        """Returns [(layer name, number)] of seasons matching every word of the query, kō first."""
+        result = None
+        for prefix in tokens(query):
+            found = self._matches(prefix)
+            result = found if result is None else result & found
+            if not result:
+                return []
+        return [(LAYER_NAMES[key >> 8], key & 0xFF) for key in sorted(result or ())]
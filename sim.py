@@ -0,0 +1,383 @@
+# CPython stand-ins for the MicroPython hardware and runtime modules the
+# calendar uses, driven by a virtual clock that jumps straight to the next
+# wake-up instead of sleeping. Imported through hal.py when `machine` is
+# not available; not used on the device.
+
+import asyncio as _asyncio
+import selectors
+import time as _time
+from timeutil import epoch_seconds
+
+version = "1.3.0"
+
+TICKS_PERIOD = 1 << 30  # MicroPython ticks wrap at 2**30
+_TICKS_HALF = TICKS_PERIOD // 2
+
+
+class StopSimulation(Exception):
+    pass
+
+
+class VirtualClock:
+    """Replaces the MicroPython time module; only moves when advanced."""
+
+    def __init__(self, start=0):
+        self.now = float(start)  # UTC epoch seconds as the RTC reads them
+        self.true_now = float(start)  # real UTC epoch seconds, what NTP reports
+        self.drift = 0.0  # RTC rate error, positive when it runs fast (1e-6 is 1 ppm)
+        self.us = 0  # integer microseconds since the simulated boot, so waits never round to nothing
+        self.stop_at = None  # raise StopSimulation once the real time passes this instant
+        self.wakeups = 0
+
+    @property
+    def mono(self):
+        return self.us / 1000000
+
+    def set(self, t):
+        self.now = float(t)
+
+    def reset(self, start):
+        self.now = self.true_now = float(start)
+        self.drift = 0.0
+        self.us = 0
+        self.wakeups = 0
+
+    def reboot(self):
+        # Ticks restart from zero; the RTC keeps running
+        self.us = 0
+
+    def advance(self, seconds):
+        if seconds <= 0:
+            return
+        if self.stop_at is not None and self.true_now + seconds > self.stop_at:
+            raise StopSimulation()
+        us = int(seconds * 1000000) + 1  # round up so timers due at the target are ready
+        self.true_now += us / 1000000
+        self.now += us / 1000000 * (1 + self.drift)
+        self.us += us
+
+    # time module API
+    def time(self):
+        return int(self.now)
+
+    def gmtime(self, t=None):
+        return _time.gmtime(self.time() if t is None else t)
+
+    localtime = gmtime  # the device RTC runs on UTC
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def sleep_ms(self, ms):
+        self.advance(ms / 1000)
+
+    def sleep_us(self, us):
+        self.advance(us / 1000000)
+
+    def ticks_ms(self):
+        return (self.us // 1000) % TICKS_PERIOD
+
+    def ticks_us(self):
+        return self.us % TICKS_PERIOD
+
+    def ticks_add(self, ticks, delta):
+        return (ticks + delta) % TICKS_PERIOD
+
+    def ticks_diff(self, end, start):
+        return (end - start + _TICKS_HALF) % TICKS_PERIOD - _TICKS_HALF
+
+
+clock = VirtualClock(_time.time())
+
+
+class _VirtualSelector(selectors.SelectSelector):
+    # An idle event loop waits in select(); advance the clock instead
+    def select(self, timeout=None):
+        if timeout is None:
+            raise RuntimeError("simulation deadlocked: no task is waiting on a timer")
+        if timeout > 0:
+            clock.wakeups += 1
+            clock.advance(timeout)
+        return []
+
+
+class _VirtualEventLoop(_asyncio.SelectorEventLoop):
+    def __init__(self):
+        super().__init__(_VirtualSelector())
+        self._clock_resolution = 1e-6  # the virtual clock counts whole microseconds
+
+    def time(self):
+        return clock.mono
+
+
+class ThreadSafeFlag:
+    """asyncio.ThreadSafeFlag: set() may be called from an IRQ handler."""
+
+    def __init__(self):
+        self._event = None
+        self._pending = False
+
+    def set(self):
+        self._pending = True
+        if self._event is not None:
+            self._event.set()
+
+    async def wait(self):
+        if not self._pending:
+            if self._event is None:
+                self._event = _asyncio.Event()
+            self._event.clear()
+            await self._event.wait()
+        self._pending = False
+
+
+class _Asyncio:
+    # The CPython asyncio module plus the MicroPython additions, on the virtual clock
+    ThreadSafeFlag = ThreadSafeFlag
+
+    def __getattr__(self, name):
+        return getattr(_asyncio, name)
+
+    @staticmethod
+    async def sleep_ms(ms):
+        await _asyncio.sleep(ms / 1000)
+
+    @staticmethod
+    def new_event_loop():
+        return _VirtualEventLoop()
+
+    @staticmethod
+    def run(coro):
+        loop = _VirtualEventLoop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            stop_at, clock.stop_at = clock.stop_at, None
+            tasks = _asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            if tasks:  # gather() with nothing to wait for would make its future on another loop
+                loop.run_until_complete(_asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+            clock.stop_at = stop_at
+
+
+asyncio = _Asyncio()
+
+
+class _MicroPython:
+    # micropython module: scheduled callbacks run on the event loop soon after the IRQ returns
+    def __init__(self):
+        self.scheduled = 0
+
+    def schedule(self, func, arg):
+        self.scheduled += 1
+        try:
+            _asyncio.get_running_loop().call_soon(func, arg)
+        except RuntimeError:  # no loop running
+            func(arg)
+
+    def alloc_emergency_exception_buf(self, size):
+        pass
+
+    @staticmethod
+    def const(value):
+        return value
+
+
+micropython = _MicroPython()
+
+
+pins = {}  # every Pin created, by id, so a simulation can press buttons
+uarts = []  # every UART created, in order
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 1
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode=IN, pull=None, value=None):
+        self.id = id
+        self._value = 1 if pull == Pin.PULL_UP else 0
+        self.handler = None
+        self.toggles = 0
+        pins[id] = self
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        if bool(v) != bool(self._value):
+            self.toggles += 1
+        self._value = 1 if v else 0
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING):
+        self.handler = handler
+
+    def press(self):
+        """Simulates a falling edge, calling the IRQ handler as the hardware would."""
+        self._value = 0
+        if self.handler is not None:
+            self.handler(self)
+        self._value = 1
+
+
+class UART:
+    def __init__(self, id, baudrate=9600, **kwargs):
+        self.id = id
+        self.baudrate = baudrate
+        self.output = bytearray()  # everything written, for inspection
+        self.writes = 0
+        uarts.append(self)
+
+    def init(self, baudrate=None, **kwargs):
+        if baudrate:
+            self.baudrate = baudrate
+
+    def write(self, data):
+        self.output += data
+        self.writes += 1
+        return len(data)
+
+    def txdone(self):
+        return True  # bytes are delivered as soon as they are written
+
+    def read(self, n=None):
+        return None
+
+    def any(self):
+        return 0
+
+
+class RTC:
+    def datetime(self, dt=None):
+        if dt is None:
+            t = clock.gmtime()
+            return (t[0], t[1], t[2], t[6], t[3], t[4], t[5], 0)
+        year, month, day, _, hour, minute, second = dt[:7]
+        clock.set(epoch_seconds(year, month, day, hour, minute, second))
+
+
+def reset():
+    raise StopSimulation("machine.reset()")
+
+
+class DeepSleep(Exception):
+    """Raised by deepsleep(); the simulation sleeps and boots the calendar again."""
+
+    def __init__(self, ms):
+        super().__init__(ms)
+        self.ms = ms
+
+
+wake_at = None  # real time of the next button press, set by a simulation so lightsleep can end early
+slept = 0.0  # real seconds spent in lightsleep or deepsleep
+
+
+def lightsleep(ms=None):
+    """machine.lightsleep: the clock jumps to the end of the sleep, or to wake_at if that comes first."""
+    global wake_at, slept
+    seconds = ms / 1000 if ms is not None else float('inf')
+    if wake_at is not None and wake_at < clock.true_now + seconds:
+        seconds = max(0.0, wake_at - clock.true_now)
+        wake_at = None
+    clock.wakeups += 1
+    if clock.stop_at is not None and clock.true_now + seconds > clock.stop_at:
+        slept += max(0.0, clock.stop_at - clock.true_now)  # asleep when the simulation ends
+    clock.advance(seconds)
+    slept += seconds
+    return seconds
+
+
+def deepsleep(ms=None):
+    raise DeepSleep(ms)
+
+
+class _Memory:
+    # machine.mem32, for the few words kept in registers across a deepsleep reset
+    def __init__(self):
+        self.words = {}
+
+    def __getitem__(self, address):
+        return self.words.get(address, 0)
+
+    def __setitem__(self, address, value):
+        self.words[address] = value & 0xFFFFFFFF
+
+    def power_on(self):
+        self.words.clear()
+
+
+mem32 = _Memory()
+
+
+class _Network:
+    STA_IF = 0
+    STAT_GOT_IP = 3
+
+    def __init__(self):
+        self.available = True  # set False to simulate an unreachable access point
+        self.connects = 0
+
+    def WLAN(self, interface=0):
+        return _WLAN(self)
+
+
+class _WLAN:
+    def __init__(self, network):
+        self._network = network
+        self._active = False
+        self._status = 0
+
+    def active(self, state=None):
+        if state is None:
+            return self._active
+        self._active = bool(state)
+        if not state:
+            self._status = 0
+
+    def connect(self, ssid=None, password=None):
+        self._network.connects += 1
+        self._status = 3 if self._active and self._network.available else -2
+
+    def disconnect(self):
+        self._status = 0
+
+    def status(self):
+        return self._status
+
+    def isconnected(self):
+        return self._status == 3
+
+    def ifconfig(self):
+        return ('192.168.0.2', '255.255.255.0', '192.168.0.1', '192.168.0.1')
+
+
+network = _Network()
+
+
+class _NTP:
+    def __init__(self):
+        self.available = True  # set False to simulate an NTP timeout
+        self.true_time = None  # function returning the real time, default the clock's true_now
+        self.syncs = 0
+
+    def settime(self):
+        if not self.available:
+            raise OSError(110)  # ETIMEDOUT
+        self.syncs += 1
+        clock.set(self.time())
+
+    def time(self):
+        return self.true_time() if self.true_time is not None else int(clock.true_now)
+
+
+ntptime = _NTP()
@@ -0,0 +1,268 @@
+# Host-side simulation of the calendar: runs the real main() from
+# ko-calendar.py against the stand-ins in sim.py, on a virtual clock that
+# jumps straight to each wake-up, so years of operation take seconds.
+#
+#   python simulate.py --years 10
+#   python simulate.py --years 1 --metrics spans.csv
+#   python simulate.py --years 3 --reboots 12 --downtime 20
+#   python simulate.py --years 1 --power light --presses 20
+#   python simulate.py --years 2 --start 2026-03-01 --tz "CET-1CEST,M3.5.0,M10.5.0/3" --presses 20 -v
+
+import argparse
+import contextlib
+import importlib
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time as host_time
+import types
+
+import sim
+from power import ACTIVE_MA, RADIO_MA, SLEEP_MA, MODE_NAMES
+from state_journal import BOOTS, DRIFT_PPB, RADIO_BOOTS, RADIO_MS
+from timeutil import epoch_seconds
+
+version = "1.0.0"
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_FILES = ('microseasons_ko.json', 'mini_seasons_sekki.json', 'seasons_shiki.json', 'seasons.bin')
+BUTTON_PIN = 6
+
+
+def load_calendar(workdir, files=DATA_FILES):
+    """Imports ko-calendar.py with fake Wi-Fi credentials, reading and writing its files in workdir."""
+    secrets = types.ModuleType('secrets')
+    secrets.WIFI_SSID = 'simulated'
+    secrets.WIFI_PASSWORD = 'simulated'
+    sys.modules['secrets'] = secrets
+    for name in files:
+        if os.path.exists(os.path.join(HERE, name)):
+            shutil.copy(os.path.join(HERE, name), workdir)
+    os.chdir(workdir)
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+    sys.modules.pop('ko-calendar', None)
+    return importlib.import_module('ko-calendar')
+
+
+def simulate(years=10, start=(2026, 1, 1), tz=None, presses=0, burst=1, seed=1, verbose=False,
+             reboots=0, drift_ppm=0.0, downtime=0.0, power=0, files=DATA_FILES):
+    """Runs the calendar main loop for a number of years of virtual time; returns a report dict.
+
+    reboots restarts the calendar that many times, evenly spread, keeping its
+    files and the RTC, after downtime days switched off; drift_ppm makes the RTC
+    run fast (or slow, if negative). power is the calendar's POWER_MODE.
+    files are the catalog files copied from the repository for it to read.
+    """
+    clock = sim.clock
+    clock.reset(epoch_seconds(*start))
+    clock.drift = drift_ppm * 1e-6
+    end = clock.true_now + years * 365.2425 * 86400
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='ko-sim-')
+    log = sys.stdout if verbose else io.StringIO()
+    slips = {'ko': [], 'sekki': [], 'shiki': []}
+    batches = []
+    ready_ms = []
+    max_error = 0
+    merged_slips = 0
+    rng = random.Random(seed)
+    elapsed = 0
+    # Start times of button press bursts over the whole run, in real time
+    bursts = sorted(rng.uniform(clock.true_now, end) for _ in range(presses))
+    sim.wake_at = None
+    sim.slept = 0.0
+    off_total = 0.0
+    deep_wakes = button_wakes = 0
+    journal_writes = 0  # state journal appends and compactions, over every boot
+    latency_ms = 0
+
+    def start_calendar():
+        cal = load_calendar(workdir, files)
+        if tz:
+            cal.TIMEZONE = tz
+            cal.tz = cal.TimeZone(tz)
+        cal.POWER_MODE = power
+        cal.power = cal.Power(power, cal.state)  # made at import with the default mode
+        send_job = cal.send_job
+        layers = {cal.LAYER_KO: 'ko', cal.LAYER_SEKKI: 'sekki', cal.LAYER_SHIKI: 'shiki'}
+
+        async def counted_job(printer, layer, render, season, merged=False):
+            nonlocal max_error, merged_slips
+            max_error = max(max_error, abs(clock.now - clock.true_now))  # RTC error when printing
+            slips[layers[layer]].append((clock.gmtime()[0], season.number))
+            merged_slips += merged
+            await send_job(printer, layer, render, season, merged)
+        cal.send_job = counted_job
+        print_batch = cal.print_microseason_batch
+
+        async def counted_batch(printer, microseasons):
+            batches.append(len(microseasons))
+            await print_batch(printer, microseasons)
+        cal.print_microseason_batch = counted_batch
+        ready = cal.timekeeper.ready
+
+        def timed_ready():
+            result = ready()
+            ready_ms.append(result[0])
+            return result
+        cal.timekeeper.ready = timed_ready
+        return cal
+
+    async def press_button():
+        while bursts:
+            t = bursts[0]
+            if t < clock.true_now - 1:  # came while the device was off
+                bursts.pop(0)
+                continue
+            sim.wake_at = t  # ends a lightsleep, as the pin IRQ would
+            await sim.asyncio.sleep(max(0.0, t - clock.true_now))
+            bursts.pop(0)
+            sim.wake_at = None
+            # A burst of quick presses, each followed by a little contact bounce
+            for _ in range(rng.randint(1, burst)):
+                sim.pins[BUTTON_PIN].press()
+                await sim.asyncio.sleep(0.005)
+                sim.pins[BUTTON_PIN].press()
+                await sim.asyncio.sleep(rng.uniform(0.15, 0.4))
+
+    async def run(cal):
+        if bursts:
+            sim.asyncio.create_task(press_button())
+        await cal.main()
+
+    try:
+        with contextlib.redirect_stdout(log):
+            for boot in range(reboots + 1):
+                if boot and downtime:
+                    # Switched off for a while: nothing runs, the RTC keeps counting
+                    off = min(downtime * 86400, end - clock.true_now)
+                    clock.true_now += off
+                    clock.now += off * (1 + clock.drift)
+                    off_total += off
+                clock.stop_at = clock.true_now + (end - clock.true_now) / (reboots + 1 - boot)
+                sim.mem32.power_on()
+                sim.wake_at = None  # a press due when it was switched off is dropped by press_button
+                while True:
+                    clock.reboot()
+                    cal = start_calendar()
+                    started = host_time.perf_counter()
+                    try:
+                        sim.asyncio.run(run(cal))
+                        break
+                    except sim.StopSimulation:
+                        break
+                    except sim.DeepSleep as e:
+                        # The board sleeps, then boots again; a press that ends the sleep is only a wake
+                        woke = sim.wake_at
+                        try:
+                            sim.lightsleep(e.ms)
+                        except sim.StopSimulation:
+                            break
+                        if woke is not None and sim.wake_at is None:
+                            bursts.pop(0)
+                            button_wakes += 1
+                        sim.wake_at = None
+                        deep_wakes += 1
+                    finally:
+                        elapsed += host_time.perf_counter() - started
+                        journal_writes += cal.state.appends + cal.state.compactions
+                        latency_ms = max(latency_ms, cal.power.max_latency_ms)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    per_year = {}
+    for year, number in slips['ko']:
+        per_year.setdefault(year, []).append(number)
+    boots = cal.state.get(BOOTS)
+    # Average current from real sleep and radio time; CPU work itself takes no simulated time
+    on = end - epoch_seconds(*start) - off_total
+    slept = min(sim.slept, on)
+    radio = cal.state.get(RADIO_MS) / 1000
+    draw_ma = ((on - slept - radio) * ACTIVE_MA + radio * RADIO_MA + slept * SLEEP_MA) / on if on else 0
+    return {
+        'years': years,
+        'wall_seconds': elapsed,
+        'wakeups': clock.wakeups,
+        'ko_slips': len(slips['ko']),
+        'sekki_slips': len(slips['sekki']),
+        'shiki_slips': len(slips['shiki']),
+        'uart_bytes': sum(len(u.output) for u in sim.uarts),
+        'uart_writes': sum(u.writes for u in sim.uarts),
+        'ntp_syncs': sim.ntptime.syncs,
+        'button_batches': len(batches),
+        'button_slips': sum(batches),
+        'irq_max_us': cal.irq_max_us,
+        'schedule_max_us': cal.schedule_max_us,
+        'boots': boots,
+        'offline_boots': boots - cal.state.get(RADIO_BOOTS),
+        'ready_ms_max': max(ready_ms) if ready_ms else 0,
+        'drift_ppb': cal.state.get(DRIFT_PPB),
+        'max_clock_error': max_error,
+        'merged_slips': merged_slips,
+        'power': power,
+        'draw_ma': draw_ma,
+        'estimated_draw_ma': cal.power.draw_ma(),
+        'asleep_share': slept / on if on else 0,
+        'deep_wakes': deep_wakes,
+        'button_wakes': button_wakes,
+        'latency_ms_max': latency_ms,
+        'journal_writes': journal_writes,
+        'ko_numbers': [number for _, number in slips['ko']],  # in print order
+        'ko_per_year': {year: len(numbers) for year, numbers in sorted(per_year.items())},
+        'repeated_ko': {year: sorted(n for n in set(numbers) if numbers.count(n) > 1)
+                        for year, numbers in sorted(per_year.items()) if len(set(numbers)) != len(numbers)},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate the kō calendar on a virtual clock.")
+    parser.add_argument('--years', type=float, default=10)
+    parser.add_argument('--start', default='2026-01-01', help="UTC start date, YYYY-MM-DD")
+    parser.add_argument('--tz', help="POSIX TZ rule, default the one in ko-calendar.py")
+    parser.add_argument('--presses', type=int, default=0, help="random button presses over the run")
+    parser.add_argument('--burst', type=int, default=1, help="up to this many quick presses each time")
+    parser.add_argument('--reboots', type=int, default=0, help="restart the calendar this many times")
+    parser.add_argument('--downtime', type=float, default=0.0, help="days switched off before each reboot")
+    parser.add_argument('--drift', type=float, default=0.0, help="RTC rate error in ppm, positive runs fast")
+    parser.add_argument('--power', choices=MODE_NAMES, default='awake', help="the calendar's POWER_MODE")
+    parser.add_argument('--metrics', metavar='FILE', help="record spans with metrics.py and write the dump here")
+    parser.add_argument('-v', '--verbose', action='store_true', help="show the calendar's console output")
+    args = parser.parse_args(argv)
+    start = tuple(int(part) for part in args.start.split('-'))
+    if args.metrics:
+        import metrics
+        metrics.enable()
+    report = simulate(args.years, start, args.tz, args.presses, args.burst, verbose=args.verbose,
+                      reboots=args.reboots, drift_ppm=args.drift, downtime=args.downtime,
+                      power=MODE_NAMES.index(args.power))
+    print(f"Simulated {report['years']} years in {report['wall_seconds']:.2f} s: "
+          f"{report['wakeups']} wake-ups, {report['ntp_syncs']} NTP syncs")
+    print(f"Slips: {report['ko_slips']} kō, {report['sekki_slips']} sekki, {report['shiki_slips']} shiki; "
+          f"{report['uart_bytes']} bytes in {report['uart_writes']} UART writes; "
+          f"{report['merged_slips']} kō merged into the slip before")
+    print(f"Boots: {report['boots']}, {report['offline_boots']} without Wi-Fi; slowest boot-to-ready "
+          f"{report['ready_ms_max']} ms; measured drift {report['drift_ppb'] / 1000:.1f} ppm, "
+          f"largest clock error {report['max_clock_error']:.1f} s; {report['journal_writes']} state journal writes")
+    print(f"Power ({args.power}): average {report['draw_ma']:.2f} mA (device estimate {report['estimated_draw_ma']:.2f} mA), "
+          f"asleep {report['asleep_share']:.3%}; {report['deep_wakes']} deep-sleep wakes, "
+          f"{report['button_wakes']} by the button; slowest wake to print {report['latency_ms_max']} ms")
+    if args.presses:
+        print(f"Button: {report['button_slips']} kō in {report['button_batches']} batches; "
+              f"worst IRQ handler {report['irq_max_us']} us, scheduled callback after {report['schedule_max_us']} us")
+    print("Kō slips per year: " + ", ".join(f"{y}: {n}" for y, n in report['ko_per_year'].items()))
+    if report['repeated_ko']:
+        print(f"Kō printed more than once in a year: {report['repeated_ko']}")
+    if args.metrics:
+        with open(args.metrics, 'w', encoding='utf-8') as f:
+            for line in metrics.rows():
+                f.write(line + '\n')
+        print(f"Wrote the last {min(metrics.count, metrics.SLOTS)} of {metrics.count} spans to {args.metrics}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,212 @@
+# Astronomical kō and sekki boundaries.
+# Each kō starts when the sun's apparent ecliptic longitude reaches a multiple
+# of 5 degrees (kō 1 at 285, the start of Shōkan), so the real dates drift by
+# a day from year to year. Boundaries come from the low-precision solar
+# longitude series in Meeus, "Astronomical Algorithms" ch. 25 (about 0.01
+# degree, or 15 minutes), and are cached on flash per year as 72 int32
+# offsets from that year's January 1, so any year fits.
+
+import math
+import os
+import struct
+from season_index import CalendarIndex, STARTS_KO, STARTS_SEKKI, STARTS_SHIKI, day_of_year
+from timeutil import SECONDS_PER_DAY, civil_from_days, days_from_civil, epoch_day, epoch_seconds
+
+version = "1.0.2"
+
+KO_COUNT = 72
+KO1_LONGITUDE = 285.0  # Shōkan, around Jan 5
+DEGREES_PER_DAY = 0.98564736  # mean motion of the sun
+DELTA_T = 69  # TT - UTC in seconds, close enough for day boundaries this century
+
+# Days are counted from J2000.0 (2000-01-01 12:00 TT) so single-precision
+# floats on the device keep minute resolution
+J2000 = epoch_seconds(2000, 1, 1, 12) - DELTA_T
+CACHE_FILE = 'solar_terms2.bin'  # solar_terms.bin held offsets from 2000, which overflow by 2068
+OLD_CACHE_FILE = 'solar_terms.bin'  # removed once the new cache is written
+CACHE_RECORD = '<h72i'  # year, then seconds from its January 1 00:00 UTC
+CACHE_RECORD_SIZE = 2 + 4 * KO_COUNT
+CACHE_YEARS = (-32768, 32767)  # years a record can hold
+
+# Years in which the series and the fixed DELTA_T keep boundaries within minutes
+FIRST_YEAR = 1800
+LAST_YEAR = 2200
+
+# The kō that opens each sekki and each shiki
+SEKKI_FIRST_KO = tuple((6 + 3 * i) % KO_COUNT + 1 for i in range(24))  # sekki 1 (Risshun) is kō 7
+SHIKI_FIRST_KO = (7, 25, 43, 61)
+
+
+def solar_longitude(d):
+    """Returns the sun's apparent ecliptic longitude in degrees, d days after J2000.0."""
+    t = d / 36525
+    l0 = (280.46646 + (DEGREES_PER_DAY * d) % 360 + 0.0003032 * t * t) % 360
+    m = math.radians((357.52911 + (0.98560028 * d) % 360 - 0.0001537 * t * t) % 360)
+    c = ((1.914602 - 0.004817 * t - 0.000014 * t * t) * math.sin(m)
+         + (0.019993 - 0.000101 * t) * math.sin(2 * m) + 0.000289 * math.sin(3 * m))
+    omega = math.radians(125.04 - (0.05295378 * d) % 360)
+    return (l0 + c - 0.00569 - 0.00478 * math.sin(omega)) % 360
+
+
+def _first_guess(year, n):
+    # Mean-motion estimate, in days from J2000, of kō n's start in a year
+    return (days_from_civil(year, 1, 5) - days_from_civil(2000, 1, 1) - 0.5
+            + (n - 1) * 365.2422 / KO_COUNT)
+
+
+def compute_boundaries(year):
+    """Returns the 72 kō start instants of a year in UTC epoch seconds, kō 1 first."""
+    result = []
+    for n in range(1, KO_COUNT + 1):
+        target = (KO1_LONGITUDE + 5 * (n - 1)) % 360
+        d = _first_guess(year, n)
+        for _ in range(4):
+            d += ((target - solar_longitude(d) + 180) % 360 - 180) / DEGREES_PER_DAY
+        result.append(J2000 + int(round(d * SECONDS_PER_DAY)))
+    return result
+
+
+def compute_boundaries_batch(years):
+    """Returns the 72 kō start instants of each of years, one row per year.
+
+    Vectorised with NumPy on CPython, for building tables for hundreds of
+    years at once, when the rows are an int64 array of shape (len(years), 72);
+    without NumPy they are lists from compute_boundaries.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return [compute_boundaries(year) for year in years]
+    years = np.asarray(years, dtype=np.int64)
+    jan5 = np.array([days_from_civil(int(y), 1, 5) for y in years], dtype=np.float64)
+    n = np.arange(KO_COUNT, dtype=np.float64)
+    d = (jan5 - days_from_civil(2000, 1, 1) - 0.5)[:, None] + n[None, :] * (365.2422 / KO_COUNT)
+    target = (KO1_LONGITUDE + 5 * n) % 360
+    for _ in range(4):
+        t = d / 36525
+        l0 = (280.46646 + DEGREES_PER_DAY * d + 0.0003032 * t * t) % 360
+        m = np.radians((357.52911 + 0.98560028 * d - 0.0001537 * t * t) % 360)
+        c = ((1.914602 - 0.004817 * t - 0.000014 * t * t) * np.sin(m)
+             + (0.019993 - 0.000101 * t) * np.sin(2 * m) + 0.000289 * np.sin(3 * m))
+        omega = np.radians(125.04 - 0.05295378 * d)
+        lon = (l0 + c - 0.00569 - 0.00478 * np.sin(omega)) % 360
+        d = d + ((target - lon + 180) % 360 - 180) / DEGREES_PER_DAY
+    return J2000 + np.rint(d * SECONDS_PER_DAY).astype(np.int64)
+
+
+class SolarTerms:
+    """Per-year kō boundaries, kept in RAM and in a small cache file on flash."""
+    max_indexes = 3  # only the current and neighbouring years are needed on the device
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self._years = {}
+        self._indexes = {}
+
+    def _read_cached(self, year):
+        try:
+            with open(self.path, 'rb') as f:
+                while True:
+                    record = f.read(CACHE_RECORD_SIZE)
+                    if len(record) < CACHE_RECORD_SIZE:
+                        return None
+                    if struct.unpack_from('<h', record)[0] == year:
+                        base = epoch_seconds(year, 1, 1)
+                        return [base + v for v in struct.unpack(CACHE_RECORD, record)[1:]]
+        except OSError:
+            return None
+
+    def _append_cached(self, year, boundaries):
+        if not CACHE_YEARS[0] <= year <= CACHE_YEARS[1]:
+            return  # kept in RAM only
+        base = epoch_seconds(year, 1, 1)
+        try:
+            with open(self.path, 'ab') as f:
+                f.write(struct.pack(CACHE_RECORD, year, *[t - base for t in boundaries]))
+        except OSError:
+            print("Failed to write solar term cache.")
+            return
+        # Free the flash the old cache held; appends are rare, so trying each time is cheap
+        head = self.path.rpartition('/')[0]
+        old = head + '/' + OLD_CACHE_FILE if head else OLD_CACHE_FILE
+        if old != self.path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    def boundaries(self, year):
+        """Returns the 72 kō start instants of a year, computing and caching them once."""
+        result = self._years.get(year)
+        if result is None:
+            result = self._read_cached(year)
+            if result is None:
+                result = compute_boundaries(year)
+                self._append_cached(year, result)
+            self._years[year] = result
+        return result
+
+    def index(self, year, tz):
+        """Returns a CalendarIndex for the dates of one year in a timezone, from the exact boundaries."""
+        key = (year, tz.spec)
+        index = self._indexes.get(key)
+        if index is None:
+            if len(self._indexes) >= self.max_indexes:
+                self._indexes.clear()
+            index = build_solar_index(year, tz, self.boundaries(year - 1)[-1], self.boundaries(year),
+                                      self.boundaries(year + 1)[0])
+            self._indexes[key] = index
+        return index
+
+
+def _local_day(tz, utc):
+    return epoch_day(tz.local(utc))
+
+
+def build_solar_index(year, tz, previous_ko72, boundaries, next_ko1):
+    """Builds a CalendarIndex for the local dates of a year from its kō start instants.
+
+    previous_ko72 and next_ko1 are the neighbouring years' boundaries, so the
+    days either side of the kō 1 start fall in the right season.
+    """
+    index = CalendarIndex()
+    # (local day of start, kō number), bracketed by the neighbouring years' boundaries
+    starts = [(_local_day(tz, previous_ko72), KO_COUNT)]
+    starts += [(_local_day(tz, t), n + 1) for n, t in enumerate(boundaries)]
+    starts.append((_local_day(tz, next_ko1), 1))
+    sekki_of = {ko: i + 1 for i, ko in enumerate(SEKKI_FIRST_KO)}
+    shiki_of = {ko: i + 1 for i, ko in enumerate(SHIKI_FIRST_KO)}
+    first, last = days_from_civil(year, 1, 1), days_from_civil(year, 12, 31)
+    i = 0
+    while i + 1 < len(starts) and starts[i + 1][0] <= first:
+        i += 1
+    # The sekki and shiki in effect at the start of the year
+    sekki = shiki = 0
+    for k in range(starts[i][1], starts[i][1] - KO_COUNT, -1):
+        ko = (k - 1) % KO_COUNT + 1
+        if not sekki and ko in sekki_of:
+            sekki = sekki_of[ko]
+        if not shiki and ko in shiki_of:
+            shiki = shiki_of[ko]
+    for day in range(first, last + 1):
+        while i + 1 < len(starts) and starts[i + 1][0] <= day:
+            i += 1
+        ko = starts[i][1]
+        flags = 0
+        if starts[i][0] == day:
+            flags = STARTS_KO
+            if ko in sekki_of:
+                sekki = sekki_of[ko]
+                flags |= STARTS_SEKKI
+            if ko in shiki_of:
+                shiki = shiki_of[ko]
+                flags |= STARTS_SHIKI
+        y, m, d = civil_from_days(day)
+        slot = day_of_year(m, d)
+        index.ko[slot] = ko
+        index.sekki[slot] = sekki
+        index.shiki[slot] = shiki
+        index.starts[slot] = flags
+    if index.ko[59] == 0:  # Feb 29 in a common year stays with Feb 28
+        index.ko[59], index.sekki[59], index.shiki[59] = index.ko[58], index.sekki[58], index.shiki[58]
+    return index
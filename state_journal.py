@@ -0,0 +1,165 @@
+# Small persistent state kept in RAM and journaled to flash.
+# Each change appends one record to the file, and the file is only rewritten
+# (compacted to the current values) once it reaches JOURNAL_SIZE. Values are
+# read from flash once at boot and an unchanged value writes nothing; on
+# LittleFS an append still copies the file's last block, so it costs about
+# as much flash wear as rewriting a small file would. Changes that can wait,
+# such as statistics and print acknowledgements, are deferred: they stay in
+# RAM and go to flash in the same append as the next change that cannot.
+# Record (little-endian, 16 bytes):
+#   <BBHqI: marker 0xA6, field, reserved, value, CRC-32 of the first 12 bytes
+# Values are 64-bit so epoch seconds (LAST_SYNC) go past 2038. Files from
+# before that hold 12-byte <BBHiI records with marker 0xA5; they are read
+# and the file is compacted into the current layout.
+# A corrupt record fails its CRC and is ignored on the next boot; a torn one
+# at the end is dropped when the file is compacted.
+
+import os
+import struct
+from binascii import crc32
+
+version = "1.5.0"
+
+STATE_FILE = 'state.bin'
+JOURNAL_SIZE = 4096  # compact the file once it is this long
+RECORD = '<BBHqI'
+RECORD_SIZE = 16
+MARKER = 0xA6
+VALUE_RANGE = (-(1 << 63), (1 << 63) - 1)
+OLD_RECORD = '<BBHiI'  # 32-bit values, version 1.3.0 and earlier
+OLD_RECORD_SIZE = 12
+OLD_MARKER = 0xA5
+
+# Fields
+LAST_KO = 1  # kō number last printed, as older versions kept it; now worked out from PRINTED
+LAST_SEKKI = 2  # no longer written
+LAST_SHIKI = 3  # no longer written
+LAST_SYNC = 4  # UTC epoch seconds of the last NTP sync
+CURSOR = 5  # next kō for the manual browse button
+DRIFT_PPB = 6  # measured RTC rate error, parts per billion, positive when the RTC runs fast
+CORRECTION = 7  # seconds added to the RTC since the last sync to compensate for drift
+BOOTS = 8  # boots counted by the time keeper
+RADIO_BOOTS = 9  # boots that had to use Wi-Fi before they were ready
+READY_MS = 10  # boot-to-ready time of the last boot
+PRINTED = 11  # print spool key of the last scheduled slip written to the printer
+# 12 is unused: it held the deepsleep wake-up time, now kept in the scratch registers (power.py)
+AWAKE_MS = 13  # time awake in a sleeping power mode, added about weekly, for the current estimate
+ASLEEP_S = 14  # added with AWAKE_MS
+RADIO_MS = 15  # time with Wi-Fi switched on
+FIELDS = 16  # one past the highest field number
+
+
+class StateJournal:
+    """Integer state values, read from flash once at boot and appended to it on change."""
+
+    def __init__(self, path=STATE_FILE, size=JOURNAL_SIZE):
+        self.path = path
+        self.slots = size // RECORD_SIZE
+        self.values = [0] * FIELDS
+        self.used = 0  # records in the file
+        self.appends = 0  # file writes, each of one or more records
+        self.compactions = 0
+        self._record = bytearray(RECORD_SIZE)
+        self._dirty = []  # fields changed in RAM but not yet journaled
+
+    def load(self):
+        """Replays the journal into RAM; returns the number of valid records found."""
+        valid = 0
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return 0  # created by the first change
+        mv = memoryview(data)
+        offset = 0
+        old = False
+        self.used = 0
+        while True:
+            if offset + RECORD_SIZE <= len(data) and data[offset] == MARKER:
+                layout, size = RECORD, RECORD_SIZE
+            elif offset + OLD_RECORD_SIZE <= len(data) and data[offset] == OLD_MARKER:
+                layout, size = OLD_RECORD, OLD_RECORD_SIZE
+                old = True
+            else:
+                break
+            self.used += 1  # a bad record still takes its slot
+            marker, field, _, value, crc = struct.unpack_from(layout, data, offset)
+            if crc == crc32(mv[offset:offset + size - 4]) and 0 < field < FIELDS:
+                self.values[field] = value
+                valid += 1
+            offset += size
+        if old or offset != len(data):
+            # Older 32-bit records, a torn last record or the 0xFF padding of an older
+            # preallocated file: appends must not land after them
+            self._compact()
+        return valid
+
+    def get(self, field):
+        return self.values[field]
+
+    def set(self, field, value):
+        """Updates a value in RAM and journals it with any deferred ones; does nothing if it is unchanged."""
+        if self._update(field, value):
+            self.flush()
+
+    def defer(self, field, value):
+        """Updates a value in RAM; it is journaled by the next set() or flush()."""
+        self._update(field, value)
+
+    def _update(self, field, value):
+        if self.values[field] == value:
+            return False
+        if not VALUE_RANGE[0] <= value <= VALUE_RANGE[1]:
+            print(f"State value {value} for field {field} out of range, not saved.")
+            return False
+        self.values[field] = value
+        if field not in self._dirty:
+            self._dirty.append(field)
+        return True
+
+    def flush(self):
+        """Journals every value changed since the last write, in one append."""
+        dirty = self._dirty
+        if not dirty:
+            return
+        if self.used + len(dirty) > self.slots:
+            self._compact()
+            return
+        try:
+            with open(self.path, 'ab') as f:
+                for field in dirty:
+                    f.write(self._pack(field, self.values[field]))
+        except OSError:
+            print("Failed to write state journal.")  # the values stay deferred
+            return
+        self.used += len(dirty)
+        self.appends += 1
+        self._dirty = []
+
+    def _pack(self, field, value):
+        record = self._record
+        struct.pack_into('<BBHq', record, 0, MARKER, field, 0, value)
+        struct.pack_into('<I', record, 12, crc32(memoryview(record)[:12]))
+        return record
+
+    def _compact(self):
+        # Rewrites the file holding just the current non-zero values, via a temporary file
+        temp = self.path + '.tmp'
+        used = 0
+        try:
+            with open(temp, 'wb') as f:
+                for field in range(1, FIELDS):
+                    if self.values[field]:
+                        f.write(self._pack(field, self.values[field]))
+                        used += 1
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            os.rename(temp, self.path)
+        except OSError:
+            print("Failed to compact state journal.")
+            return
+        self.used = used
+        self.compactions += 1
+        self._dirty = []
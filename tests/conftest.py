@@ -0,0 +1,9 @@
+# The modules live at the top of the repository and are imported by name,
+# as they are on the device; the tests run them on CPython through sim.py.
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
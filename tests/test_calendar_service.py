@@ -0,0 +1,83 @@
+import asyncio
+import builtins
+
+import pytest
+
+from calendar_service import handle, open_service, posix_rule
+
+
+@pytest.fixture(scope='module')
+def service():
+    with open_service() as service:
+        yield service
+
+
+def test_zone_names_and_rules(service):
+    assert posix_rule('Asia/Tokyo') == 'JST-9'
+    assert service.respond('/season', 'zone=JST-9&date=2026-03-05')[0] == 200
+    assert service.respond('/season', 'zone=Foo/Bar&date=2026-03-05')[0] == 400
+
+
+@pytest.mark.parametrize('zone', ('/etc/passwd', '../../../../etc/hostname', 'Asia/../../../etc/passwd'))
+def test_zone_cannot_leave_the_tz_database(service, monkeypatch, zone):
+    opened = []
+    real_open = builtins.open
+    monkeypatch.setattr(builtins, 'open', lambda path, *args, **kw: opened.append(path) or real_open(path, *args, **kw))
+    assert service.respond('/season', f'zone={zone}&date=2026-03-05')[0] == 400
+    assert opened == []
+
+
+def test_matching_etag_is_not_modified(service):
+    status, headers, body = service.respond('/season', 'zone=Asia/Tokyo&date=2026-03-05')
+    assert status == 200 and body
+    etag = headers['ETag']
+    not_modified = service.not_modified
+    status, again, body = service.respond('/season', 'zone=Asia/Tokyo&date=2026-03-05', etag)
+    assert (status, body, again['ETag']) == (304, b'', etag)
+    assert service.not_modified == not_modified + 1
+    assert service.respond('/season', 'zone=Asia/Tokyo&date=2026-03-05', '"stale"')[0] == 200
+    # Another day, zone or endpoint has its own tag
+    for query, path in (('zone=Asia/Tokyo&date=2026-03-06', '/season'),
+                        ('zone=Europe/Berlin&date=2026-03-05', '/season'),
+                        ('zone=Asia/Tokyo&date=2026-03-05', '/payload')):
+        assert service.respond(path, query, etag)[0] == 200
+
+
+@pytest.mark.parametrize('query', ('date=2026-02-29', 'date=2026-13-01', 'date=2026-04-31', 'date=1799-12-31',
+                                   'date=2201-01-01', 'date=2026-03', 'date=tomorrow', 'zone=Mars/Olympus'))
+def test_bad_dates_and_zones_are_rejected(service, query):
+    assert service.respond('/season', query) == (400, {}, b'bad zone or date\n')
+
+
+def test_edges_of_the_accepted_range(service):
+    for query in ('date=2024-02-29', 'date=1800-01-01', 'date=2200-12-31', 'zone=EST5EDT,M3.2.0,M11.1.0'):
+        assert service.respond('/season', query)[0] == 200
+    assert service.respond('/nowhere', '')[0] == 404
+
+
+def test_http_revalidation_and_methods(service):
+    async def exchange():
+        server = await asyncio.start_server(lambda r, w: handle(service, r, w), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+
+        async def request(head):
+            writer.write(head.encode())
+            status = (await reader.readline()).split()[1]
+            headers = {}
+            while (line := await reader.readline()) != b'\r\n':
+                name, _, value = line.decode().partition(':')
+                headers[name.lower()] = value.strip()
+            await reader.readexactly(int(headers['content-length']))
+            return int(status), headers
+        status, headers = await request("GET /payload?zone=UTC&date=2026-05-05 HTTP/1.1\r\n\r\n")
+        assert status == 200
+        etag = headers['etag']
+        assert await request(f"GET /payload?zone=UTC&date=2026-05-05 HTTP/1.1\r\nIf-None-Match: {etag}\r\n\r\n") \
+            == (304, {'content-length': '0', 'etag': etag, 'cache-control': headers['cache-control']})
+        assert (await request("GET /season?date=2026-02-30 HTTP/1.1\r\n\r\n"))[0] == 400
+        assert (await request("POST /season HTTP/1.1\r\nConnection: close\r\n\r\n"))[0] == 405
+        writer.close()
+        server.close()
+        await server.wait_closed()
+    asyncio.run(exchange())
@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from escpos_emulator import FONT_WIDTH, bitmap, main, render_slips, run, text_preview
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+
+
+@pytest.fixture(scope='module')
+def first_slips():
+    return {layer: data for layer, _, data in render_slips(numbers=(1,))}
+
+
+@pytest.mark.parametrize('layer, byte_count, dot_rows, lines', (
+    ('ko', 175, 426, 7),
+    ('sekki', 124, 396, 6),
+    ('shiki', 103, 342, 5),
+))
+def test_first_slip_of_each_layer_matches_its_golden_output(first_slips, layer, byte_count, dot_rows, lines):
+    # After a deliberate layout change, rewrite tests/golden/<layer>_1.txt from text_preview()
+    slip = run(first_slips[layer])
+    report = slip.report()
+    assert (report['bytes'], report['dot_rows'], report['lines']) == (byte_count, dot_rows, lines)
+    assert slip.unknown == []
+    with open(os.path.join(GOLDEN, f'{layer}_1.txt'), encoding='utf-8') as f:
+        assert text_preview(slip) == f.read()
+
+
+def _lit_columns(data):
+    width, height, rows = bitmap(run(data))
+    return sum(1 for x in range(width) if any(row[x] for row in rows))
+
+
+def test_bitmap_cells_follow_the_character_set():
+    # ● is full-width in the Japanese character set, as run() and text_preview count it
+    slip = run(b'\x1b9\x01' + '●●'.encode() + b'\n')
+    assert slip.items[0].cells == 4
+    assert _lit_columns(b'\x1b9\x01' + '●●'.encode() + b'\n') == 2 * (2 * FONT_WIDTH - 4)
+    assert _lit_columns('●●'.encode() + b'\n') == 2 * (FONT_WIDTH - 4)
+
+
+def test_reset_returns_to_the_default_character_set():
+    slip = run(b'\x1b9\x01' + '●'.encode() + b'\n\x1b@' + '●'.encode() + b'\n')
+    assert [line.cells for line in slip.items] == [2, 1]
+
+
+def test_unknown_slip_number_is_an_error(capsys):
+    assert main(['--slip', 'ko', '99']) == 1
+    assert 'No ko season 99' in capsys.readouterr().out
@@ -0,0 +1,20 @@
+from gy_ep204x import Ticket
+
+
+def test_growing_a_ticket_leaves_earlier_views_intact():
+    ticket = Ticket(8)
+    ticket.print('header')
+    view = ticket.view()  # e.g. a chunk still being written to the UART
+    ticket.print(' and a much longer body')
+    assert bytes(view) == b'header'
+    assert bytes(ticket.view()) == b'header and a much longer body'
+
+
+def test_reset_returns_to_the_default_character_set_widths():
+    # ● is two cells in the Japanese character set and one otherwise
+    ticket = Ticket()
+    ticket.set_japanese_charset()
+    ticket.reset()
+    start = ticket.length
+    ticket.print_with_breaks('●' * 20, 20)
+    assert bytes(ticket.view()[start:]) == ('●' * 20 + '\n').encode('utf-8')
@@ -0,0 +1,49 @@
+import sim
+from gy_ep204x_async import AsyncGY_EP204X
+
+
+def run(coro):
+    loop = sim.asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_queued_bytes_keep_their_order():
+    async def main():
+        printer = AsyncGY_EP204X()
+        printer.feed(2)
+        printer.feed(3)  # queued behind the first feed, count byte included
+        printer.print_with_breaks("hello world")
+        await printer.wait_ready()
+        return printer
+    printer = run(main())
+    assert printer.uart.output == b'\x1bd\x02\x1bd\x03hello world\n'
+
+
+def test_feed_delays_follow_the_queued_command():
+    async def main():
+        printer = AsyncGY_EP204X()
+        printer.feed(2)
+        start = sim.clock.ticks_ms()
+        printer.feed(4)
+        printer.print("x")
+        sent = []
+        while not printer.ready():
+            sent.append((sim.clock.ticks_diff(sim.clock.ticks_ms(), start), bytes(printer.uart.output)))
+            await sim.asyncio.sleep_ms(10)
+        return start, printer, sent
+    start, printer, sent = run(main())
+    # The second feed waits out the first (100 ms), then "x" waits out its own 200 ms
+    before_x = [ms for ms, out in sent if out.endswith(b'\x1bd\x04')]
+    assert before_x and max(before_x) >= 250
+    assert printer.uart.output.endswith(b'\x1bd\x04x')
+
+
+def test_ready_printer_writes_straight_through():
+    printer = AsyncGY_EP204X()
+    printer.bold(True)
+    printer.feed_rows(0)
+    assert printer.uart.output == b'\x1bG\x01\x1bJ\x00'
+    assert printer.ready()
@@ -0,0 +1,46 @@
+import json
+
+from json_stream import RecordReader, covers_date, field_equals, raw_field
+
+SEASONS = [
+    {"number": 1, "en": "Parsley flourishes", "start": "01-05", "end": "01-09"},
+    {"number": 2, "en": "Springs \"thaw\" {braces} [brackets]", "start": "01-10", "end": "01-14"},
+    {"number": 72, "en": "Hens start laying eggs", "start": "12-31", "end": "01-04", "note": "x" * 300},
+]
+
+
+def write(tmp_path, data):
+    path = tmp_path / 'seasons.json'
+    path.write_text(json.dumps(data), encoding='utf-8')
+    return str(path)
+
+
+def test_every_record_is_decoded_across_chunks(tmp_path):
+    path = write(tmp_path, SEASONS)
+    assert list(RecordReader(chunk=7, record=16).load(path)) == SEASONS
+
+
+def test_records_inside_a_wrapping_object(tmp_path):
+    path = write(tmp_path, {"version": 2, "seasons": SEASONS})
+    assert [r['number'] for r in RecordReader().load(path)] == [1, 2, 72]
+
+
+def test_buffer_can_grow_while_a_view_is_held(tmp_path):
+    path = write(tmp_path, SEASONS)
+    reader = RecordReader(chunk=16, record=8)
+    held = None
+    numbers = []
+    for raw in reader.records(path):
+        numbers.append(json.loads(bytes(raw))['number'])
+        held = raw  # as load() does while the caller looks at the decoded record
+    assert numbers == [1, 2, 72]
+    assert held is not None
+
+
+def test_predicates_match_raw_bytes(tmp_path):
+    path = write(tmp_path, SEASONS)
+    reader = RecordReader()
+    assert reader.find(path, field_equals('number', 2))['number'] == 2
+    assert reader.find(path, covers_date(1, 2))['number'] == 72  # wraps at the year end
+    assert reader.find(path, field_equals('number', 9)) is None
+    assert raw_field(b'{"en": "Parsley", "number": 1}', 'en') == b'Parsley'
@@ -0,0 +1,51 @@
+from print_spool import PrintSpool, job_key, key_day, key_rank, RANK_KO, RANK_SEKKI, RANK_SHIKI
+from state_journal import StateJournal
+
+
+def open_spool(tmp_path):
+    state = StateJournal(str(tmp_path / 'state.bin'))
+    state.load()
+    spool = PrintSpool(state, str(tmp_path / 'spool.bin'))
+    spool.load()
+    return spool
+
+
+def test_keys_order_a_day_shiki_sekki_ko():
+    day = 20500
+    keys = [job_key(day, RANK_KO), job_key(day + 1, RANK_SHIKI), job_key(day, RANK_SHIKI), job_key(day, RANK_SEKKI)]
+    assert sorted(keys) == [job_key(day, r) for r in (RANK_SHIKI, RANK_SEKKI, RANK_KO)] + [job_key(day + 1, RANK_SHIKI)]
+    assert (key_day(keys[0]), key_rank(keys[0])) == (day, RANK_KO)
+
+
+def test_jobs_are_queued_once_in_timeline_order(tmp_path):
+    spool = open_spool(tmp_path)
+    assert spool.add([(job_key(10, RANK_KO), 3), (job_key(10, RANK_SEKKI), 2)]) == 2
+    assert spool.add([(job_key(10, RANK_KO), 3), (job_key(5, RANK_KO), 2)]) == 1
+    assert spool.pending() == [(job_key(5, RANK_KO), 2), (job_key(10, RANK_SEKKI), 2), (job_key(10, RANK_KO), 3)]
+
+
+def test_acknowledged_jobs_stay_done_after_a_reboot(tmp_path):
+    spool = open_spool(tmp_path)
+    spool.add([(job_key(day, RANK_KO), day) for day in range(1, 6)])
+    spool.ack(job_key(3, RANK_KO))
+    spool.ack(job_key(2, RANK_KO))  # never moves back
+    spool.state.flush()  # the journal's next write
+    again = open_spool(tmp_path)
+    assert again.pending() == [(job_key(4, RANK_KO), 4), (job_key(5, RANK_KO), 5)]
+    assert again.add([(job_key(1, RANK_KO), 1)]) == 0  # already printed
+
+
+def test_unreadable_queue_file_is_empty(tmp_path):
+    (tmp_path / 'spool.bin').write_bytes(b'KO')
+    assert open_spool(tmp_path).pending() == []
+
+
+def test_a_run_of_acknowledgements_is_one_journal_write(tmp_path):
+    spool = open_spool(tmp_path)
+    spool.add([(job_key(day, RANK_KO), day) for day in range(1, 6)])
+    for day in range(1, 5):
+        spool.ack(job_key(day, RANK_KO))
+    assert spool.state.appends == 0
+    spool.ack(job_key(5, RANK_KO))  # the queue is empty
+    assert spool.state.appends == 1
+    assert open_spool(tmp_path).pending() == []
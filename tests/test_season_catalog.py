@@ -0,0 +1,60 @@
+import gc
+import os
+import shutil
+import tracemalloc
+
+from conftest import ROOT
+from season_catalog import (KO_FILE, PACKED_FILE, SEKKI_FILE, SHIKI_FILE, PackedCatalog, SeasonCatalog,
+                            StreamingCatalog, open_catalog)
+
+
+def test_heap_saved_over_json_dicts_is_measured(monkeypatch):
+    # CPython has no gc.mem_alloc(); tracemalloc stands in for MicroPython's counter
+    monkeypatch.setattr(gc, 'mem_alloc', lambda: tracemalloc.get_traced_memory()[0], raising=False)
+    tracemalloc.start()
+    try:
+        catalog = SeasonCatalog(ROOT)
+        catalog.refresh()
+    finally:
+        tracemalloc.stop()
+    assert (len(catalog.ko), len(catalog.sekki), len(catalog.shiki)) == (72, 24, 4)
+    assert catalog.freed_bytes > 100 * len(catalog.ko)
+
+
+def _fields(record):
+    return (record.number, record.kanji, record.romaji, record.en,
+            record.start_month, record.start_day, record.end_month, record.end_day)
+
+
+def test_streamed_lookups_match_the_resident_catalog(tmp_path):
+    for name in (KO_FILE, SEKKI_FILE, SHIKI_FILE):
+        shutil.copy(os.path.join(ROOT, name), tmp_path)
+    streamed = open_catalog(str(tmp_path), stream=True)  # no seasons.bin here
+    assert isinstance(streamed, StreamingCatalog)
+    streamed.refresh()
+    resident = SeasonCatalog(ROOT)
+    resident.refresh()
+    for layer in ('ko', 'sekki', 'shiki'):
+        records = getattr(resident, layer)
+        assert len(getattr(streamed, layer)) == len(records)
+        for record in records:
+            assert _fields(streamed.get(getattr(streamed, layer), record.number)) == _fields(record)
+        assert streamed.get(getattr(streamed, layer), 99) is None
+    for month, day in ((1, 1), (2, 29), (6, 21), (12, 31)):
+        assert streamed.index.lookup(month, day) == resident.index.lookup(month, day)
+
+
+def test_packed_catalog_is_used_only_while_it_matches_the_json_files(tmp_path, capsys):
+    for name in (KO_FILE, SEKKI_FILE, SHIKI_FILE, PACKED_FILE):
+        shutil.copy(os.path.join(ROOT, name), tmp_path)
+    catalog = open_catalog(str(tmp_path))
+    assert isinstance(catalog, PackedCatalog)
+    catalog.close()
+    path = tmp_path / KO_FILE
+    path.write_text(path.read_text(encoding='utf-8').replace('Parsley flourishes', 'Parsley thrives'),
+                    encoding='utf-8')
+    catalog = open_catalog(str(tmp_path))
+    assert type(catalog) is SeasonCatalog
+    assert 'was not built from these JSON files' in capsys.readouterr().out
+    catalog.refresh()
+    assert catalog.get(catalog.ko, 1).en == 'Parsley thrives'
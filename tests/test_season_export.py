@@ -0,0 +1,72 @@
+import io
+
+from conftest import ROOT
+from season_catalog import SeasonCatalog
+from season_export import csv_lines, export, fixed_periods, solar_periods, write_batched
+from solar_terms import compute_boundaries
+from timeutil import days_from_civil, epoch_day
+from tz import TimeZone
+
+JST = TimeZone('JST-9')
+
+
+def load():
+    catalog = SeasonCatalog(ROOT)
+    catalog.refresh()
+    return catalog
+
+
+def test_solar_periods_tile_the_year_from_the_boundaries():
+    periods = list(solar_periods(2026, 2026, JST))
+    counts = {layer: sum(1 for p in periods if p[0] == layer) for layer in ('ko', 'sekki', 'shiki')}
+    assert counts == {'ko': 71, 'sekki': 24, 'shiki': 4}  # kō 72 of 2026 starts on 2027-01-01 in Japan
+    for layer in counts:
+        spans = sorted((first, last) for name, _, first, last in periods if name == layer)
+        assert all(a[1] + 1 == b[0] for a, b in zip(spans, spans[1:]))  # no gaps or overlaps
+    first, last = days_from_civil(2026, 1, 1), days_from_civil(2026, 12, 31)
+    starts = [(epoch_day(JST.local(t)), n + 1) for year in (2025, 2026, 2027)
+              for n, t in enumerate(compute_boundaries(year))]
+    assert [(day, number) for day, number in starts if first <= day <= last] == \
+        [(day, number) for name, number, day, _ in periods if name == 'ko']
+
+
+def test_last_ko_of_a_year_starting_on_january_1_is_exported():
+    periods = list(solar_periods(2027, 2027, JST))
+    assert periods[0] == ('ko', 72, days_from_civil(2027, 1, 1), days_from_civil(2027, 1, 4))
+
+
+def test_a_range_of_years_is_the_years_one_after_another():
+    joined = [p for year in (2026, 2027, 2028) for p in solar_periods(year, year, JST)]
+    assert list(solar_periods(2026, 2028, JST)) == joined
+    assert len(list(fixed_periods(load(), 2026, 2028))) == 3 * 100
+
+
+def test_ical_events_are_folded_and_counted():
+    f = io.StringIO()
+    assert export(f, load(), 2026, 2027, JST) == 199  # 99 periods start in 2026, 100 in 2027
+    lines = f.getvalue().split('\r\n')
+    assert lines[0] == 'BEGIN:VCALENDAR' and lines[-2] == 'END:VCALENDAR' and lines[-1] == ''
+    assert sum(line == 'BEGIN:VEVENT' for line in lines) == 199
+    assert all(len(line.encode('utf-8')) <= 75 for line in lines)
+
+
+def test_csv_rows_and_layer_filter():
+    catalog = load()
+    f = io.StringIO()
+    assert export(f, catalog, 2026, 2026, JST, fmt='csv', layers=('sekki',)) == 24
+    rows = f.getvalue().split('\r\n')
+    assert rows[0] == 'layer,number,start,end,kanji,romaji,en'
+    assert len(rows) == 26 and all(row.startswith('sekki,') for row in rows[1:-1])
+
+
+def test_batched_writes_match_the_lines():
+    catalog = load()
+    lines = list(csv_lines(catalog, fixed_periods(catalog, 2026, 2026)))
+    writes = []
+
+    class Sink:
+        def write(self, text):
+            writes.append(text)
+    assert write_batched(Sink(), iter(lines), batch=7) == len(lines)
+    assert ''.join(writes) == ''.join(lines)
+    assert len(writes) == -(-len(lines) // 7)
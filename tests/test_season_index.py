@@ -0,0 +1,34 @@
+from conftest import ROOT
+from season_catalog import SeasonCatalog
+from season_index import DAYS_IN_YEAR, STARTS_KO, STARTS_SEKKI, STARTS_SHIKI, build_index, month_day
+
+
+def linear_scan(records, month, day):
+    # The lookup the index replaced: walk the records, handling year-end wraparound
+    date = (month, day)
+    for r in records:
+        start, end = (r.start_month, r.start_day), (r.end_month, r.end_day)
+        if start <= end:
+            if start <= date <= end:
+                return r.number
+        elif date >= start or date <= end:
+            return r.number
+    return 0
+
+
+def test_every_slot_matches_the_linear_scan():
+    catalog = SeasonCatalog(ROOT)
+    catalog.refresh()
+    index = build_index(catalog.ko, catalog.sekki, catalog.shiki)
+    layers = ((catalog.ko, STARTS_KO), (catalog.sekki, STARTS_SEKKI), (catalog.shiki, STARTS_SHIKI))
+    for slot in range(DAYS_IN_YEAR):
+        month, day = month_day(slot)
+        found = index.lookup(month, day)
+        for layer, (records, flag) in enumerate(layers):
+            expected = linear_scan(records, month, day)
+            if expected == 0:
+                # Days the data leaves uncovered (Feb 29) stay in the previous day's season
+                expected = index.lookup(*month_day(slot - 1))[layer]
+            assert found[layer] == expected, (month, day, layer)
+            starts = any((r.start_month, r.start_day) == (month, day) for r in records)
+            assert bool(found[3] & flag) == starts, (month, day, layer)
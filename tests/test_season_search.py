@@ -0,0 +1,43 @@
+from conftest import ROOT
+from season_catalog import SeasonCatalog
+from season_search import LAYER_NAMES, SearchIndex, de_accent, tokens
+
+
+def load():
+    catalog = SeasonCatalog(ROOT)
+    catalog.refresh()
+    return catalog
+
+
+def brute_force(catalog, query):
+    # Seasons with a token starting with each word of the query, by checking every record
+    words = list(tokens(query))
+    found = []
+    for layer, records in enumerate((catalog.ko, catalog.sekki, catalog.shiki)):
+        for r in records:
+            own = [t for text in (r.en, r.romaji, r.kanji) for t in tokens(text)]
+            if words and all(any(t.startswith(w) for t in own) for w in words):
+                found.append((LAYER_NAMES[layer], r.number))
+    return found
+
+
+def test_tokens_fold_accents_and_split_kanji():
+    assert de_accent('Kōri Tōrō ÉTÉ') == 'Kori Toro ETE'
+    assert list(tokens('Kōri-no 雉始雊, 2x')) == ['kori', 'no', '雉', '始', '雊', '2x']
+
+
+def test_prefix_queries_match_a_scan_of_every_record():
+    catalog = load()
+    index = SearchIndex(catalog)
+    queries = {'', 'zzz', 'east wind', 'KŌRI', 'kiji', '雉', 'spring s', 'the'}
+    queries.update(token[:n] for token in index.tokens for n in (1, 3))
+    for query in sorted(queries):
+        assert index.search(query) == brute_force(catalog, query), query
+
+
+def test_known_seasons():
+    index = SearchIndex(load())
+    assert index.search('kiji') == [('ko', 3)]
+    assert index.search('雉') == [('ko', 3)]
+    assert ('sekki', 1) in index.search('risshun')
+    assert ('shiki', 1) in index.search('spring')
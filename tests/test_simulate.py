@@ -0,0 +1,44 @@
+# Whole-calendar runs on the virtual clock, one simulated year each.
+
+import pytest
+
+from power import AWAKE, LIGHT, DEEP, MODE_NAMES
+from simulate import DATA_FILES, simulate
+
+JSON_FILES = tuple(name for name in DATA_FILES if name.endswith('.json'))
+
+
+@pytest.mark.parametrize('files', (DATA_FILES, JSON_FILES), ids=('packed', 'json'))
+def test_deep_sleep_wakes_print_every_slip(files):
+    report = simulate(1, power=DEEP, files=files)
+    assert report['ko_slips'] == 73  # kō 72 starts on the first and the last day of 2026
+    assert (report['sekki_slips'], report['shiki_slips']) == (24, 4)
+
+
+@pytest.mark.parametrize('power', (AWAKE, LIGHT, DEEP), ids=MODE_NAMES)
+def test_journal_writes_about_once_per_print_day(power):
+    # 73 days in 2026 start a season; the time keeper's and power figures ride along with their slips
+    report = simulate(1, power=power)
+    assert report['journal_writes'] <= 85
+
+
+@pytest.mark.parametrize('power', (AWAKE, DEEP), ids=('awake', 'deep'))
+def test_reboot_prints_exactly_the_slips_missed_while_off(power):
+    # Switched off for 20 days, several season starts, midway through the run
+    always_on = simulate(0.5, start=(2026, 3, 1), power=power)
+    rebooted = simulate(0.5, start=(2026, 3, 1), power=power, reboots=1, downtime=20)
+    assert rebooted['boots'] == 2
+    assert rebooted['ko_numbers'] == always_on['ko_numbers']
+    for layer in ('ko_slips', 'sekki_slips', 'shiki_slips'):
+        assert rebooted[layer] == always_on[layer]
+
+
+@pytest.mark.parametrize('power', (AWAKE, LIGHT), ids=('awake', 'light'))
+def test_button_bursts_print_as_one_batch(power):
+    # Every press is followed by contact bounce, which must not count as a press
+    single = simulate(0.25, presses=12, burst=1, power=power)
+    assert single['button_batches'] == single['button_slips'] == 12
+    # Quick presses within a burst coalesce into one batch of consecutive kō
+    bursts = simulate(0.25, presses=12, burst=4, power=power)
+    assert bursts['button_batches'] == 12
+    assert 12 < bursts['button_slips'] <= 4 * 12
@@ -0,0 +1,42 @@
+import pytest
+
+from solar_terms import SolarTerms, compute_boundaries, compute_boundaries_batch
+
+
+def test_cache_round_trips_years_far_from_2000(tmp_path):
+    path = str(tmp_path / 'solar.bin')
+    for year in (1900, 2026, 2100):
+        assert SolarTerms(path).boundaries(year) == compute_boundaries(year)
+    for year in (1900, 2026, 2100):  # now read back from the file
+        terms = SolarTerms(path)
+        assert terms._read_cached(year) == compute_boundaries(year)
+
+
+def test_years_a_record_cannot_hold_stay_in_ram(tmp_path):
+    path = tmp_path / 'solar.bin'
+    terms = SolarTerms(str(path))
+    assert len(terms.boundaries(40000)) == 72
+    assert not path.exists()
+
+
+def test_batch_matches_per_year_boundaries():
+    years = range(1990, 2061)
+    for year, row in zip(years, compute_boundaries_batch(years)):
+        expected = compute_boundaries(year)
+        assert len(row) == 72
+        assert max(abs(int(t) - e) for t, e in zip(row, expected)) <= 1  # float rounding only
+
+
+def test_batch_is_an_array_with_numpy():
+    np = pytest.importorskip('numpy')
+    result = compute_boundaries_batch([2026, 2027])
+    assert isinstance(result, np.ndarray) and result.shape == (2, 72) and result.dtype == np.int64
+
+
+def test_writing_the_cache_removes_the_old_one(tmp_path):
+    old = tmp_path / 'solar_terms.bin'
+    old.write_bytes(b'\0' * 290)
+    terms = SolarTerms(str(tmp_path / 'solar_terms2.bin'))
+    terms.boundaries(2026)
+    assert not old.exists()
+    assert terms._read_cached(2026) == compute_boundaries(2026)
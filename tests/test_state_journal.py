@@ -0,0 +1,110 @@
+import os
+import struct
+from binascii import crc32
+
+from state_journal import (StateJournal, LAST_KO, CURSOR, DRIFT_PPB, LAST_SYNC, RECORD_SIZE, JOURNAL_SIZE,
+                           OLD_MARKER)
+from timeutil import epoch_seconds
+
+
+def reload(path, size=JOURNAL_SIZE):
+    state = StateJournal(path, size)
+    state.load()
+    return state
+
+
+def test_values_survive_a_reboot(tmp_path):
+    path = str(tmp_path / 'state.bin')
+    state = reload(path)
+    state.set(LAST_KO, 12)
+    state.set(CURSOR, 13)
+    state.set(LAST_KO, 14)
+    assert os.path.getsize(path) == 3 * RECORD_SIZE
+    again = reload(path)
+    assert (again.get(LAST_KO), again.get(CURSOR), again.used) == (14, 13, 3)
+
+
+def test_unchanged_value_writes_nothing(tmp_path):
+    path = str(tmp_path / 'state.bin')
+    state = reload(path)
+    state.set(LAST_KO, 5)
+    state.set(LAST_KO, 5)
+    assert state.appends == 1
+
+
+def test_full_file_is_compacted_to_current_values(tmp_path):
+    path = str(tmp_path / 'state.bin')
+    state = reload(path, 4 * RECORD_SIZE)
+    for number in range(1, 8):
+        state.set(LAST_KO, number)
+    state.set(CURSOR, 40)
+    assert state.compactions >= 1
+    assert os.path.getsize(path) <= 4 * RECORD_SIZE
+    again = reload(path, 4 * RECORD_SIZE)
+    assert (again.get(LAST_KO), again.get(CURSOR)) == (7, 40)
+
+
+def test_torn_last_record_is_dropped(tmp_path):
+    path = str(tmp_path / 'state.bin')
+    state = reload(path)
+    state.set(LAST_KO, 30)
+    state.set(LAST_KO, 31)
+    with open(path, 'r+b') as f:
+        f.truncate(2 * RECORD_SIZE - 5)  # power lost while the second record was written
+    again = reload(path)
+    assert again.get(LAST_KO) == 30
+    again.set(CURSOR, 2)
+    assert reload(path).get(CURSOR) == 2
+
+
+def test_corrupt_record_is_ignored(tmp_path):
+    path = str(tmp_path / 'state.bin')
+    state = reload(path)
+    state.set(LAST_KO, 30)
+    state.set(LAST_KO, 31)
+    with open(path, 'r+b') as f:
+        f.seek(RECORD_SIZE + 4)
+        f.write(b'\x00')
+    assert reload(path).get(LAST_KO) == 30
+
+
+def test_preallocated_file_is_carried_over(tmp_path):
+    path = str(tmp_path / 'state.bin')
+    state = reload(path)
+    state.set(LAST_KO, 9)
+    with open(path, 'ab') as f:
+        f.write(b'\xff' * (JOURNAL_SIZE - RECORD_SIZE))  # the older fixed-size layout
+    again = reload(path)
+    assert again.get(LAST_KO) == 9
+    again.set(CURSOR, 10)
+    assert reload(path).get(CURSOR) == 10
+    assert os.path.getsize(path) == 2 * RECORD_SIZE
+
+
+def test_epoch_seconds_past_2038_round_trip(tmp_path):
+    path = str(tmp_path / 'state.bin')
+    state = reload(path)
+    state.set(LAST_SYNC, epoch_seconds(2040, 6, 1))
+    state.set(DRIFT_PPB, -1500)
+    again = reload(path)
+    assert (again.get(LAST_SYNC), again.get(DRIFT_PPB)) == (epoch_seconds(2040, 6, 1), -1500)
+
+
+def test_value_out_of_range_is_not_saved(tmp_path):
+    path = str(tmp_path / 'state.bin')
+    state = reload(path)
+    state.set(LAST_SYNC, 1 << 64)
+    assert state.get(LAST_SYNC) == 0 and state.appends == 0
+
+
+def test_32_bit_records_are_carried_over(tmp_path):
+    path = tmp_path / 'state.bin'
+    old = b''
+    for field, value in ((LAST_KO, 9), (DRIFT_PPB, -700)):
+        head = struct.pack('<BBHi', OLD_MARKER, field, 0, value)
+        old += head + struct.pack('<I', crc32(head))
+    path.write_bytes(old)
+    again = reload(str(path))
+    assert (again.get(LAST_KO), again.get(DRIFT_PPB)) == (9, -700)
+    assert path.stat().st_size == 2 * RECORD_SIZE  # rewritten in the current layout
+    assert reload(str(path)).get(DRIFT_PPB) == -700
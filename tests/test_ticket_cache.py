@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+from ticket_cache import LAYER_KO, LAYER_SEKKI, TicketCache, signature
+
+
+def record(number, start=(1, 5), end=(1, 9)):
+    return SimpleNamespace(number=number, start_month=start[0], start_day=start[1],
+                           end_month=end[0], end_day=end[1])
+
+
+def render(ticket, r):
+    ticket.print(f"season {r.number}\n")
+    ticket.feed(2)
+
+
+def slips_of(*records):
+    calls = []
+
+    def slips():
+        calls.append(1)
+        return [(LAYER_KO, r, render) for r in records]
+    return slips, calls
+
+
+def test_cache_is_reused_until_the_signature_changes(tmp_path):
+    path = str(tmp_path / 'tickets.bin')
+    slips, calls = slips_of(record(1), record(2))
+    assert TicketCache(path).ensure(b'a', slips)
+    # A fresh cache (as after a reboot) loads the file instead of rendering
+    cache = TicketCache(path)
+    assert not cache.ensure(b'a', slips)
+    assert not cache.ensure(b'a', slips)
+    assert len(calls) == 1
+    assert cache.ensure(b'b', slips)
+    assert len(calls) == 2
+    assert not TicketCache(path).ensure(b'b', slips)
+
+
+def test_cached_blob_is_the_rendered_slip(tmp_path):
+    path = str(tmp_path / 'tickets.bin')
+    cache = TicketCache(path)
+    cache.ensure(b'a', slips_of(record(1), record(2))[0])
+    path_, offset, length, feed_s = cache.find(LAYER_KO, record(2))
+    with open(path_, 'rb') as f:
+        f.seek(offset)
+        assert f.read(length) == b'season 2\n\x1bd\x02'
+    assert feed_s == 0.1
+
+
+def test_other_dates_or_layers_are_not_served_from_the_cache(tmp_path):
+    cache = TicketCache(str(tmp_path / 'tickets.bin'))
+    cache.ensure(b'a', slips_of(record(1))[0])
+    assert cache.find(LAYER_KO, record(1)) is not None
+    assert cache.find(LAYER_KO, record(1, start=(1, 6))) is None  # a solar year moved the dates
+    assert cache.find(LAYER_SEKKI, record(1)) is None
+    assert cache.find(LAYER_KO, record(3)) is None
+
+
+def test_signature_follows_the_files_and_parts(tmp_path):
+    data = tmp_path / 'ko.json'
+    data.write_text('[]')
+    first = signature([str(data)], 1)
+    assert signature([str(data)], 1) == first
+    assert signature([str(data)], 2) != first
+    data.write_text('[{}]')
+    assert signature([str(data)], 1) != first
+    assert signature([str(tmp_path / 'missing.json')], 1) != first
@@ -0,0 +1,30 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from timeutil import epoch_seconds
+from tz import TimeZone
+
+zoneinfo = pytest.importorskip('zoneinfo')
+
+# POSIX rules for the zones' current law, as in the last line of their TZif files
+ZONES = (
+    ('America/New_York', 'EST5EDT,M3.2.0,M11.1.0'),
+    ('Europe/Berlin', 'CET-1CEST,M3.5.0,M10.5.0/3'),
+    ('Australia/Sydney', 'AEST-10AEDT,M10.1.0,M4.1.0/3'),
+    ('America/St_Johns', 'NST3:30NDT,M3.2.0,M11.1.0'),
+    ('Asia/Tokyo', 'JST-9'),
+)
+
+
+@pytest.mark.parametrize('name,spec', ZONES)
+def test_offsets_agree_with_zoneinfo(name, spec):
+    try:
+        reference = zoneinfo.ZoneInfo(name)
+    except zoneinfo.ZoneInfoNotFoundError:
+        pytest.skip(f"no tz database entry for {name}")
+    zone = TimeZone(spec)
+    # Every half hour through three years covers each transition and the hours around it
+    for t in range(epoch_seconds(2024, 1, 1), epoch_seconds(2027, 1, 1), 1800):
+        expected = datetime.fromtimestamp(t, timezone.utc).astimezone(reference).utcoffset().total_seconds()
+        assert zone.utc_offset(t) == expected, (name, datetime.fromtimestamp(t, timezone.utc))
@@ -0,0 +1,120 @@
+# Every slip rendered once into its final printer bytes and kept in one
+# file on flash, so a print is a straight copy from flash to the UART.
+# Layout (little-endian):
+#   header     <4sBBHI: magic, format, signature length, entry count, blob area offset
+#   signature  bytes naming what the blobs were rendered from (see signature())
+#   entries    <6BIHH: layer, number, start month/day, end month/day,
+#              blob offset, blob length, feed time in ms
+#   blobs      ESC/POS bytes of each slip, back to back
+
+import os
+import struct
+from gy_ep204x import Ticket
+
+version = "1.0.0"
+
+CACHE_FILE = 'tickets.bin'
+CACHE_MAGIC = b'KOTC'
+CACHE_FORMAT = 1
+CACHE_HEADER = '<4sBBHI'
+CACHE_HEADER_SIZE = 12
+CACHE_ENTRY = '<6BIHH'
+CACHE_ENTRY_SIZE = 14
+
+LAYER_KO = 0
+LAYER_SEKKI = 1
+LAYER_SHIKI = 2
+
+
+def signature(paths, *parts):
+    """Returns bytes that change whenever one of the files or version parts does."""
+    items = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            items.append(f"{st[6]}:{st[8]}")  # size, mtime
+        except OSError:
+            items.append('-')
+    items.extend(str(part) for part in parts)
+    return '|'.join(items).encode()
+
+
+class TicketCache:
+    """Offsets of the pre-rendered slips in the cache file, keyed by layer and season number."""
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self._signature = None
+        self._entries = {}  # layer << 8 | number -> (start month, day, end month, day, offset, length, feed ms)
+
+    def _load(self, signature):
+        try:
+            with open(self.path, 'rb') as f:
+                magic, fmt, n_sig, count, blobs = struct.unpack(CACHE_HEADER, f.read(CACHE_HEADER_SIZE))
+                if magic != CACHE_MAGIC or fmt != CACHE_FORMAT or f.read(n_sig) != signature:
+                    return False
+                table = f.read(count * CACHE_ENTRY_SIZE)
+        except (OSError, ValueError):
+            return False
+        entries = {}
+        for i in range(count):
+            layer, number, sm, sd, em, ed, offset, length, feed_ms = struct.unpack_from(
+                CACHE_ENTRY, table, i * CACHE_ENTRY_SIZE)
+            entries[layer << 8 | number] = (sm, sd, em, ed, offset, length, feed_ms)
+        self._entries = entries
+        return True
+
+    def _build(self, signature, slips):
+        # slips is a list of (layer, record, render) with render(ticket, record) as in ko-calendar.py
+        blobs = CACHE_HEADER_SIZE + len(signature) + len(slips) * CACHE_ENTRY_SIZE
+        entries = {}
+        table = bytearray(len(slips) * CACHE_ENTRY_SIZE)
+        ticket = Ticket()
+        temp = self.path + '.tmp'
+        with open(temp, 'wb') as f:
+            f.write(struct.pack(CACHE_HEADER, CACHE_MAGIC, CACHE_FORMAT, len(signature), len(slips), blobs))
+            f.write(signature)
+            f.write(table)  # placeholder until the offsets are known
+            offset = blobs
+            for i, (layer, record, render) in enumerate(slips):
+                render(ticket.clear(), record)
+                f.write(ticket.view())
+                entry = (record.start_month, record.start_day, record.end_month, record.end_day,
+                         offset, ticket.length, int(ticket.feed_time * 1000))
+                struct.pack_into(CACHE_ENTRY, table, i * CACHE_ENTRY_SIZE, layer, record.number, *entry)
+                entries[layer << 8 | record.number] = entry
+                offset += ticket.length
+            f.seek(CACHE_HEADER_SIZE + len(signature))
+            f.write(table)
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        os.rename(temp, self.path)
+        self._entries = entries
+
+    def ensure(self, signature, slips):
+        """Makes the cache match signature, loading it from flash or rebuilding it with slips().
+
+        Returns True if the cache had to be rebuilt.
+        """
+        if signature == self._signature:
+            return False
+        rebuilt = False
+        if not self._load(signature):
+            self._build(signature, slips())
+            rebuilt = True
+        self._signature = signature
+        return rebuilt
+
+    def find(self, layer, record):
+        """Returns (path, offset, length, feed seconds) of a record's slip, or None if it is not cached.
+
+        The record's dates must match the cached slip, so a season printed
+        with other dates than the cache was built for is rendered as usual.
+        """
+        entry = self._entries.get(layer << 8 | record.number)
+        if entry is None or entry[:4] != (record.start_month, record.start_day,
+                                          record.end_month, record.end_day):
+            return None
+        return self.path, entry[4], entry[5], entry[6] / 1000
@@ -0,0 +1,184 @@
+# Keeps the RTC right with as little Wi-Fi as possible. Each NTP sync
+# measures how fast the RTC has been running since the previous one; between
+# syncs the RTC is stepped to compensate, and the time is trusted while the
+# estimated error stays under MAX_ERROR, so most boots need no radio at all.
+# When a sync is due it runs in the background, retrying with exponential
+# backoff, and the radio is switched off again afterwards.
+# Its state changes are deferred to the journal's next write (the next
+# printed slip, or a deepsleep): the RP2040's RTC does not survive a power
+# cut either, and a boot without a trusted sync record simply syncs again.
+
+from hal import RTC, asyncio, network, ntptime, time
+import metrics
+from state_journal import LAST_SYNC, DRIFT_PPB, CORRECTION, BOOTS, RADIO_BOOTS, READY_MS, RADIO_MS
+from timeutil import epoch_seconds
+
+version = "1.2.0"
+
+MIN_VALID_TIME = epoch_seconds(2025, 1, 1)  # the RTC reads earlier than this after losing power
+MAX_ERROR = 60  # seconds of estimated clock error that is still trusted
+NTP_ERROR = 1  # seconds of error right after a sync
+UNMEASURED_DRIFT = 50  # ppm assumed before a drift rate has been measured
+DRIFT_UNCERTAINTY = 5  # ppm left after compensating with a measured rate
+MIN_DRIFT_INTERVAL = 86400  # shortest span between syncs that gives a usable drift rate
+CONNECT_TIMEOUT_MS = 15000
+BACKOFF_START = 2  # seconds before the first retry
+BACKOFF_MAX = 3600
+MAX_CHECK = 5 * 86400  # longest sleep of the background task, inside the ticks_ms range
+
+
+class TimeKeeper:
+    """Decides when the RTC needs NTP, syncs it in the background and measures its drift."""
+
+    def __init__(self, state, ssid, password):
+        self.state = state
+        self.ssid = ssid
+        self.password = password
+        self.syncs = 0
+        self.failures = 0
+        self.syncing = False
+        self._wlan = None
+        self._radio_on = None  # ticks_ms when the radio was switched on
+
+    def error(self, now=None):
+        """Estimated clock error in seconds, or None if the RTC cannot be trusted at all."""
+        if now is None:
+            now = time.time()
+        last = self.state.get(LAST_SYNC)
+        if not last or now < MIN_VALID_TIME or now < last:
+            return None
+        ppm = DRIFT_UNCERTAINTY if self.state.get(DRIFT_PPB) else UNMEASURED_DRIFT
+        return NTP_ERROR + (now - last) * ppm // 1000000
+
+    def trusted(self):
+        error = self.error()
+        return error is not None and error < MAX_ERROR
+
+    def compensate(self):
+        """Steps the RTC by whole seconds to follow the measured drift rate since the last sync."""
+        drift = self.state.get(DRIFT_PPB)
+        last = self.state.get(LAST_SYNC)
+        now = time.time()
+        if not drift or not last or now < last:
+            return 0
+        due = -((now - last) * drift // 1000000000)  # total correction owed since the sync
+        step = due - self.state.get(CORRECTION)
+        if step:
+            _set_rtc(now + step)
+            self.state.defer(CORRECTION, due)
+        return step
+
+    def boot(self, count=True):
+        """Counts a boot (unless count is False) and returns True if the RTC can be used without a sync."""
+        if count:
+            self.state.defer(BOOTS, self.state.get(BOOTS) + 1)
+        if self.trusted():
+            self.compensate()
+            return True
+        if count:
+            self.state.defer(RADIO_BOOTS, self.state.get(RADIO_BOOTS) + 1)
+        return False
+
+    def ready(self):
+        """Records the boot-to-ready time; returns (ms, share of boots that needed no radio)."""
+        ms = time.ticks_ms()
+        self.state.defer(READY_MS, ms)
+        boots = self.state.get(BOOTS)
+        share = 1 - self.state.get(RADIO_BOOTS) / boots if boots else 0
+        return ms, share
+
+    async def _connect(self):
+        if self._wlan is None:
+            self._wlan = network.WLAN(network.STA_IF)
+        wlan = self._wlan
+        with metrics.span(metrics.WIFI):
+            if self._radio_on is None:
+                self._radio_on = time.ticks_ms()
+            wlan.active(True)
+            wlan.connect(self.ssid, self.password)
+            deadline = time.ticks_add(time.ticks_ms(), CONNECT_TIMEOUT_MS)
+            while wlan.status() < 3 and wlan.status() >= 0 and time.ticks_diff(deadline, time.ticks_ms()) > 0:
+                await asyncio.sleep_ms(250)
+        return wlan.status() == 3
+
+    def _radio_off(self):
+        if self._wlan is not None:
+            self._wlan.disconnect()
+            self._wlan.active(False)
+        if self._radio_on is not None:
+            # Journaled for the power draw estimate
+            on = time.ticks_diff(time.ticks_ms(), self._radio_on)
+            self.state.defer(RADIO_MS, self.state.get(RADIO_MS) + on)
+            self._radio_on = None
+
+    def _ntp(self):
+        # Sets the RTC from NTP and updates the drift rate from how far it had wandered
+        with metrics.span(metrics.NTP):
+            before = time.time()
+            ntptime.settime()
+            now = time.time()
+        state = self.state
+        last = state.get(LAST_SYNC)
+        if last and before >= MIN_VALID_TIME and now - last >= MIN_DRIFT_INTERVAL:
+            # Seconds the uncompensated RTC gained, per second
+            gained = before - now - state.get(CORRECTION)
+            drift = gained * 1000000000 // (now - last)
+            old = state.get(DRIFT_PPB)
+            state.defer(DRIFT_PPB, ((old + drift) // 2 if old else drift) or 1)  # 0 means not measured
+        state.defer(LAST_SYNC, now)
+        state.defer(CORRECTION, 0)
+        self.syncs += 1
+
+    async def sync(self):
+        """Connects, sets the clock from NTP and turns the radio off, retrying with backoff until it works."""
+        delay = BACKOFF_START
+        self.syncing = True
+        try:
+            while True:
+                try:
+                    if await self._connect():
+                        self._ntp()
+                        print(f"System time updated to {time.time()} via NTP.")
+                        return
+                    print("Failed to establish a network connection")
+                except OSError as e:
+                    print(f"Failed to update time via NTP: {e}")
+                finally:
+                    self._radio_off()
+                self.failures += 1
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, BACKOFF_MAX)
+        finally:
+            self.syncing = False
+
+    def next_check(self, steps=True):
+        """Seconds until the RTC needs its next one-second drift step (unless steps is False) or a sync,
+        at most MAX_CHECK."""
+        last = self.state.get(LAST_SYNC)
+        now = time.time()
+        error = self.error(now)
+        if error is None or error >= MAX_ERROR // 2:
+            return 0
+        ppm = DRIFT_UNCERTAINTY if self.state.get(DRIFT_PPB) else UNMEASURED_DRIFT
+        wait = last + (MAX_ERROR // 2 - NTP_ERROR) * 1000000 // ppm - now
+        drift = abs(self.state.get(DRIFT_PPB))
+        if steps and drift > 1:
+            # Elapsed time at which the owed correction reaches its next whole second
+            owed = abs(self.state.get(CORRECTION)) + 1
+            wait = min(wait, last + owed * 1000000000 // drift - now)
+        return max(1, min(wait, MAX_CHECK))
+
+    async def run(self):
+        """Background task: compensates drift and syncs once the error estimate reaches half of MAX_ERROR."""
+        while True:
+            await asyncio.sleep(self.next_check())
+            error = self.error()
+            if error is None or error >= MAX_ERROR // 2:
+                await self.sync()
+            else:
+                self.compensate()
+
+
+def _set_rtc(t):
+    tm = time.gmtime(t)
+    RTC().datetime((tm[0], tm[1], tm[2], tm[6], tm[3], tm[4], tm[5], 0))
@@ -0,0 +1,62 @@
+# Calendar arithmetic on epoch seconds that behaves the same on MicroPython
+# (whose epoch may be 2000) and CPython, without relying on time.mktime.
+
+import time
+
+version = "1.0.0"
+
+EPOCH_YEAR = time.gmtime(0)[0]
+SECONDS_PER_DAY = 86400
+
+
+def days_from_civil(year, month, day):
+    """Returns days since 1970-01-01 for a proleptic Gregorian date."""
+    year -= month <= 2
+    era = (year if year >= 0 else year - 399) // 400
+    yoe = year - era * 400
+    doy = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def civil_from_days(days):
+    """Returns (year, month, day) for days since 1970-01-01."""
+    days += 719468
+    era = (days if days >= 0 else days - 146096) // 146097
+    doe = days - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    day = doy - (153 * mp + 2) // 5 + 1
+    month = mp + (3 if mp < 10 else -9)
+    return yoe + era * 400 + (month <= 2), month, day
+
+
+EPOCH_DAYS = days_from_civil(EPOCH_YEAR, 1, 1)
+
+
+def epoch_seconds(year, month, day, hour=0, minute=0, second=0):
+    """Returns seconds since the platform epoch for a date and time, without any zone adjustment."""
+    return ((days_from_civil(year, month, day) - EPOCH_DAYS) * SECONDS_PER_DAY
+            + hour * 3600 + minute * 60 + second)
+
+
+def epoch_day(t):
+    """Returns days since 1970-01-01 for platform epoch seconds."""
+    return t // SECONDS_PER_DAY + EPOCH_DAYS
+
+
+
+def weekday(year, month, day):
+    """Returns 0 for Sunday through 6 for Saturday."""
+    return (days_from_civil(year, month, day) + 4) % 7
+
+
+def is_leap(year):
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def days_in_month(year, month):
+    if month == 2:
+        return 29 if is_leap(year) else 28
+    return 30 if month in (4, 6, 9, 11) else 31
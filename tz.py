@@ -0,0 +1,145 @@
+# Rule-based timezone with daylight saving time, configured with a POSIX TZ
+# string such as "EST5EDT,M3.2.0,M11.1.0" or "JST-9". Transition instants are
+# computed once per year and cached, so converting UTC to local time is two
+# comparisons and an addition.
+
+from hal import time
+from timeutil import (EPOCH_DAYS, SECONDS_PER_DAY, civil_from_days, days_from_civil, days_in_month,
+                      epoch_day, epoch_seconds, is_leap, weekday)
+
+version = "1.0.1"
+
+TRANSITION_CACHE_SIZE = 8  # years of DST transitions kept
+
+
+def _parse_name(spec, i):
+    if spec[i] == '<':
+        end = spec.index('>', i)
+        return spec[i + 1:end], end + 1
+    start = i
+    while i < len(spec) and spec[i].isalpha():
+        i += 1
+    return spec[start:i], i
+
+
+def _parse_time(spec, i):
+    # [+|-]hh[:mm[:ss]] -> (seconds, next index)
+    sign = 1
+    if i < len(spec) and spec[i] in '+-':
+        sign = -1 if spec[i] == '-' else 1
+        i += 1
+    seconds = 0
+    for scale in (3600, 60, 1):
+        start = i
+        while i < len(spec) and spec[i].isdigit():
+            i += 1
+        if start == i:
+            break
+        seconds += int(spec[start:i]) * scale
+        if i < len(spec) and spec[i] == ':':
+            i += 1
+        else:
+            break
+    return sign * seconds, i
+
+
+def _parse_rule(rule):
+    # "Mm.w.d[/time]", "Jn[/time]" or "n[/time]" -> (kind, a, b, c, seconds after local midnight)
+    date, _, at = rule.partition('/')
+    seconds = _parse_time(at, 0)[0] if at else 7200
+    if date[0] == 'M':
+        m, w, d = date[1:].split('.')
+        return 'M', int(m), int(w), int(d), seconds
+    if date[0] == 'J':
+        return 'J', int(date[1:]), 0, 0, seconds
+    return 'N', int(date), 0, 0, seconds
+
+
+def _rule_day(rule, year):
+    # Returns days since 1970-01-01 on which a transition rule falls in a year
+    kind, a, b, c, _ = rule
+    if kind == 'M':
+        first = weekday(year, a, 1)
+        day = 1 + (c - first) % 7 + (b - 1) * 7
+        if day > days_in_month(year, a):
+            day -= 7
+        return days_from_civil(year, a, day)
+    jan1 = days_from_civil(year, 1, 1)
+    if kind == 'J':
+        # 1..365, Feb 29 is never counted
+        return jan1 + a - 1 + (1 if is_leap(year) and a >= 60 else 0)
+    return jan1 + a
+
+
+class TimeZone:
+    def __init__(self, spec):
+        self.spec = spec
+        self.std_name, i = _parse_name(spec, 0)
+        offset, i = _parse_time(spec, i)
+        self.std_offset = -offset  # POSIX offsets count hours west of UTC
+        self.dst_offset = self.std_offset
+        self.dst_name = None
+        self._rules = None
+        if i < len(spec) and spec[i] != ',':
+            self.dst_name, i = _parse_name(spec, i)
+            self.dst_offset = self.std_offset + 3600
+            if i < len(spec) and spec[i] != ',':
+                offset, i = _parse_time(spec, i)
+                self.dst_offset = -offset
+            if i < len(spec) and spec[i] == ',':
+                start, end = spec[i + 1:].split(',')
+                self._rules = (_parse_rule(start), _parse_rule(end))
+            else:
+                self._rules = (_parse_rule('M3.2.0'), _parse_rule('M11.1.0'))  # US default
+        self._cache = {}
+        self._lo = self._hi = 0  # UTC span of the year currently loaded
+        self._start = self._end = 0  # DST start and end within that year
+
+    def transitions(self, year):
+        """Returns (dst_start, dst_end) in UTC epoch seconds for a year, or None without DST."""
+        if self._rules is None:
+            return None
+        cached = self._cache.get(year)
+        if cached is None:
+            start_rule, end_rule = self._rules
+            start = (_rule_day(start_rule, year) - EPOCH_DAYS) * SECONDS_PER_DAY + start_rule[4] - self.std_offset
+            end = (_rule_day(end_rule, year) - EPOCH_DAYS) * SECONDS_PER_DAY + end_rule[4] - self.dst_offset
+            if len(self._cache) >= TRANSITION_CACHE_SIZE:
+                self._cache.clear()  # keep memory flat when walking many years
+            cached = self._cache[year] = (start, end)
+        return cached
+
+    def _load_year(self, utc):
+        year = civil_from_days(epoch_day(utc))[0]
+        self._lo = epoch_seconds(year, 1, 1)
+        self._hi = epoch_seconds(year + 1, 1, 1)
+        self._start, self._end = self.transitions(year) or (0, 0)
+
+    def utc_offset(self, utc):
+        """Returns seconds east of UTC in effect at a UTC epoch instant."""
+        if self._rules is None:
+            return self.std_offset
+        if not self._lo <= utc < self._hi:
+            self._load_year(utc)
+        if self._start <= self._end:
+            dst = self._start <= utc < self._end
+        else:
+            dst = utc >= self._start or utc < self._end  # southern hemisphere
+        return self.dst_offset if dst else self.std_offset
+
+    def local(self, utc):
+        """Returns local epoch seconds for a UTC epoch instant."""
+        return utc + self.utc_offset(utc)
+
+    def localtime(self, utc=None):
+        """Returns a time.localtime-style tuple for a UTC instant, default now."""
+        if utc is None:
+            utc = time.time()
+        return time.gmtime(utc + self.utc_offset(utc))
+
+    def to_utc(self, local):
+        """Returns the UTC instant for local epoch seconds, preferring standard time when ambiguous."""
+        utc = local - self.std_offset
+        if self.utc_offset(utc) == self.std_offset:
+            return utc
+        return local - self.dst_offset